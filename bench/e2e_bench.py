@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Uçtan uca yük testi — scrape_many → scrape_with_playwright → process_search
+zinciri, yerel fake_flights sunucusuna karşı (ağ gerekmez, Chromium gerekir).
+
+    python bench/e2e_bench.py                                   # 4 rota × 2 tarih
+    python bench/e2e_bench.py --routes 8 --dates 3 --concurrency 4 --runs 3
+    python bench/e2e_bench.py --captcha-rate 0.1 --wrong-route-rate 0.2 --out e2e.json
+
+Ölçülenler: run/dk, arama/dk, arama başına süre (p50/p90/p99), başarılı
+arama oranı, READY sinyal dağılımı ve sunucu sayaçları. Run'lar geçici
+bir klasörde çalışır; flights.json / history.json'a dokunulmaz. Alarmlar
+outbox üzerinden yerel fake_telegram sunucusuna gider (--tg-* ile 429 /
+5xx / gecikme enjekte edilebilir).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH))
+
+import fake_flights  # noqa: E402  (scraper'ı da yükler)
+import fake_telegram # noqa: E402
+import scraper       # noqa: E402
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="TITAN uçtan uca yük testi (yerel sunucu)")
+    ap.add_argument("--routes", type=int, default=4, help="ilk N rota")
+    ap.add_argument("--dates", type=int, default=2, help="ilk N tarih çifti")
+    ap.add_argument("--runs", type=int, default=1, help="tam run tekrarı")
+    ap.add_argument("--concurrency", type=int, default=3)
+    ap.add_argument("--mode", choices=["dates", "grid"], default="dates", help="TITAN_SCAN_MODE")
+    ap.add_argument("--host-interval", type=float, default=0.0, help="aynı host'a iki istek arası (sn)")
+    ap.add_argument("--verbose", action="store_true", help="scraper loglarını göster")
+    ap.add_argument("--out", help="sonuç JSON yolu")
+    fake_flights.add_config_args(ap)
+    fake_telegram.add_config_args(ap)
+    args = ap.parse_args()
+
+    server = fake_flights.start_server(fake_flights.config_from_args(args))
+    # scraper zaten yüklü; env yerine modül ayarları güncellenir
+    scraper.FLIGHTS_BASE_URL = server.base_url
+    scraper.CONCURRENCY = args.concurrency
+    scraper.RATE_LIMITER = scraper.HostRateLimiter(args.host_interval, jitter=0.0)
+    scraper.SCAN_MODE = args.mode
+    tg = fake_telegram.start_server(fake_telegram.config_from_args(args, args.seed))
+
+    # Arama süresi için sarmalayıcı
+    timings = []
+    entry = "scrape_date_grid" if args.mode == "grid" else "scrape_with_playwright"
+    real_scrape = getattr(scraper, entry)
+
+    async def timed_scrape(*job, slot=None):
+        t0 = time.perf_counter()
+        flights = None
+        try:
+            flights = await real_scrape(*job, slot=slot)
+            return flights
+        finally:
+            timings.append((time.perf_counter() - t0, bool(flights)))
+
+    setattr(scraper, entry, timed_scrape)
+
+    build = scraper.build_grid_jobs if args.mode == "grid" else scraper.build_jobs
+    jobs = build(scraper.ROUTES[:args.routes], scraper.get_search_dates()[:args.dates])
+    print(f"Fake Flights: {server.base_url} | {len(jobs)} arama × {args.runs} run, {args.concurrency} worker")
+
+    run_times = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="titan_e2e_") as tmp:
+        os.chdir(tmp)
+        try:
+            scraper.OUTBOX = scraper.TelegramOutbox(api_base=tg.base_url, token="bench")
+            for i in range(args.runs):
+                all_flights = []
+                log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                t0 = time.perf_counter()
+                with log:
+                    asyncio.run(scraper._run_searches(jobs, all_flights))
+                    scraper.DIGEST.flush()
+                run_times.append(time.perf_counter() - t0)
+                found = sum(1 for f in all_flights if f.get("price") is not None)
+                print(f"  run {i + 1}: {run_times[-1]:.1f}s, {found} uçuş satırı")
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                scraper.OUTBOX.close()
+            drain_s = time.perf_counter() - t0
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+            tg.shutdown()
+
+    secs = [t for t, _ in timings]
+    total = sum(run_times)
+    result = {
+        "searches": len(secs),
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "wall_s": round(total, 2),
+        "runs_per_min": round(args.runs / total * 60, 2) if total else 0.0,
+        "searches_per_min": round(len(secs) / total * 60, 2) if total else 0.0,
+        "search_s": {p: round(_pct(secs, q), 2) for p, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+        "success_rate": round(sum(1 for _, ok in timings if ok) / len(timings), 3) if timings else 0.0,
+        "alarms": len(tg.messages),
+        "telegram": {"drain_s": round(drain_s, 2), "sent": scraper.OUTBOX.sent,
+                     "retried": scraper.OUTBOX.retried, "pending": len(scraper.OUTBOX.items),
+                     "server": tg.stats},
+        "breaker": {k: getattr(scraper.BREAKER, k) for k in ("blocked", "requeued", "recovered", "opened")}
+                   | {"time_lost_s": round(scraper.BREAKER.time_lost_s, 1)},
+        "ready": scraper.ready_summary(),
+        "server": server.stats,
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "verbose")},
+    }
+
+    print(f"\nrun/dk     : {result['runs_per_min']}")
+    print(f"arama/dk   : {result['searches_per_min']}")
+    print(f"arama süre : p50={result['search_s']['p50']}s p90={result['search_s']['p90']}s "
+          f"p99={result['search_s']['p99']}s")
+    print(f"başarı     : %{result['success_rate'] * 100:.0f} | alarm: {len(tg.messages)}")
+    print(f"telegram   : kapanışta {drain_s:.1f}s boşaltma | {scraper.OUTBOX.retried} yeniden deneme | "
+          f"{len(scraper.OUTBOX.items)} bekleyen")
+    for line in result["ready"]:
+        print(line)
+    print(scraper.BREAKER.summary())
+    print(f"sunucu     : {json.dumps(server.stats, ensure_ascii=False)}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\nSonuç: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Yerel Google Flights benzeri test sunucusu — uçtan uca yük testi için.
+
+    python bench/fake_flights.py --port 8765 --latency-ms 300 --captcha-rate 0.05
+    TITAN_FLIGHTS_BASE=http://127.0.0.1:8765 python scraper.py
+
+Sunulanlar:
+  /travel/flights?q=...      sonuç sayfası; fiyatlar GetShoppingResults XHR'ı
+                             geldikten sonra JS ile .YMlIz hücrelerine basılır
+  /travel/flights            (q yok) form sayfası yerine boş ana sayfa
+  .../GetShoppingResults     batchexecute biçiminde itinerary yanıtı (yavaş XHR)
+  .../GetCalendarGrid        "Tarih tablosu" düğmesiyle gelen 7×7 tarih tablosu
+  /sorry/index               CAPTCHA sayfası
+  /__stats                   sunucu sayaçları (JSON)
+
+Enjekte edilebilen bozulmalar: istek gecikmesi, XHR gecikmesi, CAPTCHA
+yönlendirmesi, yanlış rota başlığı ("İstanbul - Antalya"), boş sonuç.
+--recorded verilirse bench/fixtures/results_<org>_<dst>.html olan rotalar
+için kayıtlı sayfa olduğu gibi sunulur.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import scraper  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+RPC_PATH  = "/_/FlightsFrontendUi/data/travel.frontend.flights.FlightsFrontendService/GetShoppingResults"
+GRID_PATH = "/_/FlightsFrontendUi/data/travel.frontend.flights.FlightsFrontendService/GetCalendarGrid"
+
+AIRLINES = [
+    ("TK", "Turkish Airlines"), ("PC", "Pegasus"), ("AJ", "AJet"),
+    ("LH", "Lufthansa"), ("AF", "Air France"), ("KL", "KLM"),
+]
+HUBS = ["MUC", "FRA", "VIE", "AMS", "ATH"]
+
+# Şehir adı (ilk kelime, büyük harf) → IATA; scraper'ın 2. sorgu formatı için
+CITY_TO_CODE = {}
+for _code, _name in scraper.AIRPORT_NAMES.items():
+    CITY_TO_CODE.setdefault(_name.split()[0].upper(), _code)
+
+
+class FakeConfig:
+    """Sunucu davranışı; oranlar 0-1 arası olasılıktır."""
+
+    def __init__(self, latency_ms=150, xhr_delay_ms=1200, captcha_rate=0.0,
+                 wrong_route_rate=0.0, empty_rate=0.0, deal_rate=0.05,
+                 recorded=False, seed=None):
+        self.latency_ms = latency_ms
+        self.xhr_delay_ms = xhr_delay_ms
+        self.captcha_rate = captcha_rate
+        self.wrong_route_rate = wrong_route_rate
+        self.empty_rate = empty_rate
+        self.deal_rate = deal_rate
+        self.recorded = recorded
+        self.rng = random.Random(seed)
+
+
+# ============================================================
+# SORGU → ROTA, SAHTE İTİNERARY
+# ============================================================
+def parse_query(q):
+    """'IST to CDG 2026-05-08 2026-05-11' veya 'Istanbul to Paris ...' → (org, dst, dep, ret)."""
+    parts = q.replace("+", " ").split()
+    if "to" not in parts:
+        return None
+    i = parts.index("to")
+    org = " ".join(parts[:i])
+    rest = parts[i + 1:]
+    dates = [p for p in rest if len(p) == 10 and p[4] == "-"]
+    dst = " ".join(p for p in rest if p not in dates)
+
+    def code(x):
+        x = x.strip().upper()
+        if x in scraper.AIRPORT_NAMES:
+            return x
+        return CITY_TO_CODE.get(x.split()[0]) if x else None
+
+    org, dst = code(org), code(dst)
+    if not org or not dst:
+        return None
+    return org, dst, (dates + [None, None])[0], (dates + [None, None])[1]
+
+
+def make_itineraries(route, dep, ret, config):
+    """Sorguya göre tekrarlanabilir (aynı sorgu → aynı fiyatlar) itinerary listesi."""
+    rng = random.Random(f"{route}|{dep}|{ret}")
+    target = scraper.TARGET_PRICES.get(route, 3000)
+    origin, dest = route.split("-")
+    items = []
+    for _ in range(rng.randint(4, 10)):
+        code, name = rng.choice(AIRLINES)
+        stops = 0 if rng.random() < 0.6 else 1
+        hub = rng.choice(HUBS)
+        legs = [[origin, hub], [hub, dest]] if stops else [[origin, dest]]
+        items.append({
+            "code": code, "airline": name, "legs": legs,
+            "duration": rng.randint(150, 300) + stops * rng.randint(90, 240),
+            "price": int(target * rng.uniform(0.6, 1.8)),
+        })
+    if config.rng.random() < config.deal_rate:
+        items[0]["price"] = int(target * rng.uniform(0.3, 0.5))
+    return sorted(items, key=lambda x: x["price"])
+
+
+def make_grid(route, dep, ret):
+    """Çapa tarihlerin ±3 gün çevresi (7×7) için hücre fiyatları."""
+    from datetime import date, timedelta
+    rng = random.Random(f"grid|{route}|{dep}|{ret}")
+    target = scraper.TARGET_PRICES.get(route, 3000)
+    d0, r0 = date.fromisoformat(dep), date.fromisoformat(ret)
+    cells = []
+    for i in range(-3, 4):
+        for j in range(-3, 4):
+            d, r = d0 + timedelta(days=i), r0 + timedelta(days=j)
+            if r > d:
+                cells.append([d.isoformat(), r.isoformat(), [[None, int(target * rng.uniform(0.7, 1.6))], "fake"]])
+    return cells
+
+
+def grid_body(cells):
+    chunk = json.dumps([["wrb.fr", None, json.dumps([None, [cells]]), None, None, None, "generic"]])
+    return f")]}}'\n\n{len(chunk)}\n{chunk}\n"
+
+
+def rpc_body(items):
+    """parse_results_payload'un beklediği batchexecute yanıtı."""
+    def row(it):
+        info = [it["code"], [it["airline"]], it["legs"], it["legs"][0][0],
+                None, None, it["legs"][-1][1], None, None, it["duration"]]
+        return [info, [[None, it["price"]], "fake"]]
+
+    best, other = items[:3], items[3:]
+    inner = [None, None, [[row(i) for i in best]], [[row(i) for i in other]]]
+    chunk = json.dumps([["wrb.fr", None, json.dumps(inner), None, None, None, "generic"]])
+    return f")]}}'\n\n{len(chunk)}\n{chunk}\n"
+
+
+# ============================================================
+# SAYFALAR
+# ============================================================
+RESULTS_JS = """
+setTimeout(function () {
+  fetch(%(rpc)s, {method: "POST"}).then(function (r) { return r.text(); }).then(function (t) {
+    var box = document.getElementById("results"), n = 0;
+    t.split("\\n").forEach(function (line) {
+      if (line.indexOf("[[") !== 0) return;
+      JSON.parse(line).forEach(function (e) {
+        if (e[0] !== "wrb.fr") return;
+        var data = JSON.parse(e[2]);
+        [data[2][0], data[3][0]].forEach(function (group) {
+          (group || []).forEach(function (it) {
+            var price = it[1][0][1].toLocaleString("tr-TR");
+            var stop = it[0][2].length > 1 ? "1 aktarma" : "Aktarmasız";
+            var li = document.createElement("li");
+            li.setAttribute("data-gs", "fake" + n++);
+            li.innerHTML = '<div class="YMlIz FpEdX"><span aria-label="' + price +
+              ' Türk lirası">₺' + price + '</span></div><div>' + it[0][1][0] + ' · ' + stop + '</div>';
+            box.appendChild(li);
+          });
+        });
+      });
+    });
+    if (!n) box.textContent = "Uçuş bulunamadı";
+  });
+}, 50);
+"""
+
+
+def results_page(title, rpc_url, grid_url=None):
+    js = RESULTS_JS % {"rpc": json.dumps(rpc_url)}
+    grid = (f'<button aria-label="Tarih tablosu" onclick=\'fetch({json.dumps(grid_url)}, {{method: "POST"}})\'>'
+            f'Tarih tablosu</button>') if grid_url else ""
+    return (f'<!doctype html><html lang="tr"><head><meta charset="utf-8"><title>{title}</title></head>'
+            f'<body>{grid}<ul id="results" role="main"></ul><script>{js}</script></body></html>')
+
+
+HOME_PAGE = ('<!doctype html><html lang="tr"><head><meta charset="utf-8"><title>Google Flights</title>'
+             '</head><body><div role="main">Uçuşlar</div></body></html>')
+
+SORRY_PAGE = ('<!doctype html><html><head><title>https://www.google.com/sorry/index</title></head><body>'
+              '<p>Our systems have detected unusual traffic from your computer network.</p>'
+              '<div class="g-recaptcha" data-sitekey="fake"></div>'
+              '<script src="https://www.google.com/recaptcha/api.js"></script></body></html>')
+
+
+def _city(code):
+    return {"IST": "İstanbul", "SAW": "İstanbul"}.get(code, scraper.AIRPORT_NAMES.get(code, code).split()[0])
+
+
+# ============================================================
+# HTTP
+# ============================================================
+class FakeFlightsHandler(BaseHTTPRequestHandler):
+    server_version = "FakeFlights/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _count(self, key):
+        with self.server.lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _send(self, status, body, ctype="text/html; charset=utf-8", headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay(self, ms):
+        if ms > 0:
+            time.sleep(ms * self.config.rng.uniform(0.5, 1.5) / 1000)
+
+    def do_POST(self):
+        self.do_GET()
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        qs = urllib.parse.parse_qs(url.query)
+        self._delay(self.config.latency_ms)
+
+        if url.path == "/__stats":
+            with self.server.lock:
+                return self._send(200, json.dumps(self.server.stats), "application/json")
+        if url.path.startswith("/sorry/"):
+            self._count("captcha_page")
+            return self._send(429, SORRY_PAGE)
+        if url.path == RPC_PATH:
+            return self._rpc(qs)
+        if url.path == GRID_PATH:
+            return self._grid(qs)
+        if url.path == "/travel/flights":
+            return self._search(qs)
+        self._count("not_found")
+        self._send(404, "not found", "text/plain")
+
+    def _search(self, qs):
+        q = (qs.get("q") or [""])[0]
+        if not q:
+            self._count("home")
+            return self._send(200, HOME_PAGE)
+
+        rng = self.config.rng
+        if rng.random() < self.config.captcha_rate:
+            self._count("captcha_redirect")
+            cont = urllib.parse.quote(f"/travel/flights?q={q}")
+            return self._send(302, "", headers={"Location": f"/sorry/index?continue={cont}"})
+
+        parsed = parse_query(q)
+        if parsed is None:
+            self._count("bad_query")
+            return self._send(200, results_page("Google Flights", RPC_PATH + "?empty=1"))
+        org, dst, dep, ret = parsed
+
+        if rng.random() < self.config.wrong_route_rate:
+            self._count("wrong_route")
+            title = f"{_city(org)} - Antalya | Google Flights"
+            return self._send(200, results_page(title, RPC_PATH + "?empty=1"))
+
+        fixture = FIXTURES / f"results_{org.lower()}_{dst.lower()}.html"
+        if self.config.recorded and fixture.exists():
+            self._count("recorded")
+            return self._send(200, fixture.read_text(encoding="utf-8"))
+
+        self._count("results")
+        title = f"{_city(org)} - {_city(dst)} | Google Flights"
+        params = urllib.parse.urlencode({"route": f"{org}-{dst}", "dep": dep or "", "ret": ret or ""})
+        self._send(200, results_page(title, f"{RPC_PATH}?{params}", f"{GRID_PATH}?{params}" if dep and ret else None))
+
+    def _rpc(self, qs):
+        self._delay(self.config.xhr_delay_ms)
+        route = (qs.get("route") or [""])[0]
+        if not route or "empty" in qs or self.config.rng.random() < self.config.empty_rate:
+            self._count("rpc_empty")
+            items = []
+        else:
+            self._count("rpc")
+            items = make_itineraries(route, (qs.get("dep") or [""])[0], (qs.get("ret") or [""])[0], self.config)
+        self._send(200, rpc_body(items), "application/json; charset=utf-8")
+
+
+    def _grid(self, qs):
+        self._delay(self.config.xhr_delay_ms)
+        self._count("grid")
+        route, dep, ret = ((qs.get(k) or [""])[0] for k in ("route", "dep", "ret"))
+        self._send(200, grid_body(make_grid(route, dep, ret)), "application/json; charset=utf-8")
+
+
+class FakeFlightsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, config):
+        super().__init__(addr, FakeFlightsHandler)
+        self.config = config
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Sunucuyu arka plan thread'inde başlatır; FakeFlightsServer döner (shutdown() ile kapatılır)."""
+    server = FakeFlightsServer((host, port), config or FakeConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_args(ap):
+    ap.add_argument("--latency-ms", type=int, default=150, help="her istek için ortalama gecikme")
+    ap.add_argument("--xhr-delay-ms", type=int, default=1200, help="sonuç XHR'ının ek gecikmesi")
+    ap.add_argument("--captcha-rate", type=float, default=0.0, help="/sorry/index yönlendirme oranı")
+    ap.add_argument("--wrong-route-rate", type=float, default=0.0, help="yanlış rota başlığı oranı")
+    ap.add_argument("--empty-rate", type=float, default=0.0, help="boş sonuç oranı")
+    ap.add_argument("--deal-rate", type=float, default=0.05, help="hedefin yarısı altı fiyat oranı")
+    ap.add_argument("--recorded", action="store_true", help="varsa kayıtlı fixture sayfalarını sun")
+    ap.add_argument("--seed", type=int, help="bozulma enjeksiyonu için rastgele tohum")
+
+
+def config_from_args(args):
+    return FakeConfig(
+        latency_ms=args.latency_ms, xhr_delay_ms=args.xhr_delay_ms,
+        captcha_rate=args.captcha_rate, wrong_route_rate=args.wrong_route_rate,
+        empty_rate=args.empty_rate, deal_rate=args.deal_rate,
+        recorded=args.recorded, seed=args.seed,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="TITAN yerel Flights test sunucusu")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    add_config_args(ap)
+    args = ap.parse_args()
+
+    server = FakeFlightsServer((args.host, args.port), config_from_args(args))
+    print(f"Fake Flights: {server.base_url}")
+    print(f"  export TITAN_FLIGHTS_BASE={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Sayaçlar: {json.dumps(server.stats, ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
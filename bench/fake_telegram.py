@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Yerel Telegram Bot API taklidi — alarm outbox'ını ağsız test etmek için.
+
+    python bench/fake_telegram.py --port 8766 --latency-ms 2000 --flood-rate 0.2
+    TITAN_TELEGRAM_API=http://127.0.0.1:8766 python scraper.py
+
+Sunulanlar:
+  /bot<token>/sendMessage    {"ok": true, ...}; ayarlara göre gecikme, 429
+                             (parameters.retry_after) veya 5xx döner
+  /__messages                alınan mesajlar (JSON)
+  /__stats                   sunucu sayaçları (JSON)
+
+Ayrıca chat başına --min-interval'dan sık gelen istekler gerçek API gibi
+429 ile reddedilir.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTelegramConfig:
+    """Sunucu davranışı; oranlar 0-1 arası olasılıktır."""
+
+    def __init__(self, latency_ms=50, flood_rate=0.0, error_rate=0.0,
+                 retry_after=2, min_interval=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.flood_rate = flood_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.min_interval = min_interval
+        self.rng = random.Random(seed)
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, key):
+        with self.server.lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def do_GET(self):
+        if self.path.startswith("/__messages"):
+            with self.server.lock:
+                return self._send(200, list(self.server.messages))
+        if self.path.startswith("/__stats"):
+            with self.server.lock:
+                return self._send(200, dict(self.server.stats))
+        self._send(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+    def do_POST(self):
+        cfg = self.server.config
+        if not self.path.endswith("/sendMessage"):
+            return self._send(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            return self._send(400, {"ok": False, "error_code": 400, "description": "Bad Request"})
+        chat = str(body.get("chat_id", ""))
+        if not chat or not body.get("text"):
+            self._count("bad_request")
+            return self._send(400, {"ok": False, "error_code": 400,
+                                    "description": "Bad Request: message text is empty"})
+
+        time.sleep(max(0.0, cfg.rng.gauss(cfg.latency_ms, cfg.latency_ms * 0.2)) / 1000)
+
+        now = time.monotonic()
+        with self.server.lock:
+            too_fast = now - self.server.last_by_chat.get(chat, -1e9) < cfg.min_interval
+            flood = too_fast or cfg.rng.random() < cfg.flood_rate
+            error = not flood and cfg.rng.random() < cfg.error_rate
+            if not flood and not error:
+                self.server.last_by_chat[chat] = now
+                self.server.messages.append({"chat_id": chat, "text": body["text"], "at": time.time()})
+        if flood:
+            self._count("429")
+            return self._send(429, {"ok": False, "error_code": 429,
+                                    "description": f"Too Many Requests: retry after {cfg.retry_after}",
+                                    "parameters": {"retry_after": cfg.retry_after}})
+        if error:
+            self._count("5xx")
+            return self._send(502, {"ok": False, "error_code": 502, "description": "Bad Gateway"})
+        self._count("ok")
+        self._send(200, {"ok": True, "result": {"message_id": len(self.server.messages),
+                                                "chat": {"id": chat}, "text": body["text"]}})
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, config):
+        super().__init__(addr, FakeTelegramHandler)
+        self.config = config
+        self.stats = {}
+        self.messages = []
+        self.last_by_chat = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Sunucuyu arka plan thread'inde başlatır; FakeTelegramServer döner (shutdown() ile kapatılır)."""
+    server = FakeTelegramServer((host, port), config or FakeTelegramConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_args(ap):
+    ap.add_argument("--tg-latency-ms", type=int, default=50, help="sendMessage ortalama gecikmesi")
+    ap.add_argument("--tg-flood-rate", type=float, default=0.0, help="rastgele 429 oranı")
+    ap.add_argument("--tg-error-rate", type=float, default=0.0, help="rastgele 5xx oranı")
+    ap.add_argument("--tg-retry-after", type=int, default=2, help="429 yanıtındaki retry_after (sn)")
+    ap.add_argument("--tg-min-interval", type=float, default=0.0, help="chat başına en kısa aralık (sn)")
+
+
+def config_from_args(args, seed=None):
+    return FakeTelegramConfig(
+        latency_ms=args.tg_latency_ms, flood_rate=args.tg_flood_rate,
+        error_rate=args.tg_error_rate, retry_after=args.tg_retry_after,
+        min_interval=args.tg_min_interval, seed=seed,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="TITAN yerel Telegram Bot API taklidi")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--seed", type=int)
+    add_config_args(ap)
+    args = ap.parse_args()
+
+    server = FakeTelegramServer((args.host, args.port), config_from_args(args, args.seed))
+    print(f"Fake Telegram: {server.base_url}")
+    print(f"  export TITAN_TELEGRAM_API={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Sayaçlar: {json.dumps(server.stats, ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Fiyat parse mikro-benchmark'ı — kayıtlı sayfa fixture'ları üzerinde.
+
+    python bench/parse_bench.py            # varsayılan 20 tekrar
+    python bench/parse_bench.py -n 100
+
+scraper.scan_page (tek geçiş) ile eski altı-regex + iki html.lower()
+yolunu (legacy_*) aynı sayfalarda karşılaştırır. Fiyat/sinyal sonuçları
+farklıysa satır "FARK" ile işaretlenir.
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import scraper  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+ROUTE_OF = {
+    "results_ist_cdg.html": "IST-CDG",
+    "results_ist_jfk.html": "IST-JFK",
+}
+
+
+# ── Eski yol (referans) ───────────────────────────────────────
+def legacy_extract(html, route):
+    mn, mx = scraper.BOUNDS.get(route, (100, 200000))
+    found = set()
+    patterns = [
+        (r'₺\s*([\d]{1,3}(?:[.,][\d]{3})*|[\d]{3,6})', True),
+        (r'([\d]{1,3}(?:[.,][\d]{3})+)\s*TL', True),
+        (r'"(\d{3,6})"\s*,\s*"TRY"', False),
+        (r'\[null,null,(\d{3,6})[,\]]', False),
+        (r',(\d{4,6}),(?:null|\d)', False),
+        (r'aria-label="[^"]*?(\d{1,3}(?:[.,]\d{3})+)\s*(?:TL|₺|Türk lirası)', True),
+    ]
+    for pat, strip in patterns:
+        for m in re.finditer(pat, html):
+            raw = m.group(1)
+            if strip:
+                raw = raw.replace(".", "").replace(",", "")
+            try:
+                p = float(raw)
+                if mn <= p <= mx: found.add(p)
+            except: pass
+    return sorted(found)[:5]
+
+
+def legacy_captcha(html, url):
+    for sig in ["unusual traffic", "/sorry/index", "recaptcha/api.js", "g-recaptcha",
+                "I'm not a robot", "Are you a robot", "confirm you're not a robot"]:
+        if sig.lower() in html.lower():
+            return True
+    return "/sorry/" in url
+
+
+def legacy_stopover(html):
+    # Referans kural: "Aktarmasız" / "nonstop" / "direkt" geçen yerler çıkarıldıktan sonra aktarma aranır
+    low = html.lower()
+    for kw in ["aktarmasız", "nonstop", "direkt"]:
+        low = low.replace(kw, " ")
+    kws = ["aktarma", "aktarmalı", "1 stop", "2 stop", "layover", "connecting"]
+    return any(kw in low for kw in kws)
+
+
+def legacy_all(html, route):
+    return legacy_extract(html, route), legacy_stopover(html), legacy_captcha(html, "")
+
+
+def single_pass(html, route):
+    scan = scraper.scan_page(html, route)
+    return scan["prices"], scan["has_stopover"], scan["captcha"]
+
+
+def _time(fn, html, route, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        out = fn(html, route)
+    return (time.perf_counter() - t0) / n, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("-n", type=int, default=20, help="sayfa başına tekrar")
+    args = ap.parse_args()
+
+    pages = sorted(FIXTURES.glob("*.html"))
+    if not pages:
+        print(f"Fixture yok: {FIXTURES}")
+        return 1
+
+    print(f"{'sayfa':<32} {'KB':>6} {'eski ms':>8} {'yeni ms':>8} {'hız':>6} {'MB/s':>7}  sonuç")
+    tot_old = tot_new = tot_bytes = 0.0
+    for path in pages:
+        html  = path.read_text(encoding="utf-8")
+        route = ROUTE_OF.get(path.name, "IST-CDG")
+        size  = len(html.encode("utf-8"))
+        t_old, r_old = _time(legacy_all, html, route, args.n)
+        t_new, r_new = _time(single_pass, html, route, args.n)
+        tot_old += t_old; tot_new += t_new; tot_bytes += size
+        same = "OK" if r_old == r_new else f"FARK eski={r_old} yeni={r_new}"
+        print(f"{path.name:<32} {size/1024:>6.0f} {t_old*1e3:>8.2f} {t_new*1e3:>8.2f} "
+              f"{t_old/t_new:>5.1f}x {size/t_new/1e6:>7.1f}  {same}")
+    print(f"{'TOPLAM':<32} {tot_bytes/1024:>6.0f} {tot_old*1e3:>8.2f} {tot_new*1e3:>8.2f} "
+          f"{tot_old/tot_new:>5.1f}x {tot_bytes/tot_new/1e6:>7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark + regresyon ölçümü — bench/fixtures corpus'u üzerinde.
+
+    python bench/run_bench.py                         # bench/results/<commit>.json yazar
+    python bench/run_bench.py -n 50 --out sonuc.json
+    python bench/run_bench.py --compare bench/results/eski.json
+
+Her parser için:
+  - hız     : sayfa/s, MB/s (ortalama, n tekrar)
+  - bellek  : tracemalloc tepe değeri (ayrı, tek tekrar)
+  - doğruluk: labels.json'daki fiyatlara göre precision / recall,
+              boolean sinyaller için isabet oranı
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import scraper  # noqa: E402
+
+BENCH    = Path(__file__).resolve().parent
+FIXTURES = BENCH / "fixtures"
+RESULTS  = BENCH / "results"
+
+
+# ============================================================
+# CORPUS
+# ============================================================
+def load_corpus():
+    labels = json.loads((FIXTURES / "labels.json").read_text(encoding="utf-8"))
+    corpus = []
+    for name, label in labels.items():
+        path = FIXTURES / name
+        if not path.exists():
+            print(f"  [!] Eksik fixture: {name}")
+            continue
+        raw = path.read_text(encoding="utf-8")
+        corpus.append({"name": name, "raw": raw, "size": len(raw.encode("utf-8")), **label})
+    return corpus
+
+
+def _quiet(fn, *args):
+    """extract_prices_from_html log basar; ölçümde stdout yutulur."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+# ============================================================
+# ÖLÇÜLEN FONKSİYONLAR
+# ============================================================
+# ad → (hangi fixture türleri, çalıştırıcı, sonuç tipi[, girdi boyutu])
+#   "prices": fiyat listesi döner, labels["prices"] ile karşılaştırılır
+#   "<alan>": bool döner, labels[alan] ile karşılaştırılır
+#   girdi boyutu verilmezse tüm fixture boyutu (MB/s için) kullanılır
+HTML_KINDS = {"results", "wrong_destination", "empty", "captcha"}
+
+TARGETS = {
+    "extract_prices_from_html": (
+        HTML_KINDS, lambda f: _quiet(scraper.extract_prices_from_html, f["raw"], f["route"]), "prices"),
+    "scan_page": (
+        HTML_KINDS, lambda f: scraper.scan_page(f["raw"], f["route"], f.get("url", ""))["prices"], "prices"),
+    "is_real_captcha": (
+        HTML_KINDS, lambda f: scraper.is_real_captcha(f["raw"], f.get("url", ""))[0], "captcha"),
+    "detect_stopover": (
+        HTML_KINDS, lambda f: scraper.detect_stopover(f["raw"]), "stopover"),
+    "is_wrong_destination": (
+        HTML_KINDS, lambda f: scraper.is_wrong_destination(
+            f["title"], *f["route"].split("-")), "wrong_destination",
+        lambda f: len(f["title"].encode("utf-8"))),
+    "parse_dom_texts": (
+        {"dom"}, lambda f: [r["price"] for r in scraper.parse_dom_texts(
+            json.loads(f["raw"])["texts"], f["route"])], "prices"),
+    "parse_results_payload": (
+        {"rpc"}, lambda f: [r["price"] for r in scraper.parse_results_payload(f["raw"])], "prices"),
+    "parse_grid_payload": (
+        {"grid"}, lambda f: [p for _, _, p in scraper.parse_grid_payload(f["raw"])], "prices"),
+}
+
+
+def _score(kind, outputs):
+    """outputs: [(label, sonuç)] → doğruluk metrikleri."""
+    if kind == "prices":
+        tp = fp = fn = 0
+        for label, got in outputs:
+            want = set(float(p) for p in label["prices"])
+            got  = set(float(p) for p in got)
+            tp += len(want & got)
+            fp += len(got - want)
+            fn += len(want - got)
+        return {
+            "precision": round(tp / (tp + fp), 4) if tp + fp else 1.0,
+            "recall":    round(tp / (tp + fn), 4) if tp + fn else 1.0,
+            "tp": tp, "fp": fp, "fn": fn,
+        }
+    hits = sum(1 for label, got in outputs if bool(got) == bool(label[kind]))
+    misses = [label["name"] for label, got in outputs if bool(got) != bool(label[kind])]
+    return {"accuracy": round(hits / len(outputs), 4), "misses": misses}
+
+
+def run_target(name, corpus, n):
+    kinds, fn, kind, *rest = TARGETS[name]
+    sizer = rest[0] if rest else (lambda f: f["size"])
+    pages = [f for f in corpus if f["kind"] in kinds]
+    if not pages:
+        return None
+
+    outputs = [(f, fn(f)) for f in pages]   # ısınma + doğruluk
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for f in pages:
+            fn(f)
+    elapsed = (time.perf_counter() - t0) / n
+
+    tracemalloc.start()
+    for f in pages:
+        fn(f)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = sum(sizer(f) for f in pages)
+    return {
+        "pages": len(pages),
+        "bytes": size,
+        "seconds_per_pass": round(elapsed, 6),
+        "pages_per_s": round(len(pages) / elapsed, 1),
+        "mb_per_s": round(size / elapsed / 1e6, 2),
+        "peak_mem_kb": round(peak / 1024, 1),
+        **_score(kind, outputs),
+    }
+
+
+# ============================================================
+# RAPOR
+# ============================================================
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def print_table(results, baseline=None):
+    print(f"{'fonksiyon':<26} {'sayfa/s':>9} {'MB/s':>7} {'tepe KB':>8}  doğruluk")
+    for name, r in results["targets"].items():
+        if r is None:
+            continue
+        if "precision" in r:
+            acc = f"P={r['precision']:.2f} R={r['recall']:.2f}"
+        else:
+            acc = f"isabet={r['accuracy']:.2f}" + (f" ✗ {', '.join(r['misses'])}" if r["misses"] else "")
+        delta = ""
+        old = (baseline or {}).get("targets", {}).get(name)
+        if old:
+            delta = f"  ({r['pages_per_s'] / old['pages_per_s'] - 1:+.0%} hız)"
+        print(f"{name:<26} {r['pages_per_s']:>9.1f} {r['mb_per_s']:>7.1f} {r['peak_mem_kb']:>8.0f}  {acc}{delta}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="TITAN offline parser benchmark")
+    ap.add_argument("-n", type=int, default=20, help="zamanlama tekrarı")
+    ap.add_argument("--out", help="sonuç JSON yolu (varsayılan bench/results/<commit>.json)")
+    ap.add_argument("--compare", help="karşılaştırılacak eski sonuç JSON")
+    args = ap.parse_args()
+
+    corpus = load_corpus()
+    if not corpus:
+        print("Corpus boş.")
+        return 1
+
+    commit = _git_commit()
+    results = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "repeat": args.n,
+        "corpus": {f["name"]: {"kind": f["kind"], "bytes": f["size"]} for f in corpus},
+        "targets": {name: run_target(name, corpus, args.n) for name in TARGETS},
+    }
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"Karşılaştırma: {baseline.get('commit')} → {commit}")
+    print_table(results, baseline)
+
+    out = Path(args.out) if args.out else RESULTS / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nSonuç: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
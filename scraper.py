@@ -8,14 +8,20 @@ PROJECT TITAN v6.1 — Playwright Edition (Form Interaction)
   - Stealth iyileştirildi: rastgele mouse hareketi, typing delay
 """
 
+import asyncio
+import contextlib
+import contextvars
 import json
 import re
 import random
+import shutil
 import time
 import os
 import sys
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
+from types import MappingProxyType
 
 # ============================================================
 # KONFİGÜRASYON
@@ -23,60 +29,273 @@ from pathlib import Path
 BOT_TOKEN = os.environ.get("TITAN_BOT_TOKEN", "8161806410:AAH4tGpW_kCvQpLOfaB-r2OYQMypPVYtuYg")
 ADMIN_ID  = os.environ.get("TITAN_ADMIN_ID",  "7684228928")
 GROUP_ID  = os.environ.get("TITAN_GROUP_ID",  "-1003515302846")
+TELEGRAM_API_BASE = os.environ.get("TITAN_TELEGRAM_API", "https://api.telegram.org").rstrip("/")
 
 DIRECT_THRESHOLD   = 0.50
 STOPOVER_THRESHOLD = 0.10
 MAX_DATA_AGE_HOURS = 3
 HEADLESS           = True
 PAGE_TIMEOUT_MS    = 60_000
-RENDER_WAIT_MS     = 10_000   # Arama sonuçları yüklenmesi için bekleme
-
-TARGET_PRICES = {
-    "IST-CDG": 3000, "IST-LHR": 3200, "IST-AMS": 2800,
-    "IST-BCN": 2900, "IST-FCO": 2600, "IST-MAD": 3100,
-    "IST-FRA": 2700, "IST-MUC": 2500, "IST-VIE": 2400,
-    "IST-PRG": 2600, "IST-ATH": 1800, "IST-DXB": 2200,
-    "IST-JFK": 18000, "IST-LAX": 20000,
-    "SAW-CDG": 2800, "SAW-LHR": 3000, "SAW-AMS": 2600,
-    "SAW-BCN": 2700, "SAW-FCO": 2400,
-}
+READY_TIMEOUT_MS   = 25_000   # Sonuçların yüklenmesi için üst sınır (eski 10+12+3 sn)
+READY_SETTLE_MS    = 800      # Sonuç sinyali sonrası kalan fiyatların render payı
+CAPTURE_RPC        = os.environ.get("TITAN_CAPTURE_RPC", "1") != "0"   # Sonuç RPC'sini ağdan yakala
+CONCURRENCY        = int(os.environ.get("TITAN_CONCURRENCY", "3"))   # Paralel arama sayısı
+HOST_MIN_INTERVAL_S = float(os.environ.get("TITAN_HOST_INTERVAL_S", "4"))  # Aynı host'a iki istek arası
+HOST_JITTER_S      = 3.0
+RUN_BUDGET_S       = int(os.environ.get("TITAN_RUN_BUDGET_S", str(75 * 60)))  # workflow 90 dk limitinin altında
+FLIGHTS_BASE_URL   = os.environ.get("TITAN_FLIGHTS_BASE", "https://www.google.com").rstrip("/")  # Yerel test sunucusu için
+DATA_DIR           = Path(os.environ.get("TITAN_DATA_DIR", "data"))   # Fiyat geçmişi ve rota istatistikleri
+SEARCH_BUDGET      = int(os.environ.get("TITAN_SEARCH_BUDGET", "0"))  # Run başına arama; 0 → tüm çiftler (öncelik sırasıyla)
+SCAN_MODE          = os.environ.get("TITAN_SCAN_MODE", "dates")     # "dates": tarih çifti başına arama, "grid": tarih tablosu
+GRID_ANCHORS       = int(os.environ.get("TITAN_GRID_ANCHORS", "2"))  # grid modunda rota başına tablo sayısı
+GRID_VERIFY_MAX    = 2        # Eşik altı tablo hücresi bu kadar tam aramayla doğrulanır
+ALARM_DIGEST       = os.environ.get("TITAN_ALARM_DIGEST", "1") != "0"   # Alarmlar run sonunda tek özet mesajda
+IMMEDIATE_PCT      = int(os.environ.get("TITAN_IMMEDIATE_PCT", "70"))   # Hedefin bu % altı beklemeden gönderilir; 0 → kapalı
+OUTBOX_MAX_AGE_H   = float(os.environ.get("TITAN_OUTBOX_MAX_AGE_H", "24"))  # Bundan eski bekleyen mesaj gönderilmez; 0 → süresiz
+ANOMALY_Z_ALARM    = float(os.environ.get("TITAN_ANOMALY_Z", "-2.5"))  # Rota geçmişine göre bu z altı hedef aşılsa da alarm
+CONST_FILTER       = os.environ.get("TITAN_CONST_FILTER", "1") != "0"  # Birçok rotada aynı çıkan DOM/HTML fiyatını ele
+SCRAPE_CACHE_ENABLED = os.environ.get("TITAN_SCRAPE_CACHE", "1") != "0"  # Taze çift / format sonuçlarını yeniden tarama
+STRATEGY_MAX_FAILS = int(os.environ.get("TITAN_STRATEGY_MAX_FAILS", "5"))  # Rotada art arda bu kadar boş dönen strateji atlanır; 0 → kapalı
+TRACE_ENABLED      = os.environ.get("TITAN_TRACE", "1") != "0"      # Run başına aşama süreleri (Chrome trace JSON)
+TRACE_DIR          = Path(os.environ.get("TITAN_TRACE_DIR", "traces"))
+SHARD_ROOT         = Path(os.environ.get("TITAN_SHARD_DIR", "shards"))   # --shard i/N çıktıları, --merge girdisi
+ROUTES_FILE        = Path(os.environ.get("TITAN_ROUTES_FILE", Path(__file__).with_name("routes.json")))  # Rotalar, hedefler, havalimanları
+WATCH_INTERVAL_S   = int(os.environ.get("TITAN_WATCH_INTERVAL_S", str(30 * 60)))   # --watch: iki tarama arası
 
-ROUTES = list(TARGET_PRICES.keys())
+# ============================================================
+# ROTA KONFİGÜRASYONU (routes.json)
+# ============================================================
+class RouteConfigError(ValueError):
+    """routes.json okunamadı veya geçersiz; tüm sorunlar tek mesajda listelenir."""
+
+
+@dataclass(frozen=True, slots=True)
+class DateStrategy:
+    """Rotanın aranacak tarih çiftleri: `weeks` hafta sonrasındaki ilk `weekday` günü gidiş, `nights` gece."""
+    weeks: tuple = (2, 3, 4, 5, 6, 8, 10, 12, 14, 16)
+    weekday: int = 4      # 0 = Pazartesi; 4 → Cuma gidiş
+    nights: int = 3       # Cuma + 3 → Pazartesi dönüş
+
+    def pairs(self, base=None):
+        base = base or datetime.now()
+        out = []
+        for w in self.weeks:
+            d = base + timedelta(weeks=w)
+            dep = d + timedelta(days=(self.weekday - d.weekday()) % 7)
+            out.append((dep.strftime("%Y-%m-%d"), (dep + timedelta(days=self.nights)).strftime("%Y-%m-%d")))
+        return out
+
+
+@dataclass(frozen=True, slots=True)
+class RouteConfig:
+    route: str                      # "IST-CDG"
+    target: int                     # Hedef fiyat (TL)
+    bounds: tuple                   # (min, max) — dışındaki fiyat ayrıştırma hatası sayılır
+    priority: float = 1.0           # Planlayıcı puan çarpanı; > 1 → bütçeden daha çok pay
+    dates: DateStrategy = DateStrategy()
+
+
+@dataclass(frozen=True, slots=True)
+class Airport:
+    code: str
+    name: str                       # Arama formuna yazılan tam ad
+    aliases: tuple = ()             # Sayfa başlığında görülebilecek diğer adlar ("Roma", "Münih")
+
+
+@dataclass(frozen=True, slots=True)
+class RoutesConfig:
+    routes: MappingProxyType        # rota → RouteConfig, dosya sırasıyla
+    airports: MappingProxyType      # kod → Airport
+    schengen: frozenset
+    visa_warn: frozenset
+    dates: DateStrategy = DateStrategy()   # defaults.dates — rotası olmayan tarih listesi
+    path: Path = None
+    mtime: float = 0.0
+
+
+_ROUTE_KEY_RE  = re.compile(r"^[A-Z]{3}-[A-Z]{3}$")
+_IATA_RE       = re.compile(r"^[A-Z]{3}$")
+_CONFIG_KEYS   = {"defaults", "routes", "airports", "schengen", "visa_warn"}
+_ROUTE_FIELDS  = {"bounds", "priority", "dates"}   # + "target" (yalnız rotada)
+_DATE_FIELDS   = {"weeks", "weekday", "nights"}
+
+
+def _is_num(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _unique_keys(pairs):
+    """json object_pairs_hook: aynı anahtar iki kez yazılmışsa sessizce ezilmez."""
+    out = {}
+    for k, v in pairs:
+        if k in out:
+            raise RouteConfigError(f"{k!r} iki kez tanımlı")
+        out[k] = v
+    return out
+
+
+def _unknown(raw, allowed, where, errors):
+    for k in sorted(raw.keys() - allowed):
+        errors.append(f"{where}: bilinmeyen alan {k!r}")
+
+
+def _parse_route_fields(raw, base, where, errors):
+    """defaults veya tek rota alanları → (bounds, priority, dates); hatalı alan base'den alınır."""
+    bounds, priority, dates = base
+    _unknown(raw, _ROUTE_FIELDS, where, errors)
+    if "bounds" in raw:
+        b = raw["bounds"]
+        if isinstance(b, list) and len(b) == 2 and all(_is_num(x) for x in b) and 0 < b[0] < b[1]:
+            bounds = (b[0], b[1])
+        else:
+            errors.append(f"{where}.bounds: [min, max] olmalı (0 < min < max)")
+    if "priority" in raw:
+        if _is_num(raw["priority"]) and raw["priority"] > 0:
+            priority = float(raw["priority"])
+        else:
+            errors.append(f"{where}.priority: pozitif sayı olmalı")
+    if "dates" in raw:
+        d = raw["dates"]
+        if not isinstance(d, dict):
+            errors.append(f"{where}.dates: nesne olmalı")
+        else:
+            _unknown(d, _DATE_FIELDS, f"{where}.dates", errors)
+            weeks, weekday, nights = d.get("weeks", dates.weeks), d.get("weekday", dates.weekday), d.get("nights", dates.nights)
+            if not (isinstance(weeks, (list, tuple)) and weeks
+                    and all(isinstance(w, int) and not isinstance(w, bool) and 0 <= w <= 52 for w in weeks)):
+                errors.append(f"{where}.dates.weeks: 0-52 arası tam sayı listesi olmalı")
+                weeks = dates.weeks
+            if not (isinstance(weekday, int) and not isinstance(weekday, bool) and 0 <= weekday <= 6):
+                errors.append(f"{where}.dates.weekday: 0 (Pzt) - 6 (Paz) olmalı")
+                weekday = dates.weekday
+            if not (isinstance(nights, int) and not isinstance(nights, bool) and 1 <= nights <= 30):
+                errors.append(f"{where}.dates.nights: 1-30 olmalı")
+                nights = dates.nights
+            dates = DateStrategy(tuple(sorted(set(weeks))), weekday, nights)
+    return bounds, priority, dates
+
+
+def parse_routes_config(raw, path=None, mtime=0.0):
+    """
+    routes.json içeriği → RoutesConfig. Bütün dosya doğrulanır; hata varsa hepsi
+    tek RouteConfigError'da listelenir (ilk hatada durulmaz).
+    """
+    errors = []
+    if not isinstance(raw, dict):
+        raise RouteConfigError("kök nesne olmalı")
+    _unknown(raw, _CONFIG_KEYS, "routes.json", errors)
+
+    airports = {}
+    for code, a in (raw.get("airports") or {}).items():
+        where = f"airports.{code}"
+        if not _IATA_RE.match(code):
+            errors.append(f"{where}: 3 harfli büyük IATA kodu olmalı")
+        if not isinstance(a, dict) or not isinstance(a.get("name"), str) or not a["name"].strip():
+            errors.append(f"{where}: {{\"name\": ...}} olmalı")
+            continue
+        _unknown(a, {"name", "aliases"}, where, errors)
+        aliases = a.get("aliases", [])
+        if not (isinstance(aliases, list) and all(isinstance(x, str) and x.strip() for x in aliases)):
+            errors.append(f"{where}.aliases: metin listesi olmalı")
+            aliases = []
+        airports[code] = Airport(code, a["name"], tuple(aliases))
+
+    base = _parse_route_fields(raw.get("defaults") or {}, ((100, 200000), 1.0, DateStrategy()), "defaults", errors)
+    routes = {}
+    for key, r in (raw.get("routes") or {}).items():
+        where = f"routes.{key}"
+        if not _ROUTE_KEY_RE.match(key) or key[:3] == key[4:]:
+            errors.append(f"{where}: \"XXX-YYY\" biçiminde, farklı iki IATA kodu olmalı")
+            continue
+        for code in (key[:3], key[4:]):
+            if code not in airports:
+                errors.append(f"{where}: {code} airports içinde tanımlı değil")
+        if not isinstance(r, dict):
+            errors.append(f"{where}: nesne olmalı")
+            continue
+        bounds, priority, dates = _parse_route_fields({k: v for k, v in r.items() if k != "target"},
+                                                      base, where, errors)
+        target = r.get("target")
+        if not (_is_num(target) and target > 0):
+            errors.append(f"{where}.target: pozitif sayı olmalı")
+            continue
+        if not bounds[0] <= target <= bounds[1]:
+            errors.append(f"{where}.target: {target} sınırların ({bounds[0]}-{bounds[1]}) dışında")
+        routes[key] = RouteConfig(key, target, bounds, priority, dates)
+    if not routes and not errors:
+        errors.append("routes: en az bir rota olmalı")
+
+    sets = {}
+    for name in ("schengen", "visa_warn"):
+        codes = raw.get(name, [])
+        if not (isinstance(codes, list) and all(isinstance(c, str) and _IATA_RE.match(c) for c in codes)):
+            errors.append(f"{name}: IATA kodu listesi olmalı")
+            codes = []
+        sets[name] = frozenset(codes)
+
+    if errors:
+        where = f"{path}: " if path else ""
+        raise RouteConfigError(f"{where}{len(errors)} hata\n" + "\n".join(f"  - {e}" for e in errors))
+    return RoutesConfig(MappingProxyType(routes), MappingProxyType(airports),
+                        sets["schengen"], sets["visa_warn"], base[2], Path(path) if path else None, mtime)
+
+
+def load_routes_config(path=ROUTES_FILE):
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime
+        text = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise RouteConfigError(f"{path}: okunamadı ({e})")
+    try:
+        raw = json.loads(text, object_pairs_hook=_unique_keys)
+    except ValueError as e:    # RouteConfigError (yinelenen anahtar) dahil
+        raise RouteConfigError(f"{path}: geçersiz JSON ({e})")
+    return parse_routes_config(raw, path, mtime)
 
-BOUNDS = {
-    "IST-CDG":(150,15000),  "IST-LHR":(150,16000),  "IST-AMS":(150,14000),
-    "IST-BCN":(150,14000),  "IST-FCO":(150,13000),  "IST-MAD":(150,15000),
-    "IST-FRA":(150,13000),  "IST-MUC":(150,13000),  "IST-VIE":(150,12000),
-    "IST-PRG":(150,13000),  "IST-ATH":(100,10000),  "IST-DXB":(150,12000),
-    "IST-JFK":(1000,80000), "IST-LAX":(1000,90000),
-    "SAW-CDG":(150,15000),  "SAW-LHR":(150,16000),  "SAW-AMS":(150,14000),
-    "SAW-BCN":(150,14000),  "SAW-FCO":(150,13000),
-}
 
-# Tam havalimanı adları — arama formuna yazılacak
-AIRPORT_NAMES = {
-    "IST": "Istanbul Ataturk",
-    "SAW": "Istanbul Sabiha",
-    "CDG": "Paris Charles de Gaulle",
-    "LHR": "London Heathrow",
-    "AMS": "Amsterdam",
-    "BCN": "Barcelona",
-    "FCO": "Rome Fiumicino",
-    "MAD": "Madrid",
-    "FRA": "Frankfurt",
-    "MUC": "Munich",
-    "VIE": "Vienna",
-    "PRG": "Prague",
-    "ATH": "Athens",
-    "DXB": "Dubai",
-    "JFK": "New York JFK",
-    "LAX": "Los Angeles",
-}
+def apply_routes_config(cfg, shard=None):
+    """
+    Konfigürasyonu etkin yapar; eski modül adları ondan türetilir (kod bunları
+    doğrudan okur). shard=(i, N) → ROUTES o parçanın rotaları.
+    """
+    global ROUTE_CONFIG, TARGET_PRICES, ROUTES, BOUNDS, AIRPORT_NAMES, AIRPORT_ALIASES, SCHENGEN, VISA_WARN
+    ROUTE_CONFIG  = cfg
+    TARGET_PRICES = {r: rc.target for r, rc in cfg.routes.items()}
+    BOUNDS        = {r: rc.bounds for r, rc in cfg.routes.items()}
+    ROUTES        = list(cfg.routes)
+    if shard:
+        ROUTES = shard_routes(ROUTES, *shard)
+    AIRPORT_NAMES   = {c: a.name for c, a in cfg.airports.items()}
+    AIRPORT_ALIASES = {c: a.aliases for c, a in cfg.airports.items()}
+    SCHENGEN  = cfg.schengen
+    VISA_WARN = cfg.visa_warn
+
+
+def reload_routes_config(shard=None):
+    """routes.json değiştiyse yeniden yükler. Geçersizse eski konfigürasyon kalır. Yüklendiyse True."""
+    try:
+        if ROUTE_CONFIG.path.stat().st_mtime == ROUTE_CONFIG.mtime:
+            return False
+        cfg = load_routes_config(ROUTE_CONFIG.path)
+    except OSError:
+        return False
+    except RouteConfigError as e:
+        print(f"  [ROTA] Değişiklik yüklenmedi, önceki konfigürasyon geçerli — {e}")
+        return False
+    old = set(ROUTE_CONFIG.routes)
+    apply_routes_config(cfg, shard)
+    print(f"  [ROTA] {cfg.path.name} yeniden yüklendi: {len(cfg.routes)} rota "
+          f"(+{len(cfg.routes.keys() - old)} / -{len(old - cfg.routes.keys())})")
+    return True
 
-SCHENGEN = {"CDG","ORY","AMS","EIN","BCN","MAD","FCO","MXP","LIN","FRA","MUC",
-            "TXL","BER","VIE","PRG","ATH","SKG","LIS","ARN","GOT","CPH","HEL",
-            "OSL","ZUR","GVA","BRU","WAW","KRK","BUD","SOF","OTP","RIX","TLL","VNO","LJU","SKP"}
-VISA_WARN = {"LHR","LGW","STN","MAN","JFK","LAX","ORD","MIA","SFO","BOS","IAD","YYZ","YVR"}
+
+try:
+    apply_routes_config(load_routes_config())
+except RouteConfigError as e:
+    if __name__ != "__main__":
+        raise
+    sys.exit(f"[ROTA] {e}")
 
 # ============================================================
 # YARDIMCI FONKSİYONLAR
@@ -86,15 +305,18 @@ def get_visa_status(dest):
     if dest.upper() in VISA_WARN: return "⚠️ VİZE GEREKLİ (UK/ABD/Kanada)"
     return "ℹ️ Vize durumu kontrol edilmeli"
 
-def get_search_dates():
-    dates = []
-    base = datetime.now()
-    for w in [2, 3, 4, 5, 6, 8, 10, 12, 14, 16]:
-        d = base + timedelta(weeks=w)
-        fri = d + timedelta(days=(4 - d.weekday()) % 7)
-        mon = fri + timedelta(days=3)
-        dates.append((fri.strftime("%Y-%m-%d"), mon.strftime("%Y-%m-%d")))
-    return dates
+def get_search_dates(route=None):
+    """Rotanın tarih çiftleri (routes.json "dates"); rota verilmezse defaults.dates."""
+    rc = ROUTE_CONFIG.routes.get(route)
+    return (rc.dates if rc else ROUTE_CONFIG.dates).pairs()
+
+def flights_url(query=None):
+    """Taranan Flights arama adresi; FLIGHTS_BASE_URL ile yerel sunucuya yönlendirilebilir."""
+    import urllib.parse
+    url = f"{FLIGHTS_BASE_URL}/travel/flights?hl=tr&curr=TRY&gl=TR"
+    if query:
+        url += f"&q={urllib.parse.quote(query)}"
+    return url
 
 def build_short_url(origin, dest, dep, ret):
     import urllib.parse
@@ -115,62 +337,207 @@ def is_fresh(scraped_at):
     return (datetime.now() - scraped_at).total_seconds() < MAX_DATA_AGE_HOURS * 3600
 
 # ============================================================
-# FİYAT PARSE
+# İZLEME (aşama süreleri)
 # ============================================================
-def extract_prices_from_html(html, route):
-    mn, mx = BOUNDS.get(route, (100, 200000))
-    found = set()
+TRACE_KEEP = 20   # traces/ altında tutulan son trace dosyası
 
-    # Yöntem 1: ₺ sembolü (rendered HTML)
-    for m in re.finditer(r'₺\s*([\d]{1,3}(?:[.,][\d]{3})*|[\d]{3,6})', html):
-        raw = m.group(1).replace(".", "").replace(",", "")
-        try:
-            p = float(raw)
-            if mn <= p <= mx: found.add(p)
-        except: pass
+# Worker task'ı / thread başına geçerli etiketler (rota, tarih) ve şerit numarası
+_TRACE_TAGS = contextvars.ContextVar("titan_trace_tags", default={})
+_TRACE_LANE = contextvars.ContextVar("titan_trace_lane", default=0)
 
-    # Yöntem 2: "X TL" formatı
-    for m in re.finditer(r'([\d]{1,3}(?:[.,][\d]{3})+)\s*TL', html):
-        raw = m.group(1).replace(".", "").replace(",", "")
-        try:
-            p = float(raw)
-            if mn <= p <= mx: found.add(p)
-        except: pass
 
-    # Yöntem 3: JSON "fiyat","TRY" pattern
-    for m in re.finditer(r'"(\d{3,6})"\s*,\s*"TRY"', html):
-        try:
-            p = float(m.group(1))
-            if mn <= p <= mx: found.add(p)
-        except: pass
+class Tracer:
+    """
+    Run boyunca aşama süreleri. start() çağrılana kadar kayıt yapılmaz
+    (bench'ler ve tek seferlik çağrılar etkilenmez).
+
+        with TRACER.span("page.goto") as sp:
+            await page.goto(url)
+            sp["status"] = ...          # Olaya ek bilgi
+
+    Span'ler bulunduğu worker'ın etiketlerini (route/dep/ret, tag() ile) ve
+    şeridini (lane() ile) taşır. flush() traces/trace-<zaman>.json'a Chrome
+    trace biçiminde yazar — chrome://tracing veya ui.perfetto.dev ile açılır,
+    her worker ayrı satırda görünür. summary() aşama bazında adet / p50 / p95 /
+    toplam süre tablosu döner.
+    """
 
-    # Yöntem 4: [null,null,FIYAT] JSON array (Google Flights iç veri)
-    for m in re.finditer(r'\[null,null,(\d{3,6})[,\]]', html):
+    def __init__(self, out_dir=TRACE_DIR):
+        self.out_dir = Path(out_dir)
+        self.active = False
+        self.events = []
+        self.lanes = {0: "main"}
+        self.path = None
+        self._t0 = 0.0
+
+    def start(self):
+        self.active = True
+        self.events = []
+        self._t0 = time.perf_counter()
+        self.path = self.out_dir / f"trace-{datetime.now():%Y%m%d-%H%M%S}.json"
+
+    @staticmethod
+    def tag(**tags):
+        """Geçerli task/thread'in sonraki span'lerine etiket ekler."""
+        _TRACE_TAGS.set({**_TRACE_TAGS.get(), **tags})
+
+    def lane(self, tid, name):
+        """Geçerli task/thread'in span'leri trace'te `name` satırında görünür."""
+        _TRACE_LANE.set(tid)
+        self.lanes[tid] = name
+
+    @contextlib.contextmanager
+    def span(self, name, **tags):
+        if not self.active:
+            yield {}
+            return
+        args = {**_TRACE_TAGS.get(), **tags}
+        t = time.perf_counter()
         try:
-            p = float(m.group(1))
-            if mn <= p <= mx: found.add(p)
-        except: pass
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            self.events.append({"name": name, "ph": "X", "pid": 1, "tid": _TRACE_LANE.get(),
+                                "ts": round((t - self._t0) * 1e6), "dur": round((end - t) * 1e6),
+                                "args": args})
+
+    def summary(self):
+        """Aşama bazında (adet, p50, p95, toplam) — toplam süreye göre azalan."""
+        by_name = {}
+        for ev in self.events:
+            by_name.setdefault(ev["name"], []).append(ev["dur"] / 1e6)
+        rows = sorted(by_name.items(), key=lambda kv: -sum(kv[1]))
+        if not rows:
+            return []
+        lines = [f"  [İZ] {'aşama':<18} {'adet':>5} {'p50':>7} {'p95':>7} {'toplam':>8}"]
+        for name, secs in rows:
+            secs.sort()
+            p50 = secs[len(secs) // 2]
+            p95 = secs[min(len(secs) - 1, int(len(secs) * 0.95))]
+            lines.append(f"  [İZ] {name:<18} {len(secs):>5} {p50:>6.2f}s {p95:>6.2f}s {sum(secs):>7.1f}s")
+        return lines
+
+    def flush(self):
+        """Trace dosyasını (atomik) yazar; eski dosyalar TRACE_KEEP'e budanır."""
+        if not self.active or self.path is None:
+            return None
+        meta = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+                for tid, name in sorted(self.lanes.items())]
+        meta.append({"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "titan"}})
+        _atomic_write(self.path, json.dumps({"traceEvents": meta + list(self.events),
+                                             "displayTimeUnit": "ms"}, ensure_ascii=False))
+        for old in sorted(self.out_dir.glob("trace-*.json"))[:-TRACE_KEEP]:
+            try: old.unlink()
+            except OSError: pass
+        return self.path
+
+
+TRACER = Tracer()
 
-    # Yöntem 5: Google Flights proto data — [["IST","CDG",...],FIYAT,
-    for m in re.finditer(r',(\d{4,6}),(?:null|\d)', html):
-        try:
-            p = float(m.group(1))
-            if mn <= p <= mx: found.add(p)
-        except: pass
+# ============================================================
+# FİYAT PARSE
+# ============================================================
+# Fiyat kalıpları — modül yüklenirken bir kez derlenir.
+# (yöntem adı, regex, binlik ayıracı temizlensin mi)
+# Not: Hepsini tek alternation'da birleştirmek CPython re'de literal önek
+# optimizasyonunu kapatıyor ve ölçümde 3-4x yavaş; ayrı derlenmiş kalıplar
+# kendi önek karakterlerine (₺, ", [, ,) hızla atlıyor.
+_PRICE_PATTERNS = [
+    ("tl_symbol",  re.compile(r'₺\s*([\d]{1,3}(?:[.,][\d]{3})*|[\d]{3,6})'), True),
+    ("tl_suffix",  None, True),   # aşağıdaki _TL_SUFFIX_RE ile
+    ("json_try",   re.compile(r'"(\d{3,6})"\s*,\s*"TRY"'), False),
+    ("json_array", re.compile(r'\[null,null,(\d{3,6})[,\]]'), False),
+    ("proto",      re.compile(r',(\d{4,6}),(?:null|\d)'), False),
+    ("aria_label", re.compile(r'aria-label="[^"]*?(\d{1,3}(?:[.,]\d{3})+)\s*(?:TL|₺|Türk lirası)'), True),
+]
+# "X TL": rakamla başlayan kalıp her rakamda denenir (yavaş). Önce "TL"
+# geçişleri bulunur, fiyat sadece önündeki kısa pencerede aranır.
+_TL_SUFFIX_RE = re.compile(r'TL')
+_TL_PRICE_RE  = re.compile(r'([\d]{1,3}(?:[.,][\d]{3})+)\s*$')
+
+_CAPTCHA_SIGNALS = [
+    "unusual traffic",
+    "/sorry/index",
+    "recaptcha/api.js",
+    "g-recaptcha",
+    "I'm not a robot",
+    "Are you a robot",
+    "confirm you're not a robot",
+]
+_STOP_SIGNALS = ["aktarma", "aktarmalı", "1 stop", "2 stop", "layover", "connecting"]
+_DOM_STOP_KWS    = ["aktarma", "1 stop", "2 stop", "layover"]
+_DOM_NONSTOP_KWS = ["aktarmasız", "nonstop", "direkt"]
+_NONSTOP_RE      = re.compile("|".join(map(re.escape, _DOM_NONSTOP_KWS)))   # "Aktarmasız" ⊃ "aktarma"
+
+
+def _to_price(raw, strip):
+    if strip:
+        raw = raw.replace(".", "").replace(",", "")
+    return float(raw)
+
+
+def scan_page(html, route, url=""):
+    """
+    Sayfa başına tek çağrı: fiyatlar, aktarma ve CAPTCHA sinyali birlikte.
+    html.lower() bir kez hesaplanır, tüm kalıplar önceden derlenmiştir.
 
-    # Yöntem 6: aria-label içinde fiyat (DOM render sonrası)
-    for m in re.finditer(r'aria-label="[^"]*?(\d{1,3}(?:[.,]\d{3})+)\s*(?:TL|₺|Türk lirası)', html):
-        raw = m.group(1).replace(".", "").replace(",", "")
-        try:
-            p = float(raw)
-            if mn <= p <= mx: found.add(p)
-        except: pass
+        {"prices": [...],            # sınırlar içinde, artan, en fazla 5
+         "methods": {fiyat: yöntem}, # her fiyatı ilk bulan yöntem
+         "has_stopover": bool,
+         "captcha": bool, "captcha_signal": str | None}
+    """
+    mn, mx = BOUNDS.get(route, (100, 200000))
+    methods = {}
+
+    def add(raw, strip, method):
+        p = _to_price(raw, strip)
+        if mn <= p <= mx and p not in methods:
+            methods[p] = method
+
+    for method, rx, strip in _PRICE_PATTERNS:
+        if rx is None:
+            for m in _TL_SUFFIX_RE.finditer(html):
+                w = _TL_PRICE_RE.search(html, max(0, m.start() - 24), m.start())
+                if w:
+                    add(w.group(1), strip, method)
+            continue
+        for m in rx.finditer(html):
+            add(m.group(1), strip, method)
 
-    if found:
-        result = sorted(found)
-        print(f"    [PARSE] {len(result)} fiyat: {result[:5]}")
-        return result[:5]
+    stop, signal = scan_signals(html, url)
+
+    return {
+        "prices": sorted(methods)[:5],
+        "methods": methods,
+        "has_stopover": stop,
+        "captcha": signal is not None,
+        "captcha_signal": signal,
+    }
 
+
+def scan_signals(html, url=""):
+    """
+    scan_page'in fiyat dışı kısmı: (aktarma var mı, CAPTCHA sinyali veya None).
+    Fiyat regex'leri çalışmaz; yalnız bu iki sinyal gereken yerler için.
+    """
+    low = html.lower()
+    signal = next((s for s in _CAPTCHA_SIGNALS if s.lower() in low), None)
+    if signal is None and "/sorry/" in url:
+        signal = "URL /sorry/"
+    # Aktarmasız kartlar çıkarılır; sayfada tek aktarmalı sonuç kalırsa aktarma var sayılır
+    rest = _NONSTOP_RE.sub(" ", low)
+    return any(kw in rest for kw in _STOP_SIGNALS), signal
+
+
+def log_scan(scan, html, route):
+    """scan_page sonucunu eski [PARSE]/[DEBUG] log biçiminde yazar."""
+    if scan["prices"]:
+        print(f"    [PARSE] {len(scan['methods'])} fiyat: {scan['prices']}")
+        return
+    mn, mx = BOUNDS.get(route, (100, 200000))
     print(f"    [PARSE] Fiyat yok ({mn:,}–{mx:,} TL aralığı)")
     idx = html.find("₺")
     if idx >= 0:
@@ -181,288 +548,1296 @@ def extract_prices_from_html(html, route):
             print(f"    [DEBUG] TRY bağlamı: {repr(html[max(0,try_idx-50):try_idx+30])}")
     else:
         print(f"    [DEBUG] HTML'de ₺ yok. Uzunluk: {len(html):,}")
-    return []
+
+
+def extract_prices_from_html(html, route):
+    with TRACER.span("html.scan"):
+        scan = scan_page(html, route)
+    log_scan(scan, html, route)
+    return scan["prices"]
+
+_DOM_PRICE_REGEX = [
+    re.compile(r'₺\s*([\d]{1,3}(?:[.,][\d]{3})+)'),
+    re.compile(r'₺\s*(\d{4,6})'),
+    re.compile(r'([\d]{1,3}(?:[.,][\d]{3})+)\s*TL'),
+]
+
+
+def _dom_has_stop(text, hint=""):
+    """Fiyat metni + kart metninden aktarma tahmini; "Aktarmasız" aktarma sayılmaz."""
+    low = f"{text} {hint}".lower()
+    if any(kw in low for kw in _DOM_NONSTOP_KWS):
+        return False
+    return any(kw in low for kw in _DOM_STOP_KWS)
+
+
+def parse_dom_texts(texts, route, scraped_at=None, hints=None):
+    """
+    Fiyat elementlerinin inner_text / aria-label metinlerinden uçuş kayıtları.
+    Her metinden ilk eşleşen fiyat alınır; fiyata göre tekil ve artan sıralı.
+    hints verilirse texts ile aynı sırada {"card": kart metni, "carrier": havayolu}
+    sözlükleridir; aktarma ve havayolu buradan okunur.
+    """
+    mn, mx = BOUNDS.get(route, (100, 200000))
+    results = []
+    seen = set()
+    for i, text in enumerate(texts):
+        clean = text.replace("\xa0", "").replace("\u200b", "")
+        for rx in _DOM_PRICE_REGEX:
+            m = rx.search(clean)
+            if m:
+                price = float(m.group(1).replace(".", "").replace(",", ""))
+                if mn <= price <= mx and price not in seen:
+                    seen.add(price)
+                    hint = hints[i] if hints else {}
+                    results.append({
+                        "price": price,
+                        "airline": hint.get("carrier") or "Çeşitli",
+                        "has_stopover": _dom_has_stop(text, hint.get("card", "")),
+                        "scraped_at": scraped_at,
+                        "source": "playwright_dom",
+                    })
+                break
+    return sorted(results, key=lambda x: x["price"])
+
+
+# Google'ın q= sorgusunu yanlış anlayıp açtığı yurt içi sayfalar
+_WRONG_DESTINATIONS = ["ANTALYA", "ANKARA", "İZMİR", "IZMIR", "BODRUM", "DALAMAN"]
+_DOMESTIC_DESTS     = ["AYT", "ESB", "ADB", "BJV", "DLM"]
+
+
+def is_wrong_destination(title, origin, dest):
+    """
+    "İstanbul - Antalya" gibi yanlış rota sayfası mı?
+    Sadece İstanbul çıkışlı rotalar için, başlıktaki şehir adına bakılır.
+    """
+    if origin not in ["IST", "SAW"]:
+        return False
+    title_upper = title.upper()
+    dest_names = [AIRPORT_NAMES.get(dest, dest).split()[0].upper()]
+    dest_names += [a.upper() for a in AIRPORT_ALIASES.get(dest, ())]
+    for wrong in _WRONG_DESTINATIONS:
+        if wrong in title_upper and dest.upper() not in _DOMESTIC_DESTS:
+            if dest.upper() not in title_upper and not any(n in title_upper for n in dest_names):
+                return True
+    return False
+
+
+def _rpc_inner_payloads(text):
+    """
+    batchexecute yanıtındaki iç JSON'ları çıkarır.
+    Biçim: ")]}'" öneki, ardından uzunluk satırı + [["wrb.fr", rpcid, "<json>", ...]] parçaları.
+    """
+    payloads = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("[["):
+            continue
+        try:
+            chunk = json.loads(line)
+        except ValueError:
+            continue
+        for entry in chunk:
+            if (isinstance(entry, list) and len(entry) > 2
+                    and entry[0] == "wrb.fr" and isinstance(entry[2], str)):
+                try: payloads.append(json.loads(entry[2]))
+                except ValueError: pass
+    return payloads
+
+
+def _rpc_itinerary(item):
+    """
+    Tek itinerary kaydı:
+      item[0]    → uçuş bilgisi: [1] havayolu adları, [2] bacaklar, [9] toplam süre (dk)
+      item[1][0] → [null, fiyat]
+    """
+    info, fare = item[0], item[1]
+    price = fare[0][-1]
+    if not isinstance(price, (int, float)):
+        return None
+    names = info[1] if isinstance(info[1], list) else []
+    legs  = info[2] if isinstance(info[2], list) else []
+    duration = info[9] if len(info) > 9 and isinstance(info[9], int) else None
+    return {
+        "price": float(price),
+        "airline": ", ".join(n for n in names if isinstance(n, str)) or "Çeşitli",
+        "stops": max(0, len(legs) - 1),
+        "duration_min": duration,
+    }
+
+
+def parse_results_payload(text):
+    """
+    Flights sonuç RPC yanıtını (GetShoppingResults) itinerary listesine çevirir.
+    Dönen her kayıt: price, airline, stops, duration_min. Tanınmayan kayıtlar atlanır.
+    """
+    itineraries = []
+    for data in _rpc_inner_payloads(text):
+        if not isinstance(data, list):
+            continue
+        # [2] → "en iyi uçuşlar", [3] → "diğer uçuşlar"
+        for idx in (2, 3):
+            try:
+                group = data[idx][0]
+            except (IndexError, TypeError):
+                continue
+            if not isinstance(group, list):
+                continue
+            for item in group:
+                try:
+                    it = _rpc_itinerary(item)
+                except (IndexError, TypeError):
+                    continue
+                if it:
+                    itineraries.append(it)
+    return itineraries
+
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _grid_cell(node):
+    """[gidiş, dönüş, [[null, fiyat], ...]] → (gidiş, dönüş, fiyat) veya None."""
+    if (len(node) >= 3 and isinstance(node[0], str) and isinstance(node[1], str)
+            and _ISO_DATE.match(node[0]) and _ISO_DATE.match(node[1])
+            and isinstance(node[2], list) and node[2] and isinstance(node[2][0], list)
+            and node[2][0]):
+        price = node[2][0][-1]
+        if isinstance(price, (int, float)) and not isinstance(price, bool):
+            return node[0], node[1], float(price)
+    return None
+
+
+def parse_grid_payload(text):
+    """
+    Tarih tablosu / fiyat grafiği RPC'si (GetCalendarGrid, GetCalendarGraph).
+    Yapı sürümden sürüme kaydığı için iç JSON ağacı gezilir ve
+    [gidiş, dönüş, [[null, fiyat]]] biçimli her düğüm hücre kabul edilir.
+    Dönen: [(gidiş, dönüş, fiyat)], (gidiş, dönüş) başına en ucuzu.
+    """
+    best = {}
+    for data in _rpc_inner_payloads(text):
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, list):
+                continue
+            cell = _grid_cell(node)
+            if cell:
+                key = cell[:2]
+                if key not in best or cell[2] < best[key]:
+                    best[key] = cell[2]
+                continue
+            stack.extend(node)
+    return sorted((d, r, p) for (d, r), p in best.items())
+
 
 def is_real_captcha(html, url):
     """
     Gerçek CAPTCHA'yı masumca geçen 'robot' kelimesinden ayırt eder.
     Google Flights HTML'inde 'robot' kelimesi meşru içerikte de geçer.
     """
-    # Gerçek CAPTCHA sinyalleri
-    real_signals = [
-        "unusual traffic",
-        "/sorry/index",
-        "recaptcha/api.js",
-        "g-recaptcha",
-        "I'm not a robot",
-        "Are you a robot",
-        "confirm you're not a robot",
-    ]
-    html_lower = html.lower()
-    for sig in real_signals:
-        if sig.lower() in html_lower:
-            return True, sig
-    if "/sorry/" in url:
-        return True, "URL /sorry/"
-    return False, None
+    signal = scan_signals(html, url)[1]
+    return signal is not None, signal
 
 def detect_stopover(html):
-    if "nonstop" in html.lower(): return False
-    kws = ["aktarma", "aktarmalı", "1 stop", "2 stop", "layover", "connecting"]
-    return any(kw in html.lower() for kw in kws)
+    return scan_signals(html)[0]
+
+# ============================================================
+# PLAYWRIGHT — TARAYICI OTURUMU
+# ============================================================
+CONTEXT_MAX_SEARCHES = 8   # Bu kadar aramadan sonra context yenilenir
+
+class CaptchaError(Exception):
+    """Arama CAPTCHA'ya takıldı; iş CaptchaBreaker tarafından yeniden kuyruğa alınır."""
+
+
+# CAPTCHA sonrası sırayla denenen tarayıcı kimlikleri
+FINGERPRINTS = [
+    {"user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+     "viewport": {"width": 1366, "height": 768}},
+    {"user_agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+     "viewport": {"width": 1440, "height": 900}},
+    {"user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0",
+     "viewport": {"width": 1536, "height": 864}},
+    {"user_agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+     "viewport": {"width": 1920, "height": 1080}},
+]
+
+# Kalıcı oturum: cookie/consent/localStorage run'lar arası saklanır (actions/cache)
+PERSIST_STATE   = os.environ.get("TITAN_PERSIST_STATE", "1") != "0"
+STATE_DIR       = Path(os.environ.get("TITAN_STATE_DIR", ".titan_state"))
+STATE_MAX_AGE_H = 72       # Daha eski kayıtlı oturum kullanılmaz
+CONSENT_COOKIES = ("SOCS", "CONSENT")
+
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-extensions",
+    "--window-size=1366,768",
+]
+
+STEALTH_JS = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    window.chrome = {runtime: {}, loadTimes: () => {}, csi: () => {}, app: {}};
+    Object.defineProperty(navigator, 'languages', {get: () => ['tr-TR', 'tr', 'en-US']});
+"""
+
+
+# Ağ katmanında engellenecek istekler — sadece fiyat okuyoruz
+def _env_list(name, default):
+    raw = os.environ.get(name)
+    if raw is None:
+        return list(default)
+    return [x.strip() for x in raw.split(",") if x.strip()]
+
+BLOCK_RESOURCES      = os.environ.get("TITAN_BLOCK_RESOURCES", "1") != "0"
+BLOCK_RESOURCE_TYPES = set(_env_list("TITAN_BLOCK_TYPES", ["image", "font", "media"]))
+if os.environ.get("TITAN_BLOCK_CSS") == "1":
+    # Stylesheet engeli layout'u bozar; seçiciler çalışır ama görünürlük kontrolleri şaşabilir
+    BLOCK_RESOURCE_TYPES.add("stylesheet")
+BLOCK_URL_PATTERNS = _env_list("TITAN_BLOCK_URLS", [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "googleadservices.com", "googlesyndication.com",
+    "/gen_204", "/client_204", "/csi?", "play.google.com/log", "/log?format=",
+])
+ALLOW_URL_PATTERNS = _env_list("TITAN_ALLOW_URLS", [
+    "FlightsFrontendService", "/sorry/", "recaptcha",
+])
+
+# Engellenen istek başına tahmini boyut (byte) — tasarruf raporu için
+BLOCKED_SIZE_ESTIMATE = {
+    "image": 12_000, "font": 35_000, "media": 250_000,
+    "stylesheet": 25_000, "script": 40_000,
+}
+
+
+def should_block(resource_type, url):
+    """İstek engellenmeli mi? Allow listesi her zaman önceliklidir."""
+    if any(p in url for p in ALLOW_URL_PATTERNS):
+        return False
+    if resource_type in BLOCK_RESOURCE_TYPES:
+        return True
+    return any(p in url for p in BLOCK_URL_PATTERNS)
+
+
+class NetStats:
+    """Run boyunca engellenen/izin verilen istek sayaçları."""
+
+    def __init__(self):
+        self.blocked = {}
+        self.allowed = 0
+
+    def record(self, resource_type, blocked):
+        if blocked:
+            self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+        else:
+            self.allowed += 1
+
+    @property
+    def saved_bytes(self):
+        return sum(BLOCKED_SIZE_ESTIMATE.get(t, 5_000) * n for t, n in self.blocked.items())
+
+    def summary(self):
+        total = sum(self.blocked.values())
+        detail = ", ".join(f"{t}={n}" for t, n in sorted(self.blocked.items()))
+        return (f"  [NET] {total} istek engellendi (~{self.saved_bytes / 1e6:.1f} MB tahmini tasarruf)"
+                f" | {self.allowed} izinli" + (f" | {detail}" if detail else ""))
+
+
+NET_STATS = NetStats()
+
+
+async def _route_request(route):
+    request = route.request
+    blocked = should_block(request.resource_type, request.url)
+    NET_STATS.record(request.resource_type, blocked)
+    try:
+        if blocked:
+            await route.abort()
+        else:
+            await route.continue_()
+    except Exception:
+        pass   # Sayfa kapanmışsa route zaten geçersiz
+
+
+class BrowserSession:
+    """
+    Run boyunca tek Chromium süreci.
+    Her aramada tarayıcı yeniden başlatılmaz; her worker kendi context'ini
+    (ContextSlot) kullanır. Context, CONTEXT_MAX_SEARCHES aramadan sonra
+    veya CAPTCHA sonrası yenilenir.
+
+        async with BrowserSession() as session:
+            slot = session.slot()
+            await scrape_with_playwright("IST", "CDG", dep, ret, slot=slot)
+
+    PERSIST_STATE açıksa yeni context'ler STATE_DIR/storage_state.json'dan
+    (cookie + localStorage) başlar; consent verilmiş ziyaretçi olarak açılır.
+    Başarılı arama yapmış context kapanırken durumu kaydeder, CAPTCHA
+    görülünce kayıt silinir ve sonraki context'ler boş başlar.
+
+    Context yeniden kullanımı cookie / consent / sayfa durumunu korur; HTTP
+    önbelleğini değil — BLOCK_RESOURCES açıkken context.route Playwright'ın
+    HTTP önbelleğini devre dışı bırakır.
+    """
+
+    def __init__(self, max_searches=CONTEXT_MAX_SEARCHES, persist=PERSIST_STATE):
+        self.max_searches = max_searches
+        self._pw = None
+        self.browser = None
+        self.slots = []
+        self.contexts_opened = 0
+        self.state_path = STATE_DIR / "storage_state.json" if persist else None
+        self.state = None        # new_context'e verilecek storage_state (dict)
+        self.fingerprint = 0     # FINGERPRINTS indeksi; CAPTCHA'da ilerler
+
+    async def __aenter__(self):
+        from playwright.async_api import async_playwright
+        with TRACER.span("browser.launch"):
+            self._pw = await async_playwright().start()
+            self.browser = await self._pw.chromium.launch(headless=HEADLESS, args=BROWSER_ARGS)
+        print(f"  [PW] Chromium başlatıldı (oturum)")
+        self.state = self._load_state()
+        return self
+
+    def _load_state(self):
+        if self.state_path is None or not self.state_path.exists():
+            return None
+        age_h = (time.time() - self.state_path.stat().st_mtime) / 3600
+        if age_h > STATE_MAX_AGE_H:
+            print(f"  [PW] Kayıtlı oturum eski ({age_h:.0f} sa), boş başlanıyor")
+            return None
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        print(f"  [PW] Kayıtlı oturum yüklendi — {len(state.get('cookies', []))} cookie"
+              f"{', consent ✓' if _has_consent(state) else ''}")
+        return state
+
+    @property
+    def consent_ok(self):
+        return _has_consent(self.state)
+
+    async def save_state(self, context):
+        """Context'in cookie/localStorage durumunu kaydeder."""
+        if self.state_path is None:
+            return
+        try:
+            state = await context.storage_state()
+        except Exception:
+            return
+        _atomic_write(self.state_path, json.dumps(state, ensure_ascii=False))
+        self.state = state
+
+    def invalidate_state(self):
+        """CAPTCHA sonrası: işaretlenmiş olabilecek cookie'ler bir daha kullanılmaz."""
+        if self.state_path is None:
+            return
+        self.state = None
+        try:
+            self.state_path.unlink()
+            print(f"  [PW] Kayıtlı oturum silindi (CAPTCHA)")
+        except FileNotFoundError:
+            pass
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    def rotate_fingerprint(self):
+        """Sonraki context'ler farklı UA/viewport ile açılır."""
+        self.fingerprint = (self.fingerprint + 1) % len(FINGERPRINTS)
+        print(f"  [PW] Parmak izi değişti → #{self.fingerprint}")
+
+    async def new_context(self):
+        fp = FINGERPRINTS[self.fingerprint]
+        with TRACER.span("context.new", fingerprint=self.fingerprint):
+            context = await self.browser.new_context(
+                storage_state=self.state,
+                viewport=fp["viewport"],
+                locale="tr-TR",
+                timezone_id="Europe/Istanbul",
+                user_agent=fp["user_agent"],
+                extra_http_headers={
+                    "Accept-Language": "tr-TR,tr;q=0.9,en-US;q=0.8,en;q=0.7",
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                }
+            )
+            await context.add_init_script(STEALTH_JS)
+            if BLOCK_RESOURCES:
+                # Not: route aktifken Playwright context'in HTTP önbelleğini kapatır; her arama
+                # JS/CSS'i yeniden indirir. Engelleme her gezintide gerektiği için unroute edilmez.
+                await context.route("**/*", _route_request)
+        self.contexts_opened += 1
+        return context
+
+    def slot(self):
+        """Bir worker'a ait yeni context yuvası."""
+        slot = ContextSlot(self, len(self.slots))
+        self.slots.append(slot)
+        return slot
+
+    async def close(self):
+        for slot in self.slots:
+            await slot.recycle()
+        if self.browser is not None:
+            print(f"  [PW] Chromium kapatıldı — {self.contexts_opened} context kullanıldı")
+            try: await self.browser.close()
+            except: pass
+            self.browser = None
+        if self._pw is not None:
+            try: await self._pw.stop()
+            except: pass
+            self._pw = None
+
+
+class ContextSlot:
+    """
+    Tek worker'ın context + page çifti; arama sayısına göre kendini yeniler.
+    consent_ok / roundtrip_ok context boyunca geçerlidir; set olduktan sonra
+    popup ve uçuş tipi yoklamaları atlanır.
+    """
+
+    def __init__(self, session, wid):
+        self.session = session
+        self.wid = wid
+        self.context = None
+        self._page = None
+        self.searches = 0        # Mevcut context'teki arama sayısı
+        self.found = 0           # Mevcut context'te sonuç bulunan arama sayısı
+        self.consent_ok = False
+        self.roundtrip_ok = False
+
+    async def page(self):
+        """Aramaya hazır sayfa döndürür; gerekirse context açar."""
+        if self.context is None:
+            self.context = await self.session.new_context()
+            self._page = None
+            self.searches = self.found = 0
+            self.consent_ok = self.session.consent_ok
+            self.roundtrip_ok = False
+        if self._page is None or self._page.is_closed():
+            self._page = await self.context.new_page()
+        return self._page
+
+    async def finish_search(self, captcha=False, broken=False, found=False):
+        """Arama bittiğinde çağrılır; limit, CAPTCHA veya hata durumunda context yenilenir."""
+        self.searches += 1
+        self.found += bool(found)
+        if captcha:
+            self.session.invalidate_state()
+            self.found = 0       # Bu context'in durumu kaydedilmez
+        if captcha or broken or self.searches >= self.session.max_searches:
+            reason = "CAPTCHA" if captcha else "hata" if broken else f"{self.searches} arama"
+            print(f"    [PW#{self.wid}] Context yenileniyor ({reason})")
+            await self.recycle()
+
+    async def recycle(self):
+        if self.context is not None:
+            if self.found:
+                await self.session.save_state(self.context)
+            try: await self.context.close()
+            except: pass
+        self.context = None
+        self._page = None
+        self.searches = self.found = 0
+
+
+def _has_consent(state):
+    return bool(state) and any(c.get("name") in CONSENT_COOKIES for c in state.get("cookies", []))
+
+
+class HostRateLimiter:
+    """
+    Aynı host'a yapılan navigasyonlar arasında en az `min_interval` saniye
+    (+ rastgele jitter) bırakır. Tüm worker'lar tek limiter'ı paylaşır.
+    """
+
+    def __init__(self, min_interval=HOST_MIN_INTERVAL_S, jitter=HOST_JITTER_S):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._next = {}
+
+    async def wait(self, url):
+        import urllib.parse
+        host = urllib.parse.urlsplit(url).netloc
+        now = time.monotonic()
+        start = max(now, self._next.get(host, 0.0))
+        self._next[host] = start + self.min_interval + random.uniform(0, self.jitter)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+RATE_LIMITER = HostRateLimiter()
+
+
+class CaptchaBreaker:
+    """
+    Run geneli CAPTCHA / hata devre kesicisi. Son `window` aramanın sonucu
+    tutulur; CAPTCHA gelince veya pencerede hata oranı `fail_ratio`'yu
+    aşınca devre açılır ve tüm worker'lar bekler. Bekleme ardışık her
+    açılışta ikiye katlanır (base_s → max_s). Başarılı arama sayacı sıfırlar.
+
+    Sayaçlar: blocked (CAPTCHA'lı arama), requeued, recovered (yeniden
+    kuyruğa alınıp sonra sonuç veren iş), opened, time_lost_s (devre açık
+    geçen duvar saati süresi).
+
+    Kapalıyken açılan her devre bir "trip"tir; açıkken gelen CAPTCHA'lar
+    süreyi uzatır ama yeni trip sayılmaz. claim_rotation() trip başına bir
+    kez True döner — aynı dalgada CAPTCHA gören worker'lar parmak izini
+    art arda çevirmez.
+    """
+
+    def __init__(self, window=10, fail_ratio=0.6, base_s=30.0, max_s=600.0, max_requeue=2):
+        self.window = window
+        self.fail_ratio = fail_ratio
+        self.base_s = base_s
+        self.max_s = max_s
+        self.max_requeue = max_requeue
+        self.outcomes = []        # "ok" / "empty" / "captcha" / "error"
+        self.open_until = 0.0
+        self.strikes = 0          # Ardışık açılış sayısı
+        self.requeued_jobs = {}   # job → yeniden kuyruğa alınma sayısı
+        self.blocked = self.requeued = self.recovered = self.opened = 0
+        self.time_lost_s = 0.0
+        self.trips = 0            # Kapalıyken açılış sayısı
+        self._rotated_trip = 0    # Parmak izinin son değiştiği trip
+
+    async def wait(self):
+        """Devre açıksa kapanana kadar bekler; beklerken süre uzatılırsa beklemeye devam eder."""
+        while (delay := self.open_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+    def _open(self, reason):
+        self.strikes += 1
+        backoff = min(self.max_s, self.base_s * 2 ** (self.strikes - 1)) * random.uniform(0.8, 1.2)
+        now = time.monotonic()
+        until = now + backoff
+        if now >= self.open_until:
+            self.trips += 1
+        if until > self.open_until:
+            self.time_lost_s += until - max(now, self.open_until)
+            self.open_until = until
+        self.opened += 1
+        print(f"  [DEVRE] Açıldı ({reason}) — {backoff:.0f}s bekleme, ardışık #{self.strikes}")
+
+    def record(self, job, outcome):
+        self.outcomes.append(outcome)
+        del self.outcomes[:-self.window]
+        if outcome == "captcha":
+            self.blocked += 1
+            self._open("CAPTCHA")
+            return
+        if outcome == "ok":
+            self.strikes = 0
+            if job in self.requeued_jobs:
+                self.recovered += 1
+            return
+        errors = sum(1 for o in self.outcomes if o != "ok")
+        if len(self.outcomes) >= self.window and errors / len(self.outcomes) >= self.fail_ratio:
+            self._open(f"hata oranı {errors}/{len(self.outcomes)}")
+            self.outcomes.clear()
+
+    def claim_rotation(self):
+        """Bu trip'te parmak izi henüz değişmediyse True döner ve trip'i işaretler (tek event loop; await yok)."""
+        if self._rotated_trip == self.trips:
+            return False
+        self._rotated_trip = self.trips
+        return True
+
+    def requeue(self, job):
+        """İş tekrar denenmeli mi? (limit aşılmadıysa sayacı artırır)"""
+        n = self.requeued_jobs.get(job, 0)
+        if n >= self.max_requeue:
+            return False
+        self.requeued_jobs[job] = n + 1
+        self.requeued += 1
+        return True
+
+    def summary(self):
+        return (f"  [DEVRE] {self.blocked} CAPTCHA | {self.opened} açılış | {self.requeued} yeniden kuyruk | "
+                f"{self.recovered} kurtarıldı | {self.time_lost_s:.0f}s kayıp")
+
+
+BREAKER = CaptchaBreaker()
+
+
+async def _goto(page, url, **kwargs):
+    """page.goto — host rate limit uygulanarak."""
+    with TRACER.span("rate_limit.wait"):
+        await RATE_LIMITER.wait(url)
+    kwargs.setdefault("timeout", PAGE_TIMEOUT_MS)
+    kwargs.setdefault("wait_until", "domcontentloaded")
+    with TRACER.span("page.goto") as sp:
+        resp = await page.goto(url, **kwargs)
+        sp["status"] = resp.status if resp is not None else None
+    return resp
+
+
+async def _page_content(page):
+    """page.content() — DOM serileştirme, izlenerek."""
+    with TRACER.span("page.content") as sp:
+        html = await page.content()
+        sp["bytes"] = len(html)
+    return html
+
+
+def note_captcha(job, slot):
+    """CAPTCHA'lı aramayı devreye ve önbelleğe işler; parmak izi trip başına bir kez değişir."""
+    BREAKER.record(job, "captcha")
+    SCRAPE_CACHE.put(job, "*", "captcha")
+    if BREAKER.claim_rotation():     # Diğer worker'lar aynı yeni kimliği kullanır
+        slot.session.rotate_fingerprint()
+
+
+async def scrape_many(jobs, concurrency=CONCURRENCY, deadline=None, session=None):
+    """
+    (origin, dest, dep, ret) işlerini `concurrency` worker ile paralel tarar.
+    Her iş bittiğinde (job, flights) üretir (async generator). `deadline`
+    (time.monotonic) geçtikten sonra yeni işe başlanmaz; kalanlar None döner.
+    session verilirse (--watch) tarayıcı ve worker context'leri o oturumdan
+    alınır ve tarama bitince açık kalır.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    queue   = asyncio.Queue()
+    results = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker(slot):
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await run_job(slot, job)
+            except Exception as e:
+                # run_job sonucu yazmadan düştüyse tüketici sonsuza dek beklemesin
+                print(f"  [W#{slot.wid} HATA] {type(e).__name__}: {e} — {job[0]}-{job[1]} {job[2]} boş kapatıldı")
+                await results.put((job, []))
+
+    async def run_job(slot, job):
+        """Tek iş: devre beklemesi → arama → sonuç (CAPTCHA'da yeniden kuyruk)."""
+        with TRACER.span("breaker.wait"):
+            await BREAKER.wait()
+        if deadline is not None and time.monotonic() > deadline:
+            print(f"  [⏱] Süre bitti, atlandı: {job[0]}-{job[1]} {job[2]}")
+            await results.put((job, None))
+            return
+        TRACER.tag(route=f"{job[0]}-{job[1]}", dep=job[2], ret=job[3])
+        try:
+            with TRACER.span("search") as sp:
+                if SCAN_MODE == "grid":
+                    flights = await scrape_date_grid(*job, slot=slot)
+                else:
+                    flights = await scrape_with_playwright(*job, slot=slot)
+                sp["found"] = len(flights)
+            BREAKER.record(job, "ok" if flights else "empty")
+            SCRAPE_CACHE.put(job, "*", "ok" if flights else "empty", flights)
+        except CaptchaError:
+            note_captcha(job, slot)
+            if BREAKER.requeue(job):
+                print(f"  [W#{slot.wid}] CAPTCHA — {job[0]}-{job[1]} {job[2]} sona eklendi")
+                queue.put_nowait(job)
+                return
+            flights = []
+        except Exception as e:
+            print(f"  [W#{slot.wid} HATA] {type(e).__name__}: {e}")
+            BREAKER.record(job, "error")
+            flights = []
+        await results.put((job, flights))
+
+    try:
+        import playwright.async_api
+    except ImportError:
+        print("  [HATA] playwright kurulu değil")
+        for job in jobs:
+            yield job, []
+        return
+
+    async def traced_worker(slot):
+        TRACER.lane(slot.wid + 1, f"worker {slot.wid}")
+        await worker(slot)
+
+    async with contextlib.nullcontext(session) if session else BrowserSession() as session:
+        n = max(1, min(concurrency, len(jobs)))
+        print(f"  [PW] {len(jobs)} arama, {n} paralel worker")
+        slots = session.slots[:n] + [session.slot() for _ in range(n - len(session.slots))]
+        tasks = [asyncio.create_task(traced_worker(slot)) for slot in slots]
+        try:
+            for _ in range(len(jobs)):
+                yield await _next_result(results, tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _next_result(results, tasks):
+    """
+    results.get() — worker'lar bekleyen sonuç bırakmadan bittiyse (ör. worker
+    döngü dışında düştü) süresiz beklemek yerine hata verir.
+    """
+    get = asyncio.ensure_future(results.get())
+    try:
+        while not get.done():
+            alive = [t for t in tasks if not t.done()]
+            if not alive and results.empty():
+                failed = next((t.exception() for t in tasks if not t.cancelled() and t.exception()), None)
+                raise RuntimeError("worker'lar bitti, eksik sonuç var") from failed
+            await asyncio.wait([get, *alive], return_when=asyncio.FIRST_COMPLETED)
+        return get.result()
+    finally:
+        if not get.done():
+            get.cancel()
+
+
+# ============================================================
+# PLAYWRIGHT — SONUÇ HAZIR TESPİTİ
+# ============================================================
+PRICE_SELECTORS = [
+    # Google Flights 2024+ fiyat container'ları
+    '[data-gs] .YMlIz',
+    '[data-gs] .FpEdX',
+    '[data-gs]',
+    # Aria label bazlı
+    '[aria-label*="TL"]',
+    '[aria-label*="Türk lirası"]',
+    # Genel
+    'div.YMlIz',
+    'span.YMlIz',
+    'div.FpEdX',
+]
+
+# Sadece fiyat hücreleri — aria-label'lı seçiciler boş sayfada da eşleşebilir
+READY_SELECTOR = ", ".join(s for s in PRICE_SELECTORS if "YMlIz" in s or "FpEdX" in s)
+
+# Sonuç listesini dolduran Flights RPC'leri
+RESULTS_RPC_MARKERS = ("GetShoppingResults", "GetBookingResults")
+
+# Tarih tablosu ve fiyat grafiği RPC'leri (grid modu)
+GRID_RPC_MARKERS = ("GetCalendarGrid", "GetCalendarGraph")
+
+READY_STATS = []   # (sinyal, saniye) — run sonunda özetlenir
+
+
+def _is_results_response(response):
+    return response.ok and any(m in response.url for m in RESULTS_RPC_MARKERS)
+
+
+async def wait_for_results(page, timeout_ms=READY_TIMEOUT_MS):
+    """
+    Sonuçlar gerçekten geldiği anda döner; sabit bekleme yok.
+    Sinyaller (ilk gelen kazanır):
+      dom     → ilk fiyat elementi DOM'a eklendi
+      xhr     → sonuç RPC'si tamamlandı
+      captcha → /sorry/ sayfasına yönlendirildi
+    timeout_ms üst sınırdır; dolarsa "timeout" döner ve akış eskisi gibi devam eder.
+    """
+    with TRACER.span("wait.results") as sp:
+        reason = await _wait_for_results(page, timeout_ms)
+        sp["reason"] = reason
+    return reason
+
+
+async def _wait_for_results(page, timeout_ms):
+    """wait_for_results gövdesi (izleme span'i dışında)."""
+    t0 = time.monotonic()
+    reason = "timeout"
+    if "/sorry/" in page.url:
+        reason = "captcha"
+    else:
+        waiters = {
+            asyncio.ensure_future(page.wait_for_selector(
+                READY_SELECTOR, state="attached", timeout=timeout_ms)): "dom",
+            asyncio.ensure_future(page.wait_for_event(
+                "response", predicate=_is_results_response, timeout=timeout_ms)): "xhr",
+            asyncio.ensure_future(page.wait_for_url(
+                lambda u: "/sorry/" in u, wait_until="commit", timeout=timeout_ms)): "captcha",
+        }
+        pending = set(waiters)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                hit = [t for t in done if t.exception() is None]
+                if hit:
+                    reason = waiters[hit[0]]
+                    break
+        finally:
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if reason == "xhr":
+        # Veri geldi; DOM'a basılmasını kısa süre bekle
+        try: await page.wait_for_selector(READY_SELECTOR, state="attached", timeout=3000)
+        except: pass
+    if reason in ("dom", "xhr"):
+        await page.wait_for_timeout(READY_SETTLE_MS)
+
+    elapsed = time.monotonic() - t0
+    READY_STATS.append((reason, elapsed))
+    print(f"    [READY] {reason} — {elapsed:.1f}s")
+    return reason
+
+
+def ready_summary():
+    """Sinyal bazında hazır olma süreleri (adet, p50, p95, max)."""
+    by_reason = {}
+    for reason, sec in READY_STATS:
+        by_reason.setdefault(reason, []).append(sec)
+    lines = []
+    for reason, secs in sorted(by_reason.items()):
+        secs.sort()
+        p50 = secs[len(secs) // 2]
+        p95 = secs[min(len(secs) - 1, int(len(secs) * 0.95))]
+        lines.append(f"  [READY] {reason:<8} n={len(secs):<4} p50={p50:.1f}s p95={p95:.1f}s max={secs[-1]:.1f}s")
+    return lines
+
+
+class ResultCapture:
+    """
+    Sayfadaki sonuç RPC yanıtlarını page.on("response") ile toplar.
+    Fiyatlar DOM serileştirmeden, doğrudan yapılandırılmış veriden okunur.
+
+        capture = ResultCapture(page)
+        ...
+        flights = await capture.flights(route, scraped_at)
+        capture.detach()
+    """
+
+    def __init__(self, page, markers=RESULTS_RPC_MARKERS):
+        self.page = page
+        self.markers = markers
+        self.bodies = []
+        self._tasks = set()
+        self._gen = 0           # reset() başına artar; önceki gezintinin gövdeleri atılır
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if response.ok and any(m in response.url for m in self.markers):
+            task = asyncio.ensure_future(self._read(response, self._gen))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _read(self, response, gen):
+        try: body = await response.text()
+        except: return
+        if gen == self._gen:
+            self.bodies.append(body)
+
+    async def reset(self):
+        """Yeni sorgudan önce: okunmakta olan eski yanıtlar iptal edilir, gövdeler temizlenir."""
+        self._gen += 1
+        tasks = list(self._tasks)
+        for t in tasks:
+            t.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.bodies = []
+
+    async def settle(self):
+        """Okunmakta olan yanıt gövdelerini bekler."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def flights(self, route, scraped_at, source="rpc"):
+        """Yakalanan yanıtlardan rota sınırları içindeki itinerary'ler (fiyata göre)."""
+        with TRACER.span("rpc.settle"):
+            await self.settle()
+        mn, mx = BOUNDS.get(route, (100, 200000))
+        best = {}
+        with TRACER.span("rpc.parse", bodies=len(self.bodies)):
+            for body in self.bodies:
+                for it in parse_results_payload(body):
+                    if not mn <= it["price"] <= mx:
+                        continue
+                    key = (it["price"], it["airline"], it["stops"])
+                    best.setdefault(key, it)
+        results = []
+        for it in sorted(best.values(), key=lambda x: x["price"]):
+            results.append(dict(it, has_stopover=it["stops"] > 0,
+                                scraped_at=scraped_at, source=source))
+        return results
+
+    def detach(self):
+        try: self.page.remove_listener("response", self._on_response)
+        except: pass
+
 
 # ============================================================
 # PLAYWRIGHT — FORM DOLDURMA YÖNTEMİ
 # ============================================================
-def scrape_with_playwright(origin, dest, dep_date, ret_date):
+async def scrape_with_playwright(origin, dest, dep_date, ret_date, slot=None):
     """
     Google Flights'tan fiyat çeker.
     
-    Strateji (sırayla):
-    1. URL parametreli direkt arama (form yok, autocomplete yok)
-       → headless bot ortamında en güvenilir yöntem
-    2. Form doldurma fallback (autocomplete çalışırsa)
+    Stratejiler (varsayılan sıra):
+    1. iata         — URL q= "IST to CDG ..." (form yok, autocomplete yok)
+    2. city         — URL q= "Istanbul to Paris ..."
+    3. form         — form doldurma (autocomplete çalışırsa)
+    4. fallback_url — URL q= tam havalimanı adlarıyla
+    Sıra rota geçmişine göre STRATEGY_STATS'tan gelir (beklenen süre / başarı
+    oranı); art arda başarısız strateji atlanır. Sonuç veren ilk strateji kazanır.
+
+    slot verilmezse tek seferlik bir BrowserSession açılır.
     """
     try:
-        from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
+        import playwright.async_api
     except ImportError:
         print("  [HATA] playwright kurulu değil")
         return []
 
+    if slot is None:
+        async with BrowserSession() as own:
+            return await scrape_with_playwright(origin, dest, dep_date, ret_date, slot=own.slot())
+
     route = f"{origin}-{dest}"
     print(f"    [PW] {route} {dep_date}→{ret_date} — URL ile arama başlıyor")
 
     results = []
+    captcha_seen = False
+    broken = False
+    page = await slot.page()
+    capture = ResultCapture(page) if CAPTURE_RPC else None
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=HEADLESS,
-            args=[
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-blink-features=AutomationControlled",
-                "--disable-dev-shm-usage",
-                "--disable-gpu",
-                "--no-first-run",
-                "--no-default-browser-check",
-                "--disable-extensions",
-                "--window-size=1366,768",
-            ]
-        )
-
-        context = browser.new_context(
-            viewport={"width": 1366, "height": 768},
-            locale="tr-TR",
-            timezone_id="Europe/Istanbul",
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/121.0.0.0 Safari/537.36"
-            ),
-            extra_http_headers={
-                "Accept-Language": "tr-TR,tr;q=0.9,en-US;q=0.8,en;q=0.7",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            }
-        )
-
-        context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-            window.chrome = {runtime: {}, loadTimes: () => {}, csi: () => {}, app: {}};
-            Object.defineProperty(navigator, 'languages', {get: () => ['tr-TR', 'tr', 'en-US']});
-        """)
-
-        page = context.new_page()
+    try:
+        # URL yöntemi headless ortamda form doldurmadan çalışır;
+        # q= parametresi ile "IST to CDG 2026-04-10 2026-04-13" şeklinde arama
+        origin_name = AIRPORT_NAMES.get(origin, origin)
+        dest_name   = AIRPORT_NAMES.get(dest, dest)
+        job = (origin, dest, dep_date, ret_date)
+        strategies = [
+            ("iata", f"{origin} to {dest} {dep_date} {ret_date}"),
+            ("city", f"{origin_name.split()[0]} to {dest_name.split()[0]} {dep_date} {ret_date}"),
+            ("form", None),
+            ("fallback_url", None),
+        ]
+        strategies = SCRAPE_CACHE.order(job, STRATEGY_STATS.order(route, strategies))
+
+        for name, query in strategies:
+            t0 = time.monotonic()
+            with TRACER.span(f"strategy.{name}") as sp:
+                if query is not None:
+                    status, results = await _url_search(page, query, origin, dest, route, capture)
+                elif name == "form":
+                    print(f"    [PW] Form yöntemi deneniyor...")
+                    status, results = await _form_based_search(page, origin, dest, dep_date, ret_date,
+                                                               route, capture, slot)
+                else:
+                    status, results = await _fallback_url_scrape(page, origin, dest, dep_date, ret_date, route)
+                sp["status"] = status
+            if status == "captcha":
+                # Stratejinin değil oturumun sorunu; istatistiğe / önbelleğe yazılmaz
+                captcha_seen = True
+                break
+            STRATEGY_STATS.record(route, name, status, time.monotonic() - t0)
+            SCRAPE_CACHE.put(job, name, status)
+            if results:
+                break
+            if query is not None:
+                print(f"    [PW] Bu URL'den fiyat alınamadı, sonraki deneniyor...")
+                await page.wait_for_timeout(2000)
+
+        if not results:
+            await _save_debug_screenshot(page, origin, dest, dep_date)
 
+    except Exception as e:
+        print(f"    [PW HATA] {type(e).__name__}: {e}")
+        broken = True
+        try: await _save_debug_screenshot(page, origin, dest, dep_date)
+        except: pass
+    finally:
+        if capture: capture.detach()
+        await slot.finish_search(captcha=captcha_seen, broken=broken, found=bool(results))
+
+    if captcha_seen and not results:
+        raise CaptchaError(route)
+    return results
+
+
+async def _url_search(page, query, origin, dest, route, capture=None):
+    """
+    Tek URL sorgusu: (durum, sonuçlar). Durum: "ok" / "wrong" (yanlış rota
+    sayfası) / "empty" (fiyat yok) / "captcha".
+    Sıra: ağdan yakalanan RPC → DOM → HTML tarama.
+    """
+    print(f"    [PW] URL deneniyor: q={query}")
+    if capture: await capture.reset()
+    await _goto(page, flights_url(query))
+    await wait_for_results(page)
+
+    title = await page.title()
+    cur_url = page.url
+    print(f"    [PW] Sayfa: '{title[:80]}'")
+
+    # CAPTCHA kontrolü — önce ucuz URL kontrolü
+    if "/sorry/" in cur_url:
+        print(f"    [PW] CAPTCHA: URL /sorry/")
+        return "captcha", []
+
+    # Doğru rotada mı? "İstanbul - Antalya" gibi yanlış sayfa tespiti
+    if is_wrong_destination(title, origin, dest):
+        print(f"    [PW] YANLIŞ SAYFA tespit: {title[:60]} (beklenen: {dest})")
+        return "wrong", []
+
+    # Ağdan yakalanan sonuç RPC'si — DOM serileştirmeye gerek yok
+    scraped_at = datetime.now()
+    if capture:
+        rpc_results = await capture.flights(route, scraped_at)
+        if rpc_results:
+            print(f"    [PW] RPC: {len(rpc_results)} itinerary | Rota: {title[:50]}")
+            return "ok", rpc_results
+
+    html = await _page_content(page)
+    with TRACER.span("html.scan"):
+        scan = scan_page(html, route, cur_url)
+    if scan["captcha"]:
+        print(f"    [PW] CAPTCHA: {scan['captcha_signal']}")
+        return "captcha", []
+
+    # DOM'dan fiyat çek
+    dom_results = await _dom_extract(page, route, scraped_at)
+    if dom_results:
+        print(f"    [PW] DOM: {len(dom_results)} fiyat | Rota: {title[:50]}")
+        return "ok", dom_results
+
+    # HTML parse dene
+    log_scan(scan, html, route)
+    if scan["prices"]:
+        stop = scan["has_stopover"]
+        return "ok", [{"price": pr, "airline": "Çeşitli", "has_stopover": stop,
+                       "scraped_at": scraped_at, "source": "url_html"} for pr in scan["prices"]]
+    return "empty", []
+
+
+GRID_BUTTONS = [
+    'button:has-text("Tarih tablosu")', 'button:has-text("Date grid")',
+    '[aria-label*="Tarih tablosu"]', '[aria-label*="Date grid"]',
+]
+GRAPH_BUTTONS = [
+    'button:has-text("Fiyat grafiği")', 'button:has-text("Price graph")',
+    '[aria-label*="Fiyat grafiği"]', '[aria-label*="Price graph"]',
+]
+
+
+async def _open_grid_view(page, selectors, label):
+    """Tarih tablosu / fiyat grafiği düğmesine basıp RPC yanıtını bekler."""
+    for sel in selectors:
         try:
-            # ── Yöntem 1: URL parametreli arama ──────────────────────
-            # q= parametresi ile "IST to CDG 2026-04-10 2026-04-13" şeklinde arama
-            # Bu yöntem headless ortamda form doldurmadan çalışır
-            import urllib.parse
-            
-            origin_name = AIRPORT_NAMES.get(origin, origin)
-            dest_name   = AIRPORT_NAMES.get(dest, dest)
-            
-            # Birden fazla URL formatı dene
-            search_queries = [
-                # Format 1: IATA kodları ile
-                f"{origin} to {dest} {dep_date} {ret_date}",
-                # Format 2: Şehir adları ile
-                f"{origin_name.split()[0]} to {dest_name.split()[0]} {dep_date} {ret_date}",
-            ]
-            
-            for query in search_queries:
-                url = (
-                    f"https://www.google.com/travel/flights"
-                    f"?hl=tr&curr=TRY&gl=TR"
-                    f"&q={urllib.parse.quote(query)}"
-                )
-                
-                print(f"    [PW] URL deneniyor: q={query}")
-                
-                page.goto(url, timeout=PAGE_TIMEOUT_MS, wait_until="domcontentloaded")
-                page.wait_for_timeout(RENDER_WAIT_MS)
-                try:
-                    page.wait_for_load_state("networkidle", timeout=12000)
-                except:
-                    pass
-                page.wait_for_timeout(3000)
-                
-                title = page.title()
-                cur_url = page.url
-                print(f"    [PW] Sayfa: '{title[:80]}'")
-                
-                # CAPTCHA kontrolü
-                html = page.content()
-                captcha, signal = is_real_captcha(html, cur_url)
-                if captcha:
-                    print(f"    [PW] CAPTCHA: {signal}")
-                    break
-                
-                # Doğru rotada mı? Başlıkta origin veya dest kodu geçiyor mu?
-                title_upper = title.upper()
-                # "İstanbul - Antalya" gibi yanlış sayfa tespiti
-                wrong_page = False
-                if origin in ["IST", "SAW"]:
-                    # Origin doğru (İstanbul) — dest kontrolü yap
-                    dest_city = dest_name.split()[0].upper()
-                    # Bilinen yanlış destinasyonları kontrol et
-                    wrong_destinations = ["ANTALYA", "ANKARA", "İZMİR", "IZMIR", "BODRUM", "DALAMAN"]
-                    for wrong in wrong_destinations:
-                        if wrong in title_upper and dest.upper() not in ["AYT", "ESB", "ADB", "BJV", "DLM"]:
-                            if dest.upper() not in title_upper and dest_city not in title_upper:
-                                wrong_page = True
-                                print(f"    [PW] YANLIŞ SAYFA tespit: {title[:60]} (beklenen: {dest})")
-                                break
-                
-                if wrong_page:
-                    continue  # Sonraki query ile dene
-                
-                # DOM'dan fiyat çek
-                scraped_at = datetime.now()
-                dom_results = _dom_extract(page, route, scraped_at)
-                if dom_results:
-                    print(f"    [PW] DOM: {len(dom_results)} fiyat | Rota: {title[:50]}")
-                    results = dom_results
-                    break
-                
-                # HTML parse dene
-                prices = extract_prices_from_html(html, route)
-                if prices:
-                    stop = detect_stopover(html)
-                    results = [{"price": pr, "airline": "Çeşitli", "has_stopover": stop,
-                                "scraped_at": scraped_at, "source": "url_html"} for pr in prices]
-                    break
-                
-                print(f"    [PW] Bu URL'den fiyat alınamadı, sonraki deneniyor...")
-                page.wait_for_timeout(2000)
-            
-            # ── Yöntem 2: Form doldurma (URL yöntemi başarısız olduysa) ──
-            if not results:
-                print(f"    [PW] URL yöntemi başarısız, form yöntemi deneniyor...")
-                results = _form_based_search(page, origin, dest, dep_date, ret_date, route)
+            btn = page.locator(sel).first
+            if not await btn.is_visible(timeout=1500):
+                continue
+            with TRACER.span("grid.open", view=label):
+                async with page.expect_response(
+                        lambda r: r.ok and any(m in r.url for m in GRID_RPC_MARKERS),
+                        timeout=READY_TIMEOUT_MS):
+                    await btn.click()
+            print(f"    [GRID] {label} açıldı")
+            return True
+        except Exception:
+            continue
+    return False
 
-            if not results:
-                _save_debug_screenshot(page, origin, dest, dep_date)
 
-        except Exception as e:
-            print(f"    [PW HATA] {type(e).__name__}: {e}")
-            try: _save_debug_screenshot(page, origin, dest, dep_date)
-            except: pass
-        finally:
-            browser.close()
+async def scrape_date_grid(origin, dest, dep_date, ret_date, slot=None):
+    """
+    Grid modu: (dep_date, ret_date) çevresindeki tarih tablosunu ve fiyat
+    grafiğini tek sayfa yüklemesinde okur. Her hücre kendi depart_date /
+    return_date'i ile döner; böylece tek arama birçok tarih çiftini ve
+    Cuma–Pazartesi dışındaki kalış sürelerini kapsar.
+
+    Tablo hücresinde aktarma bilgisi yok: eşik altı ya da anomali modelinin
+    dip saydığı en ucuz GRID_VERIFY_MAX hücre aynı slot'ta tam aramayla
+    doğrulanır ve yerine o sonuçlar konur (alarm yalnız doğrulanmış satırdan
+    gider). Doğrulamada CAPTCHA gelirse okunan hücreler korunur, devre açılır.
+    Tablo açılamazsa çapa tarihleri için normal aramaya düşülür.
+    """
+    if slot is None:
+        async with BrowserSession() as own:
+            return await scrape_date_grid(origin, dest, dep_date, ret_date, slot=own.slot())
 
+    route = f"{origin}-{dest}"
+    print(f"    [GRID] {route} {dep_date}→{ret_date} çevresi — tablo taranıyor")
+    page = await slot.page()
+    capture = ResultCapture(page, markers=GRID_RPC_MARKERS)
+    cells = []
+    captcha_seen = broken = False
+    try:
+        await _goto(page, flights_url(f"{origin} to {dest} {dep_date} {ret_date}"))
+        if await wait_for_results(page) == "captcha" or "/sorry/" in page.url:
+            print(f"    [GRID] CAPTCHA: URL /sorry/")
+            captcha_seen = True
+        else:
+            await _close_cookie_popup(page, slot)
+            await _open_grid_view(page, GRID_BUTTONS, "Tarih tablosu")
+            await _open_grid_view(page, GRAPH_BUTTONS, "Fiyat grafiği")
+            await capture.settle()
+            for body in capture.bodies:
+                cells.extend(parse_grid_payload(body))
+    except Exception as e:
+        print(f"    [GRID HATA] {type(e).__name__}: {e}")
+        broken = True
+    finally:
+        capture.detach()
+        await slot.finish_search(captcha=captcha_seen, broken=broken, found=bool(cells))
+
+    if captcha_seen:
+        raise CaptchaError(route)
+    if not cells:
+        print(f"    [GRID] Tablo okunamadı, tam arama ile devam")
+        return await scrape_with_playwright(origin, dest, dep_date, ret_date, slot=slot)
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    mn, mx = BOUNDS.get(route, (100, 200000))
+    best = {}
+    for d, r, p in cells:
+        if d >= today and r > d and mn <= p <= mx:
+            best[(d, r)] = min(p, best.get((d, r), p))
+    print(f"    [GRID] {len(best)} tarih çifti okundu")
+
+    scraped_at = datetime.now()
+    results = [{"price": p, "airline": "Çeşitli", "has_stopover": None,
+                "depart_date": d, "return_date": r,
+                "scraped_at": scraped_at, "source": "grid"}
+               for (d, r), p in sorted(best.items(), key=lambda x: x[1])]
+
+    threshold = TARGET_PRICES.get(route, 0) * DIRECT_THRESHOLD
+    dip = lambda f: ANOMALY.is_anomaly(ANOMALY.check(route, f["depart_date"], f["price"], "grid")[0], False)
+    verify = [f for f in results if f["price"] <= threshold or dip(f)][:GRID_VERIFY_MAX]
+    for cell in verify:
+        pair = (cell["depart_date"], cell["return_date"])
+        print(f"    [GRID] Eşik altı / dip hücre doğrulanıyor: {pair[0]}→{pair[1]}")
+        try:
+            exact = await scrape_with_playwright(origin, dest, *pair, slot=slot)
+        except CaptchaError:
+            # Tablo hücreleri elde; iş yeniden kuyruğa girmez, devre diğer worker'ları durdurur
+            print(f"    [GRID] Doğrulamada CAPTCHA — {len(results)} hücre doğrulanmadan korunuyor")
+            note_captcha((origin, dest, *pair), slot)
+            break
+        results.remove(cell)
+        results.extend(dict(f, depart_date=pair[0], return_date=pair[1]) for f in exact)
     return results
 
 
-def _form_based_search(page, origin, dest, dep_date, ret_date, route):
+async def _form_based_search(page, origin, dest, dep_date, ret_date, route, capture=None, slot=None):
     """
     Form doldurarak arama — URL yöntemi başarısız olduğunda fallback.
     Sayfayı yeniden yükler ve formu doldurmaya çalışır.
+    (durum, sonuçlar) döner; durumlar _url_search ile aynı. CAPTCHA hem
+    wait_for_results'un /sorry/ sinyalinden hem HTML taramasından okunur.
     """
-    import urllib.parse
-    results = []
     try:
-        page.goto(
-            "https://www.google.com/travel/flights?hl=tr&curr=TRY&gl=TR",
-            timeout=PAGE_TIMEOUT_MS, wait_until="domcontentloaded"
-        )
-        page.wait_for_timeout(random.randint(1500, 2500))
-        _close_cookie_popup(page)
-        _ensure_roundtrip(page)
+        await _goto(page, flights_url())
+        await page.wait_for_timeout(random.randint(1500, 2500))
+        await _close_cookie_popup(page, slot)
+        await _ensure_roundtrip(page, slot)
 
         origin_name = AIRPORT_NAMES.get(origin, origin)
         dest_name   = AIRPORT_NAMES.get(dest, dest)
 
-        if not _fill_airport_field(page, "origin", origin, origin_name):
+        if not await _fill_airport_field(page, "origin", origin, origin_name):
             print(f"    [PW] Form: Origin doldurulamadı")
-            return []
-        page.wait_for_timeout(random.randint(800, 1200))
+            return "empty", []
+        await page.wait_for_timeout(random.randint(800, 1200))
 
-        if not _fill_airport_field(page, "dest", dest, dest_name):
+        if not await _fill_airport_field(page, "dest", dest, dest_name):
             print(f"    [PW] Form: Dest doldurulamadı")
-            return []
-        page.wait_for_timeout(random.randint(800, 1200))
+            return "empty", []
+        await page.wait_for_timeout(random.randint(800, 1200))
 
-        _select_dates(page, dep_date, ret_date)
-        page.wait_for_timeout(random.randint(800, 1200))
-        _click_search(page)
+        await _select_dates(page, dep_date, ret_date)
+        await page.wait_for_timeout(random.randint(800, 1200))
+        if capture: await capture.reset()
+        await _click_search(page)
 
-        page.wait_for_timeout(RENDER_WAIT_MS)
-        try:
-            page.wait_for_load_state("networkidle", timeout=12000)
-        except:
-            pass
-        page.wait_for_timeout(3000)
+        if await wait_for_results(page) == "captcha":
+            print(f"    [PW] Form CAPTCHA: URL /sorry/")
+            return "captcha", []
 
-        title = page.title()
-        html  = page.content()
+        title = await page.title()
         print(f"    [PW] Form sonuç: '{title[:70]}'")
 
-        captcha, sig = is_real_captcha(html, page.url)
-        if captcha:
-            print(f"    [PW] Form CAPTCHA: {sig}")
-            return []
-
         scraped_at = datetime.now()
-        dom_results = _dom_extract(page, route, scraped_at)
+        if capture:
+            rpc_results = await capture.flights(route, scraped_at, source="form_rpc")
+            if rpc_results:
+                return "ok", rpc_results
+
+        html  = await _page_content(page)
+
+        with TRACER.span("html.scan"):
+            scan = scan_page(html, route, page.url)
+        if scan["captcha"]:
+            print(f"    [PW] Form CAPTCHA: {scan['captcha_signal']}")
+            return "captcha", []
+
+        dom_results = await _dom_extract(page, route, scraped_at)
         if dom_results:
-            return dom_results
+            return "ok", dom_results
 
-        prices = extract_prices_from_html(html, route)
-        stop   = detect_stopover(html)
-        return [{"price": p, "airline": "Çeşitli", "has_stopover": stop,
-                 "scraped_at": scraped_at, "source": "form_html"} for p in prices]
+        log_scan(scan, html, route)
+        stop   = scan["has_stopover"]
+        results = [{"price": p, "airline": "Çeşitli", "has_stopover": stop,
+                    "scraped_at": scraped_at, "source": "form_html"} for p in scan["prices"]]
+        return ("ok" if results else "empty"), results
 
     except Exception as e:
         print(f"    [PW] Form hata: {type(e).__name__}: {e}")
-        return []
+        return "empty", []
 
 
-def _close_cookie_popup(page):
-    """Cookie / consent popup'ını kapat."""
+async def _close_cookie_popup(page, slot=None):
+    """Cookie / consent popup'ını kapat. Context'te consent zaten varsa hiç bakılmaz."""
+    if slot is not None and slot.consent_ok:
+        return
     for text in ["Tümünü reddet", "Reject all", "Kabul et", "Accept all", "Agree"]:
         try:
             btn = page.get_by_role("button", name=re.compile(text, re.IGNORECASE))
-            if btn.count() > 0:
-                btn.first.click(timeout=3000)
+            if await btn.count() > 0:
+                await btn.first.click(timeout=3000)
                 print(f"    [PW] Popup kapatıldı: '{text}'")
-                page.wait_for_timeout(500)
+                await page.wait_for_timeout(500)
+                if slot is not None: slot.consent_ok = True
                 return
         except: pass
+    if slot is not None:
+        # Popup yoksa consent cookie'si zaten set olmuş olabilir
+        try: slot.consent_ok = any(c.get("name") in CONSENT_COOKIES for c in await page.context.cookies())
+        except: pass
 
 
-def _ensure_roundtrip(page):
+async def _ensure_roundtrip(page, slot=None):
     """
     Gidiş-dönüş modunda olduğundan emin ol.
     KRİTİK: Uçuş tipi dropdown'u açık kalırsa havalimanı alanına
     tıklama engellendiği için mutlaka Escape ile kapat.
+    Context'te bir kez kontrol edildiyse tekrar yoklanmaz.
     """
+    if slot is not None and slot.roundtrip_ok:
+        return
+    if slot is not None:
+        slot.roundtrip_ok = True
     try:
         # Mevcut mod metnini oku
         trip_btn = page.locator('.VfPpkd-TkwUic, [jsname="K4r5Ff"]').first
-        if trip_btn.count() > 0:
+        if await trip_btn.count() > 0:
             try:
-                text = trip_btn.inner_text(timeout=1500)
+                text = await trip_btn.inner_text(timeout=1500)
                 print(f"    [PW] Uçuş tipi: '{text.strip()}'")
             except:
                 pass
@@ -472,13 +1847,13 @@ def _ensure_roundtrip(page):
     finally:
         # Açık kalan HER dropdown/popup'ı kapat — bu kritik!
         try:
-            page.keyboard.press("Escape")
-            page.wait_for_timeout(400)
+            await page.keyboard.press("Escape")
+            await page.wait_for_timeout(400)
         except:
             pass
 
 
-def _fill_airport_field(page, field_type, code, name):
+async def _fill_airport_field(page, field_type, code, name):
     """
     Havalimanı alanını doldur.
     field_type: "origin" veya "dest"
@@ -511,26 +1886,26 @@ def _fill_airport_field(page, field_type, code, name):
     for sel in selectors:
         try:
             field = page.locator(sel).first
-            if field.count() == 0:
+            if await field.count() == 0:
                 continue
 
             # force=True: overlay/dialog engelini aşar
-            field.click(timeout=5000, force=True)
-            page.wait_for_timeout(600)
+            await field.click(timeout=5000, force=True)
+            await page.wait_for_timeout(600)
 
             # Tüm metni seç ve sil
-            field.press("Control+a")
-            page.wait_for_timeout(100)
-            field.press("Backspace")
-            page.wait_for_timeout(200)
+            await field.press("Control+a")
+            await page.wait_for_timeout(100)
+            await field.press("Backspace")
+            await page.wait_for_timeout(200)
 
             # fill() Google autocomplete'i tetiklemiyor — karakter karakter yaz
             try:
-                page.evaluate("el => { el.value = ''; el.dispatchEvent(new Event('input')); }", field.element_handle())
+                await page.evaluate("el => { el.value = ''; el.dispatchEvent(new Event('input')); }", await field.element_handle())
             except:
                 pass
-            field.type(code, delay=random.randint(100, 180))
-            page.wait_for_timeout(random.randint(2000, 2800))
+            await field.type(code, delay=random.randint(100, 180))
+            await page.wait_for_timeout(random.randint(2000, 2800))
 
             # ─────────────────────────────────────────────────────
             # KRİTİK: Havalimanı autocomplete'i bekle.
@@ -539,46 +1914,46 @@ def _fill_airport_field(page, field_type, code, name):
             # Sadece görünür havalimanı suggestion li'lerini hedefle.
             # ─────────────────────────────────────────────────────
             airport_suggestions = page.locator('ul[role="listbox"] li[role="option"]')
-            if airport_suggestions.count() == 0:
+            if await airport_suggestions.count() == 0:
                 airport_suggestions = page.locator('.DFGgtd li, .rA4ede li, [jsname="c72uKd"] li')
 
-            if airport_suggestions.count() > 0:
+            if await airport_suggestions.count() > 0:
                 clicked = False
-                for i in range(min(6, airport_suggestions.count())):
+                for i in range(min(6, await airport_suggestions.count())):
                     try:
                         item = airport_suggestions.nth(i)
-                        if not item.is_visible():
+                        if not await item.is_visible():
                             continue
-                        item_text = item.inner_text(timeout=1000)
+                        item_text = await item.inner_text(timeout=1000)
                         if code.upper() in item_text.upper() or name.split()[0].lower() in item_text.lower():
-                            item.click(timeout=3000)
+                            await item.click(timeout=3000)
                             print(f"    [PW] '{code}' seçildi: {item_text[:50]}")
-                            page.wait_for_timeout(400)
+                            await page.wait_for_timeout(400)
                             return True
                     except:
                         continue
 
-                for i in range(min(6, airport_suggestions.count())):
+                for i in range(min(6, await airport_suggestions.count())):
                     try:
                         item = airport_suggestions.nth(i)
-                        if item.is_visible():
-                            item_text = item.inner_text(timeout=1000)
-                            item.click(timeout=3000)
+                        if await item.is_visible():
+                            item_text = await item.inner_text(timeout=1000)
+                            await item.click(timeout=3000)
                             print(f"    [PW] '{code}' ilk görünür seçenek: {item_text[:50]}")
-                            page.wait_for_timeout(400)
+                            await page.wait_for_timeout(400)
                             return True
                     except:
                         continue
 
             # Son çare: Enter — ama önce seçilen değeri doğrula
-            field.press("Enter")
-            page.wait_for_timeout(800)
+            await field.press("Enter")
+            await page.wait_for_timeout(800)
             try:
-                val = field.input_value(timeout=1000)
+                val = await field.input_value(timeout=1000)
                 if val and code.upper() not in val.upper():
                     print(f"    [PW] '{code}' YANLIŞ SEÇIM: '{val}' — bu selector reddediliyor")
-                    field.press("Control+a")
-                    field.press("Backspace")
+                    await field.press("Control+a")
+                    await field.press("Backspace")
                     continue
                 print(f"    [PW] '{code}' Enter ile girildi, değer='{val}'")
             except:
@@ -592,7 +1967,7 @@ def _fill_airport_field(page, field_type, code, name):
     return False
 
 
-def _select_dates(page, dep_date, ret_date):
+async def _select_dates(page, dep_date, ret_date):
     """
     Tarih alanlarını doldur.
     Önce text input deneyi, yoksa takvim UI.
@@ -609,7 +1984,7 @@ def _select_dates(page, dep_date, ret_date):
         '.TP4Lpb input:last-of-type',
     ]
 
-    def fill_date_field(selectors, date_str):
+    async def fill_date_field(selectors, date_str):
         # Türkçe tarih formatı: GG Ay YYYY (örn: 10 Nis 2026)
         dt = datetime.strptime(date_str, "%Y-%m-%d")
         tr_months = {1:"Oca",2:"Şub",3:"Mar",4:"Nis",5:"May",6:"Haz",
@@ -619,33 +1994,33 @@ def _select_dates(page, dep_date, ret_date):
         for sel in selectors:
             try:
                 field = page.locator(sel).first
-                if field.count() == 0: continue
-                field.click(timeout=3000)
-                page.wait_for_timeout(500)
-                field.fill("")
-                field.type(date_str, delay=80)  # YYYY-MM-DD dene
-                page.wait_for_timeout(800)
+                if await field.count() == 0: continue
+                await field.click(timeout=3000)
+                await page.wait_for_timeout(500)
+                await field.fill("")
+                await field.type(date_str, delay=80)  # YYYY-MM-DD dene
+                await page.wait_for_timeout(800)
                 # Autocomplete'den seç veya Enter
                 opts = page.locator('li[role="option"]')
-                if opts.count() > 0:
-                    opts.first.click(timeout=2000)
+                if await opts.count() > 0:
+                    await opts.first.click(timeout=2000)
                 else:
-                    field.press("Enter")
-                    page.wait_for_timeout(500)
+                    await field.press("Enter")
+                    await page.wait_for_timeout(500)
                 return True
             except: continue
         return False
 
-    dep_ok = fill_date_field(dep_selectors, dep_date)
-    page.wait_for_timeout(random.randint(500, 1000))
-    ret_ok = fill_date_field(ret_selectors, ret_date)
+    dep_ok = await fill_date_field(dep_selectors, dep_date)
+    await page.wait_for_timeout(random.randint(500, 1000))
+    ret_ok = await fill_date_field(ret_selectors, ret_date)
 
     if not dep_ok or not ret_ok:
         # Takvim UI dene
-        _select_dates_calendar(page, dep_date, ret_date)
+        await _select_dates_calendar(page, dep_date, ret_date)
 
 
-def _select_dates_calendar(page, dep_date, ret_date):
+async def _select_dates_calendar(page, dep_date, ret_date):
     """
     Takvim arayüzü ile tarih seç.
     Google Flights'ta tarih alanları çoğunlukla takvim popup'ı açar.
@@ -663,9 +2038,9 @@ def _select_dates_calendar(page, dep_date, ret_date):
     for sel in date_triggers:
         try:
             el = page.locator(sel).first
-            if el.count() > 0 and el.is_visible():
-                el.click(timeout=3000, force=True)
-                page.wait_for_timeout(1000)
+            if await el.count() > 0 and await el.is_visible():
+                await el.click(timeout=3000, force=True)
+                await page.wait_for_timeout(1000)
                 opened = True
                 print(f"    [PW] Takvim açıldı: {sel[:50]}")
                 break
@@ -683,11 +2058,11 @@ def _select_dates_calendar(page, dep_date, ret_date):
 
         # Yöntem 1: data-iso attribute
         day_iso = page.locator(f'[data-iso="{iso}"]')
-        if day_iso.count() > 0:
+        if await day_iso.count() > 0:
             try:
-                day_iso.first.click(timeout=3000, force=True)
+                await day_iso.first.click(timeout=3000, force=True)
                 print(f"    [PW] {label} seçildi (data-iso): {iso}")
-                page.wait_for_timeout(500)
+                await page.wait_for_timeout(500)
                 clicked = True
             except:
                 pass
@@ -699,11 +2074,11 @@ def _select_dates_calendar(page, dep_date, ret_date):
             tr_label = f"{dt.day} {tr_months[dt.month]} {dt.year}"
             en_label = dt.strftime("%B %d, %Y")
             day_aria = page.locator(f'[aria-label*="{tr_label}"], [aria-label*="{en_label}"]')
-            if day_aria.count() > 0:
+            if await day_aria.count() > 0:
                 try:
-                    day_aria.first.click(timeout=3000, force=True)
+                    await day_aria.first.click(timeout=3000, force=True)
                     print(f"    [PW] {label} seçildi (aria): {tr_label}")
-                    page.wait_for_timeout(500)
+                    await page.wait_for_timeout(500)
                     clicked = True
                 except:
                     pass
@@ -715,16 +2090,16 @@ def _select_dates_calendar(page, dep_date, ret_date):
     for done_text in ["Bitti", "Done", "Tamam", "OK", "Ara"]:
         try:
             btn = page.get_by_role("button", name=re.compile(done_text, re.IGNORECASE))
-            if btn.count() > 0 and btn.first.is_visible():
-                btn.first.click(timeout=2000)
+            if await btn.count() > 0 and await btn.first.is_visible():
+                await btn.first.click(timeout=2000)
                 print(f"    [PW] Takvim kapatıldı: {done_text}")
-                page.wait_for_timeout(500)
+                await page.wait_for_timeout(500)
                 break
         except:
             pass
 
 
-def _click_search(page):
+async def _click_search(page):
     """Arama butonuna tıkla."""
     search_selectors = [
         'button[aria-label*="Ara"], button[aria-label*="Search"]',
@@ -736,131 +2111,104 @@ def _click_search(page):
     for sel in search_selectors:
         try:
             btn = page.locator(sel).first
-            if btn.count() > 0:
-                btn.click(timeout=5000)
+            if await btn.count() > 0:
+                await btn.click(timeout=5000)
                 print(f"    [PW] Arama butonuna tıklandı: {sel}")
                 return True
         except: continue
 
     # Son çare: Enter tuşu
-    page.keyboard.press("Enter")
+    await page.keyboard.press("Enter")
     print(f"    [PW] Enter ile arama tetiklendi")
     return True
 
 
-def _fallback_url_scrape(page, origin, dest, dep_date, ret_date, route):
+async def _fallback_url_scrape(page, origin, dest, dep_date, ret_date, route):
     """
     Form doldurulamadığında URL parametreli yaklaşım dene.
     q= parametresi hash'ten farklı olarak bazı durumlarda çalışır.
+    (durum, sonuçlar) döner; durumlar _url_search ile aynı.
     """
-    import urllib.parse
     print(f"    [PW] Fallback: URL ile arama deneniyor...")
-    url = (f"https://www.google.com/travel/flights"
-           f"?hl=tr&curr=TRY&gl=TR"
-           f"&q={urllib.parse.quote(AIRPORT_NAMES.get(origin, origin))}"
-           f"+to+{urllib.parse.quote(AIRPORT_NAMES.get(dest, dest))}"
-           f"+{dep_date}+{ret_date}")
+    url = flights_url(f"{AIRPORT_NAMES.get(origin, origin)} to "
+                      f"{AIRPORT_NAMES.get(dest, dest)} {dep_date} {ret_date}")
     try:
-        page.goto(url, timeout=PAGE_TIMEOUT_MS, wait_until="domcontentloaded")
+        await _goto(page, url)
         # JavaScript render için bekle
-        page.wait_for_timeout(RENDER_WAIT_MS)
-        try:
-            page.wait_for_load_state("networkidle", timeout=15000)
-        except:
-            pass
-        page.wait_for_timeout(3000)
-        html = page.content()
-        captcha, sig = is_real_captcha(html, page.url)
-        if captcha:
-            print(f"    [PW] Fallback CAPTCHA: {sig}")
-            return []
-        prices = extract_prices_from_html(html, route)
-        stop   = detect_stopover(html)
+        if await wait_for_results(page) == "captcha":
+            print(f"    [PW] Fallback CAPTCHA: URL /sorry/")
+            return "captcha", []
+        html = await _page_content(page)
+        with TRACER.span("html.scan"):
+            scan = scan_page(html, route, page.url)
+        if scan["captcha"]:
+            print(f"    [PW] Fallback CAPTCHA: {scan['captcha_signal']}")
+            return "captcha", []
+        log_scan(scan, html, route)
+        stop   = scan["has_stopover"]
         scraped_at = datetime.now()
-        return [{"price": p, "airline": "Çeşitli", "has_stopover": stop,
-                 "scraped_at": scraped_at, "source": "playwright_url"} for p in prices]
+        results = [{"price": p, "airline": "Çeşitli", "has_stopover": stop,
+                    "scraped_at": scraped_at, "source": "playwright_url"} for p in scan["prices"]]
+        return ("ok" if results else "empty"), results
     except Exception as e:
         print(f"    [PW] Fallback hata: {e}")
-        return []
-
-
-def _dom_extract(page, route, scraped_at):
-    """DOM'dan fiyatları çek."""
-    mn, mx = BOUNDS.get(route, (100, 200000))
-    results = []
-
-    price_selectors = [
-        # Google Flights 2024+ fiyat container'ları
-        '[data-gs] .YMlIz',
-        '[data-gs] .FpEdX',
-        '[data-gs]',
-        # Aria label bazlı
-        '[aria-label*="TL"]',
-        '[aria-label*="Türk lirası"]',
-        # Genel
-        'div.YMlIz',
-        'span.YMlIz',
-        'div.FpEdX',
-    ]
-
-    price_regex = [
-        r'₺\s*([\d]{1,3}(?:[.,][\d]{3})+)',
-        r'₺\s*(\d{4,6})',
-        r'([\d]{1,3}(?:[.,][\d]{3})+)\s*TL',
-    ]
+        return "empty", []
+
+
+# Tüm seçiciler için metin + aria-label + kart ipuçlarını tek evaluate'te toplar.
+# Dönen: [[seçici, eleman sayısı, [{text, card, carrier}, ...]], ...] (PRICE_SELECTORS sırasıyla)
+_DOM_COLLECT_JS = """
+([selectors, limit]) => selectors.map(sel => {
+  let nodes;
+  try { nodes = document.querySelectorAll(sel); } catch (e) { return [sel, 0, []]; }
+  const items = [];
+  for (const el of Array.from(nodes).slice(0, limit)) {
+    const text = (el.innerText || '').trim() || el.getAttribute('aria-label') || '';
+    if (!text) continue;
+    const card = el.closest('li, [role="listitem"], [data-gs]') || el.parentElement;
+    const carrierEl = card && card.querySelector('.sSHqwe, [data-carrier], [class*="airline"]');
+    let carrier = carrierEl ? (carrierEl.innerText || '').trim() : '';
+    const cardText = card ? (card.innerText || '').slice(0, 400) : '';
+    if (!carrier && card) {
+      const m = cardText.split(/[\\n·]/).map(x => x.trim()).find(x => /air|havayol|jet|pegasus|lines/i.test(x));
+      carrier = m || '';
+    }
+    items.push({text, card: cardText, carrier});
+  }
+  return [sel, nodes.length, items];
+})
+"""
 
-    for sel in price_selectors:
-        try:
-            elems = page.locator(sel).all()
-            if not elems: continue
-            print(f"    [DOM] '{sel}' → {len(elems)} element")
 
-            for elem in elems[:40]:
-                try:
-                    text = (elem.inner_text() or "").strip()
-                    if not text:
-                        text = elem.get_attribute("aria-label") or ""
-                    if not text: continue
-
-                    for pat in price_regex:
-                        m = re.search(pat, text.replace("\xa0", "").replace("\u200b", ""))
-                        if m:
-                            raw   = m.group(1).replace(".", "").replace(",", "")
-                            price = float(raw)
-                            if mn <= price <= mx:
-                                stop = any(kw in text.lower()
-                                           for kw in ["aktarma", "1 stop", "2 stop", "layover"])
-                                results.append({
-                                    "price": price,
-                                    "airline": "Çeşitli",
-                                    "has_stopover": stop,
-                                    "scraped_at": scraped_at,
-                                    "source": "playwright_dom",
-                                })
-                                print(f"    [DOM] ✓ {price:,.0f} TL")
-                            break
-                except: pass
-
-            if results: break
+async def _dom_extract(page, route, scraped_at):
+    """
+    DOM'dan fiyatları çek — tek page.evaluate ile tüm seçiciler toplanır,
+    regex'ler Python'da bir kez çalışır. İlk sonuç veren seçici kazanır.
+    """
+    try:
+        with TRACER.span("dom.extract"):
+            groups = await page.evaluate(_DOM_COLLECT_JS, [PRICE_SELECTORS, 40])
+    except Exception as e:
+        print(f"    [DOM] Hata: {e}")
+        return []
 
-        except Exception as e:
-            print(f"    [DOM] Hata: {e}")
+    results = []
+    for sel, count, items in groups:
+        if not count: continue
+        print(f"    [DOM] '{sel}' → {count} element")
+        results = parse_dom_texts([it["text"] for it in items], route, scraped_at, hints=items)
+        for r in results:
+            print(f"    [DOM] ✓ {r['price']:,.0f} TL | {r['airline']}")
+        if results: break
 
-    # Deduplicate
-    seen = set()
-    unique = []
-    for r in results:
-        if r["price"] not in seen:
-            seen.add(r["price"])
-            unique.append(r)
-    return sorted(unique, key=lambda x: x["price"])
+    return results
 
 
-def _save_debug_screenshot(page, origin, dest, dep_date):
+async def _save_debug_screenshot(page, origin, dest, dep_date):
     """Hata durumunda screenshot kaydet."""
     try:
         path = f"/tmp/titan_debug_{origin}{dest}_{dep_date}.png"
-        page.screenshot(path=path, full_page=False)
+        await page.screenshot(path=path, full_page=False)
         print(f"    [PW] Screenshot: {path}")
     except: pass
 
@@ -868,6 +2216,8 @@ def _save_debug_screenshot(page, origin, dest, dep_date):
 # HISTORY
 # ============================================================
 HFILE = Path("history.json")
+HLOG  = Path("history.log")    # Run içi alarm kayıtları (NDJSON, her satır fsync'li)
+HISTORY_KEEP_DAYS = 30
 
 def load_history():
     if HFILE.exists():
@@ -875,60 +2225,664 @@ def load_history():
         except: pass
     return {"alarms": []}
 
+def _atomic_write(path, text):
+    """Önce .tmp, sonra os.replace — yazım yarıda kesilirse eski dosya kalır."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
 def save_history(h):
-    HFILE.write_text(json.dumps(h, ensure_ascii=False, indent=2), encoding="utf-8")
+    _atomic_write(HFILE, json.dumps(h, ensure_ascii=False, indent=2))
+
+
+class AlarmHistory:
+    """
+    Alarm geçmişi: run başında bir kez yüklenir, rota → zamana göre sıralı
+    (time, price) listesi olarak indekslenir. 24 saatlik pencere bisect ile
+    bulunur; tüm geçmiş taranmaz.
+
+    record() her alarmı history.log'a ekler (fsync) — run çökse bile kayıt
+    kalır ve sonraki run'da okunur. flush() 30 günden eskileri budayıp
+    history.json'u bir kez atomik yazar ve log'u siler.
+    """
+
+    def __init__(self, path=HFILE, log_path=HLOG):
+        self.path = path
+        self.log_path = log_path
+        self._by_route = None
+        self._dirty = False
+
+    def _load(self):
+        if self._by_route is not None:
+            return
+        with TRACER.span("history.load"):
+            alarms = load_history().get("alarms", []) if self.path.exists() else []
+            if self.log_path.exists():
+                for line in self.log_path.read_text(encoding="utf-8").splitlines():
+                    try: alarms.append(json.loads(line))
+                    except ValueError: pass   # Yarım yazılmış son satır
+                self._dirty = True
+            self._by_route = {}
+            seen = set()
+            for a in alarms:
+                key = (a.get("route"), a.get("time", ""), a.get("price"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                self._by_route.setdefault(key[0], []).append((key[1], key[2]))
+            for entries in self._by_route.values():
+                entries.sort(key=lambda e: e[0])
+
+    def recent(self, route, hours=24):
+        """Rotanın son `hours` saatteki (time, price) kayıtları."""
+        import bisect
+        self._load()
+        entries = self._by_route.get(route, [])
+        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
+        i = bisect.bisect_right(entries, cutoff, key=lambda e: e[0])
+        return entries[i:]
+
+    def can_send(self, route, price, target):
+        band_low  = price * 0.95
+        band_high = price * 1.05
+        for _, p in self.recent(route, 24):
+            if p is not None and band_low <= p <= band_high:
+                return False, f"{route} aynı bandda 24s içinde alarm gönderildi"
+        return True, "OK"
+
+    def record(self, route, price):
+        self._load()
+        entry = {"route": route, "price": price, "time": datetime.now().isoformat()}
+        self._by_route.setdefault(route, []).append((entry["time"], price))
+        with TRACER.span("history.record"), open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._dirty = True
+
+    def absorb(self, log_path):
+        """Başka bir sürecin (parça run) history.log'unu katar; tekrar kayıtlar atlanır."""
+        self._load()
+        try: lines = Path(log_path).read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError: return 0
+        seen = {(route, t, p) for route, entries in self._by_route.items() for t, p in entries}
+        added = 0
+        for line in lines:
+            try: a = json.loads(line)
+            except ValueError: continue
+            key = (a.get("route"), a.get("time", ""), a.get("price"))
+            if key in seen:
+                continue
+            seen.add(key)
+            self._by_route.setdefault(key[0], []).append((key[1], key[2]))
+            added += 1
+        if added:
+            for entries in self._by_route.values():
+                entries.sort(key=lambda e: e[0])
+            self._dirty = True
+        return added
+
+    def flush(self):
+        """Budanmış geçmişi history.json'a yazar, log'u temizler."""
+        if self._by_route is None:
+            self._load()
+        cutoff = (datetime.now() - timedelta(days=HISTORY_KEEP_DAYS)).isoformat()
+        total = sum(len(e) for e in self._by_route.values())
+        alarms = []
+        for route, entries in self._by_route.items():
+            entries[:] = [e for e in entries if e[0] > cutoff]
+            for t, p in entries:
+                a = {"route": route, "time": t}
+                if p is not None: a["price"] = p
+                alarms.append(a)
+        pruned = total - len(alarms)
+        if not self._dirty and not pruned:
+            return
+        alarms.sort(key=lambda a: a["time"])
+        with TRACER.span("history.flush", alarms=len(alarms)):
+            save_history({"alarms": alarms})
+        try: self.log_path.unlink()
+        except FileNotFoundError: pass
+        self._dirty = False
+        print(f"  [HIST] {len(alarms)} alarm kaydı" + (f", {pruned} eski kayıt budandı" if pruned else ""))
+
+
+HISTORY = AlarmHistory()
 
 def can_send_alarm(route, price, target):
-    h = load_history()
-    cutoff30 = (datetime.now() - timedelta(days=30)).isoformat()
-    h["alarms"] = [a for a in h.get("alarms", []) if a.get("time", "") > cutoff30]
-    cutoff24  = (datetime.now() - timedelta(hours=24)).isoformat()
-    band_low  = price * 0.95
-    band_high = price * 1.05
-    recent = [
-        a for a in h["alarms"]
-        if a.get("route") == route
-        and a.get("time", "") > cutoff24
-        and band_low <= a.get("price", 0) <= band_high
-    ]
-    if recent:
-        return False, f"{route} aynı bandda 24s içinde alarm gönderildi"
-    return True, "OK"
+    return HISTORY.can_send(route, price, target)
 
 def record_alarm(route, price):
-    h = load_history()
-    h.setdefault("alarms", []).append({
-        "route": route, "price": price, "time": datetime.now().isoformat()
-    })
-    save_history(h)
+    HISTORY.record(route, price)
+
+# ============================================================
+# FİYAT GEÇMİŞİ (zaman serisi + rota istatistikleri)
+# ============================================================
+PRICE_COLUMNS = ["scraped_at", "route", "depart_date", "return_date", "price",
+                 "has_stopover", "stops", "duration_min", "airline", "source"]
+PRICE_STATS_WINDOW = 500   # Rota başına istatistiğe giren son arama sayısı
+PRICE_STATS_DAYS   = 30    # Bundan eski gözlemler pencereden düşer
+
+
+class PriceStore:
+    """
+    Her fiyat satırı data/prices/YYYY-MM-DD.csv'ye eklenir (append-only,
+    tarama gününe göre bölümlü). Rota istatistikleri her aramada artımlı
+    güncellenir; ham pencere data/price_window.json'da, dashboard'un okuduğu
+    özet (pencere olmadan) data/price_stats.json'da tutulur:
+
+      - pencere: aramanın en ucuz fiyatı, zaman sıralı (en çok PRICE_STATS_WINDOW, PRICE_STATS_DAYS gün)
+      - sıralı kopya bisect ile güncellenir; min/p10/p25/medyan/p75/p90/max O(1) okunur
+
+    Dashboard ve alarm mantığı geçmişi taramadan stats(route) ile sorgular.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.dir = Path(data_dir)
+        self.stats_path = self.dir / "price_stats.json"     # Dashboard özeti
+        self.window_path = self.dir / "price_window.json"   # Ham pencere (yalnız scraper okur)
+        self._routes = None     # route → {"recent": [[t, p], ...], "sorted": [...], "n_total": int}
+        self._dirty = False
+
+    def _load(self):
+        if self._routes is not None:
+            return
+        self._routes = {}
+        for path in (self.window_path, self.stats_path):   # Eski price_stats.json pencereyi de tutuyordu
+            try:
+                raw = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for route, st in raw.get("routes", {}).items():
+                if route in self._routes or "recent" not in st:
+                    continue
+                recent = [tuple(x) for x in st["recent"]]
+                self._routes[route] = {
+                    "recent": recent,
+                    "sorted": sorted(p for _, p in recent),
+                    "n_total": st.get("n_total", len(recent)),
+                }
+
+    def _append_csv(self, rows):
+        import csv
+        by_day = {}
+        for r in rows:
+            r = dict(r, source=r.get("data_source"))
+            by_day.setdefault(r["scraped_at"][:10], []).append(r)
+        for day, day_rows in by_day.items():
+            path = self.dir / "prices" / f"{day}.csv"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            new = not path.exists()
+            with open(path, "a", encoding="utf-8", newline="") as f:
+                w = csv.DictWriter(f, fieldnames=PRICE_COLUMNS, extrasaction="ignore")
+                if new: w.writeheader()
+                w.writerows(day_rows)
+
+    def add(self, route, rows):
+        """Bir aramanın flights.json satırları: CSV'ye yazılır, en ucuzu istatistiğe girer."""
+        import bisect
+        rows = [r for r in rows if r.get("price") is not None]
+        if not rows:
+            return
+        self._append_csv(rows)
+
+        self._load()
+        st = self._routes.setdefault(route, {"recent": [], "sorted": [], "n_total": 0})
+        cheapest = min(rows, key=lambda r: r["price"])
+        t, p = cheapest["scraped_at"], float(cheapest["price"])
+        st["recent"].append((t, p))
+        bisect.insort(st["sorted"], p)
+        st["n_total"] += 1
+
+        cutoff = (datetime.now() - timedelta(days=PRICE_STATS_DAYS)).isoformat()
+        while st["recent"] and (len(st["recent"]) > PRICE_STATS_WINDOW or st["recent"][0][0] < cutoff):
+            _, old = st["recent"].pop(0)
+            del st["sorted"][bisect.bisect_left(st["sorted"], old)]
+        self._dirty = True
+
+    def stats(self, route):
+        """Rota özet istatistiği; veri yoksa None."""
+        self._load()
+        st = self._routes.get(route)
+        if not st or not st["sorted"]:
+            return None
+        vals = st["sorted"]
+        n = len(vals)
+        q = lambda x: vals[min(n - 1, int(n * x))]
+        return {
+            "n": n, "n_total": st["n_total"],
+            "min": vals[0], "p10": q(0.10), "p25": q(0.25), "median": q(0.50),
+            "p75": q(0.75), "p90": q(0.90), "max": vals[-1],
+            "last": st["recent"][-1][1], "last_at": st["recent"][-1][0],
+        }
+
+    def flush(self):
+        """price_window.json ve price_stats.json'u atomik yazar (run sonunda bir kez)."""
+        if not self._dirty:
+            return
+        head = {"updated": datetime.now().isoformat(), "window": PRICE_STATS_WINDOW, "days": PRICE_STATS_DAYS}
+        out, window = dict(head, routes={}), dict(head, routes={})
+        for route in sorted(self._routes):
+            st = self._routes[route]
+            summary = self.stats(route)
+            if summary is None:
+                continue
+            out["routes"][route] = summary
+            window["routes"][route] = {"n_total": st["n_total"], "recent": [list(x) for x in st["recent"]]}
+        _atomic_write(self.window_path, json.dumps(window, ensure_ascii=False, separators=(",", ":")))
+        _atomic_write(self.stats_path, json.dumps(out, ensure_ascii=False, separators=(",", ":")))
+        self._dirty = False
+        print(f"  [DATA] {len(out['routes'])} rota istatistiği → {self.stats_path}")
+
+
+PRICE_STORE = PriceStore()
+
+# ============================================================
+# ANOMALİ MODELİ (rota × kalkışa kalan gün)
+# ============================================================
+ANOMALY_ALPHA    = 0.1    # EWMA ağırlığı (~son 20 gözlem)
+ANOMALY_MIN_N    = 8      # Bu kadar gözlemden önce kova kullanılmaz
+ANOMALY_MIN_STD  = 0.05   # log fiyat std tabanı (~%5); az gözlemde z patlamasın
+ANOMALY_K_LOW    = 4.0    # Alt sınır = exp(ort − K·std)
+ANOMALY_K_HIGH   = 8.0    # Üst sınır geniş: model aramanın en ucuzunu öğrenir, pahalı itinerary'ler normal
+CONST_MIN_ROUTES = 3      # Aynı fiyat bu run'da bu kadar farklı rotada görülürse sayfa sabiti adayıdır
+CONST_PAGE_SHARE = 0.5    # ...ve run'daki DOM/HTML sayfalarının en az bu kadarında çıkmalı (en az 2×MIN_ROUTES sayfa)
+CONST_DAYS       = 7      # Kara listedeki sabit bu kadar gün görülmezse düşer
+CONST_MAX_KEYS   = 32     # Kara liste üst sınırı (en yeni görülenler kalır)
+STRUCTURED_SOURCES = {"rpc", "form_rpc", "grid"}   # Yapılandırılmış veri; sınır / sabit filtresi uygulanmaz
+
+
+class AnomalyModel:
+    """
+    Rota × kalkışa kalan gün kovası başına fiyat dağılımı: log fiyatın EWMA
+    ortalaması ve varyansı. Her aramada tarih başına en ucuz fiyatla güncellenir,
+    check() tek fiyat için O(1) çalışır (her ayrıştırılan fiyatta çağrılabilir).
+
+      z         : (log fiyat − ortalama) / std
+      sınırlar  : [exp(ort − 4·std), exp(ort + 8·std)] — DOM/HTML kaynaklı fiyat
+                  dışındaysa ayrıştırma hatası sayılır (RPC/grid verisine güvenilir)
+      sabit     : aynı DOM/HTML fiyatı bu run'da 3+ rotada ve sayfaların en az
+                  yarısında çıktıysa (1000 / 8000 TL gibi filtre/sayfa öğeleri)
+                  elenir; farklı günlerde tesadüfen tekrar eden fiyatlar sayılmaz.
+                  Doğrulanan sabitler küçük bir kara listede (en çok 32, 7 gün) tutulur
+      alarm     : hedef eşiğini geçmese de z ≤ ANOMALY_Z_ALARM (aktarmalıda 1 daha düşük)
+
+    Kova ANOMALY_MIN_N gözleme ulaşmadan rota geneli ("*") kullanılır; o da
+    yoksa model karar vermez, statik TARGET_PRICES / BOUNDS geçerli kalır.
+    Durum data/anomaly_model.json'da.
+    """
+
+    BUCKETS = ((14, "d0"), (28, "d14"), (56, "d28"), (None, "d56"))
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.path = Path(data_dir) / "anomaly_model.json"
+        self._routes = None    # route → kova → [n, ort, var]
+        self._const = None     # Kara liste: fiyat → son görülme günü
+        self._run_pages = 0    # Bu run'daki DOM/HTML sayfası (arama) sayısı
+        self._run_seen = {}    # fiyat → [rota kümesi, sayfa sayısı] (yalnız bellekte)
+        self._dirty = False
+
+    def _load(self):
+        if self._routes is not None:
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            raw = {}
+        self._routes = raw.get("routes", {})
+        consts = raw.get("constants", {})
+        self._const = {k: d for k, d in consts.items() if isinstance(d, str)}   # Eski {rota: gün} biçimi atılır
+
+    @classmethod
+    def bucket(cls, dep, today=None):
+        """Kalkışa kalan güne göre kova adı."""
+        try:
+            days = (datetime.strptime(dep, "%Y-%m-%d").date() - (today or datetime.now().date())).days
+        except (TypeError, ValueError):
+            return "*"
+        for limit, name in cls.BUCKETS:
+            if limit is None or days < limit:
+                return name
+
+    def _stat(self, route, dep):
+        buckets = self._routes.get(route, {})
+        for key in (self.bucket(dep), "*"):
+            st = buckets.get(key)
+            if st and st[0] >= ANOMALY_MIN_N:
+                return st
+        return None
+
+    @staticmethod
+    def _pkey(price):
+        return f"{float(price):.0f}"
+
+    def bounds(self, route, dep=None):
+        """Öğrenilmiş (alt, üst) fiyat sınırı; model hazır değilse None."""
+        import math
+        self._load()
+        st = self._stat(route, dep)
+        if st is None:
+            return None
+        sd = max(math.sqrt(st[2]), ANOMALY_MIN_STD)
+        return math.exp(st[1] - ANOMALY_K_LOW * sd), math.exp(st[1] + ANOMALY_K_HIGH * sd)
+
+    def check(self, route, dep, price, source=None):
+        """(z veya None, bayrak veya None) — bayrak: "sabit" / "alt-sınır" / "üst-sınır"."""
+        import math
+        self._load()
+        trusted = source in STRUCTURED_SOURCES
+        if CONST_FILTER and not trusted and self._is_const(route, self._pkey(price)):
+            return None, "sabit"
+        st = self._stat(route, dep)
+        if st is None:
+            return None, None
+        sd = max(math.sqrt(st[2]), ANOMALY_MIN_STD)
+        z = (math.log(price) - st[1]) / sd
+        if not trusted:
+            if z < -ANOMALY_K_LOW:
+                return z, "alt-sınır"
+            if z > ANOMALY_K_HIGH:
+                return z, "üst-sınır"
+        return z, None
+
+    def start_run(self):
+        """Run içi sabit sayaçlarını sıfırlar (--watch her taramada çağırır)."""
+        self._run_pages, self._run_seen = 0, {}
+
+    def _is_const(self, route, pkey):
+        """Kara listede mi, ya da bu run'da sayfa sabiti gibi mi davranıyor?"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        if pkey not in self._const:
+            routes, pages = self._run_seen.get(pkey, (set(), 0))
+            if (self._run_pages < 2 * CONST_MIN_ROUTES or len(routes - {route}) < CONST_MIN_ROUTES - 1
+                    or pages < CONST_PAGE_SHARE * self._run_pages):
+                return False
+            print(f"  [DATA] Sayfa sabiti: {pkey} TL ({len(routes)} rota, {pages}/{self._run_pages} sayfa)")
+        if self._const.get(pkey) != today:
+            self._const[pkey] = today       # Görülmeye devam ediyor; kayıt tazelenir
+            self._dirty = True
+        return True
+
+    def is_anomaly(self, z, has_stopover):
+        """Hedef eşiğinden bağımsız istatistiksel alarm."""
+        if z is None:
+            return False
+        return z <= ANOMALY_Z_ALARM - (1.0 if has_stopover else 0.0)
+
+    def update(self, route, rows):
+        """Bir aramanın flights.json satırları: tarih başına en ucuzu modele girer."""
+        import math
+        self._load()
+        cheapest, page = {}, set()
+        for r in rows:
+            if r.get("price") is None:
+                continue
+            dep = r.get("depart_date")
+            if dep not in cheapest or r["price"] < cheapest[dep]:
+                cheapest[dep] = r["price"]
+            if r.get("data_source") not in STRUCTURED_SOURCES:
+                page.add(self._pkey(r["price"]))
+        if page:                            # Sayfa başına bir kez sayılır; run bitince unutulur
+            self._run_pages += 1
+            for pkey in page:
+                seen = self._run_seen.setdefault(pkey, [set(), 0])
+                seen[0].add(route)
+                seen[1] += 1
+        if not cheapest:
+            return
+        buckets = self._routes.setdefault(route, {})
+        for dep, price in cheapest.items():
+            x = math.log(price)
+            for key in {self.bucket(dep), "*"}:
+                st = buckets.setdefault(key, [0, 0.0, 0.0])
+                st[0] += 1
+                a = max(ANOMALY_ALPHA, 1.0 / st[0])    # İlk gözlemlerde düz ortalama
+                d = x - st[1]
+                st[1] += a * d
+                st[2] = (1 - a) * (st[2] + a * d * d)
+        self._dirty = True
+
+    def flush(self):
+        """anomaly_model.json'u atomik yazar; eski sabit kayıtları budar."""
+        if not self._dirty:
+            return
+        self._const = prune_constants(self._const)
+        out = {"updated": datetime.now().isoformat(), "alpha": ANOMALY_ALPHA,
+               "routes": {r: {k: [st[0], round(st[1], 6), round(st[2], 8)] for k, st in sorted(b.items())}
+                          for r, b in sorted(self._routes.items())},
+               "constants": self._const}
+        _atomic_write(self.path, json.dumps(out, ensure_ascii=False, separators=(",", ":")))
+        self._dirty = False
+        print(f"  [DATA] Anomali modeli: {len(self._routes)} rota → {self.path}")
+
+
+def prune_constants(consts):
+    """Kara listeden CONST_DAYS'ten eski kayıtları atar, en yeni CONST_MAX_KEYS kaydı tutar."""
+    cutoff = (datetime.now() - timedelta(days=CONST_DAYS)).strftime("%Y-%m-%d")
+    fresh = sorted(((d, k) for k, d in consts.items() if isinstance(d, str) and d >= cutoff), reverse=True)
+    return {k: d for d, k in sorted(fresh[:CONST_MAX_KEYS], key=lambda x: x[1])}
+
+
+ANOMALY = AnomalyModel()
 
 # ============================================================
 # TELEGRAM
 # ============================================================
-def send_telegram(msg):
-    import urllib.request
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    for cid in [ADMIN_ID, GROUP_ID]:
+OUTBOX_FILE     = Path("outbox.json")   # Gönderilemeyen mesajlar; sonraki run teslim eder
+OUTBOX_DRAIN_S  = 60                    # Run sonunda kuyruğun boşalması için beklenen süre
+OUTBOX_MAX_TRY  = 5                     # Run başına deneme; aşılırsa mesaj sonraki run'a kalır
+
+
+class TelegramOutbox:
+    """
+    Alarm mesajları için arka plan göndericisi. send() sadece kuyruğa ekler ve
+    outbox.json'a yazar; ağ işi ayrı thread'de yapılır, tarama döngüsü beklemez.
+
+      - chat başına hız sınırı: özel sohbet 1 sn, grup (eksi id) 3 sn arayla
+      - 429 → Telegram'ın parameters.retry_after süresi kadar o chat bekletilir
+      - ağ / 5xx hatası → üstel geri çekilme (2, 4, 8 ... sn, en çok 5 dk)
+      - 400/403 gibi kalıcı hatalar → mesaj düşürülür
+      - run sonunda gönderilemeyenler outbox.json'da kalır, sonraki run önce onları yollar
+      - OUTBOX_MAX_AGE_H saatten eski mesajlar (bayat fiyat) yüklemede ve yazmada düşürülür
+    """
+
+    def __init__(self, path=OUTBOX_FILE, api_base=None, token=None, chats=None):
+        import threading
+        self.path = Path(path)
+        self.api_base = (api_base or TELEGRAM_API_BASE).rstrip("/")
+        self.token = token or BOT_TOKEN
+        self.chats = chats if chats is not None else [ADMIN_ID, GROUP_ID]
+        self.items = []
+        self._cond = threading.Condition()
+        self._next_chat = {}      # chat_id → time.time() sonrası gönderilebilir
+        self._thread = None
+        self._closing = False
+        self._abort = False
+        self.sent = self.failed = self.retried = 0
+
+    @staticmethod
+    def _chat_interval(chat_id):
+        return 3.0 if str(chat_id).startswith("-") else 1.0
+
+    @staticmethod
+    def _drop_expired(items):
+        """OUTBOX_MAX_AGE_H'ten eski mesajları atar; (kalanlar, atılan sayısı)."""
+        if OUTBOX_MAX_AGE_H <= 0:
+            return items, 0
+        cutoff = (datetime.now() - timedelta(hours=OUTBOX_MAX_AGE_H)).isoformat()
+        fresh = [it for it in items if it.get("created", "") >= cutoff]
+        if len(fresh) < len(items):
+            print(f"  [TG] {len(items) - len(fresh)} mesaj {OUTBOX_MAX_AGE_H:g} saatten eski — düşürüldü")
+        return fresh, len(items) - len(fresh)
+
+    def _persist(self):
+        """Kilit altında çağrılır."""
+        self.items, expired = self._drop_expired(self.items)
+        self.failed += expired
+        if self.items:
+            _atomic_write(self.path, json.dumps({"pending": self.items}, ensure_ascii=False, indent=2))
+        else:
+            try: self.path.unlink()
+            except FileNotFoundError: pass
+
+    def start(self):
+        """Önceki run'dan kalan mesajları yükler ve göndericiyi başlatır."""
+        import threading
+        with self._cond:
+            if self._thread is not None:
+                return
+            # Dosya kuyruğun aynısıdır; close() sonrası yeniden başlatmada (--watch) kopyalanmaz
+            pending = self._read_pending(self.path)
+            self.items = pending
+            if pending:
+                print(f"  [TG] Önceki run'dan {len(pending)} bekleyen mesaj")
+            self._closing = self._abort = False
+            self.sent = self.failed = self.retried = 0
+            self._thread = threading.Thread(target=self._run, name="telegram-outbox", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _read_pending(path):
+        try:
+            pending = json.loads(Path(path).read_text(encoding="utf-8")).get("pending", [])
+        except (OSError, ValueError):
+            return []
+        for it in pending:
+            it["attempts"], it["next_try"] = 0, 0.0
+        return TelegramOutbox._drop_expired(pending)[0]
+
+    def absorb(self, path):
+        """Başka bir outbox dosyasında (parça run) kalan mesajları bu kuyruğa alır."""
+        pending = self._read_pending(path)
+        if pending:
+            self.start()
+            with self._cond:
+                self.items.extend(pending)
+                self._persist()
+                self._cond.notify()
+        return len(pending)
+
+    def send(self, msg):
+        """Mesajı tüm chat'ler için kuyruğa ekler; ağ beklenmez."""
+        self.start()
+        with self._cond:
+            for cid in self.chats:
+                self.items.append({"chat_id": cid, "text": msg, "created": datetime.now().isoformat(),
+                                   "attempts": 0, "next_try": 0.0})
+            self._persist()
+            self._cond.notify()
+
+    def _post(self, item):
+        """(sonuç, bekleme) — sonuç: "ok" / "retry" / "drop"."""
+        import urllib.request, urllib.error
+        url = f"{self.api_base}/bot{self.token}/sendMessage"
+        data = json.dumps({
+            "chat_id": item["chat_id"], "text": item["text"],
+            "parse_mode": "HTML",
+            "disable_web_page_preview": False,
+        }).encode()
+        req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
         try:
-            data = json.dumps({
-                "chat_id": cid, "text": msg,
-                "parse_mode": "HTML",
-                "disable_web_page_preview": False,
-            }).encode()
-            req = urllib.request.Request(
-                url, data=data, headers={"Content-Type": "application/json"}
-            )
             with urllib.request.urlopen(req, timeout=15) as r:
                 resp = json.loads(r.read())
-                print(f"  [TG {'✓' if resp.get('ok') else '✗'}] {cid}")
+            return ("ok" if resp.get("ok") else "drop"), 0
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                try: retry_after = json.loads(e.read()).get("parameters", {}).get("retry_after", 5)
+                except Exception: retry_after = 5
+                return "retry", float(retry_after)
+            if e.code >= 500:
+                return "retry", None
+            print(f"  [TG ERR] {item['chat_id']}: HTTP {e.code} — mesaj düşürüldü")
+            return "drop", 0
         except Exception as e:
-            print(f"  [TG ERR] {cid}: {e}")
+            print(f"  [TG ERR] {item['chat_id']}: {e}")
+            return "retry", None
+
+    def _next_ready(self, now):
+        """Kilit altında: gönderilebilir ilk mesaj ve yoksa en erken bekleme süresi."""
+        wait = None
+        for it in self.items:
+            if it["attempts"] >= OUTBOX_MAX_TRY:
+                continue
+            at = max(it["next_try"], self._next_chat.get(it["chat_id"], 0.0))
+            if at <= now:
+                return it, 0
+            wait = at - now if wait is None else min(wait, at - now)
+        return None, wait
+
+    def _run(self):
+        TRACER.lane(99, "telegram")
+        while True:
+            with self._cond:
+                while True:
+                    if self._abort:
+                        return
+                    item, wait = self._next_ready(time.time())
+                    if item is not None:
+                        break
+                    if self._closing and wait is None:
+                        return           # Gönderilecek bir şey kalmadı
+                    self._cond.wait(timeout=wait if wait is not None else 1.0)
+                self._next_chat[item["chat_id"]] = time.time() + self._chat_interval(item["chat_id"])
+
+            with TRACER.span("telegram.send", chat=str(item["chat_id"]), attempt=item["attempts"]) as sp:
+                result, delay = self._post(item)
+                sp["result"] = result
+
+            with self._cond:
+                if result == "ok":
+                    self.sent += 1
+                    print(f"  [TG ✓] {item['chat_id']}")
+                elif result == "drop":
+                    self.failed += 1
+                if result in ("ok", "drop"):
+                    if item in self.items: self.items.remove(item)
+                else:
+                    self.retried += 1
+                    item["attempts"] += 1
+                    if delay is not None:     # 429: chat bazlı bekleme
+                        self._next_chat[item["chat_id"]] = time.time() + delay
+                        print(f"  [TG 429] {item['chat_id']}: {delay:.0f}s bekleniyor")
+                    else:
+                        item["next_try"] = time.time() + min(300, 2 ** item["attempts"]) * random.uniform(0.8, 1.2)
+                self._persist()
+
+    def close(self, timeout=OUTBOX_DRAIN_S):
+        """Kuyruğun boşalmasını en çok `timeout` sn bekler; kalanlar outbox.json'da."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        with self._cond:
+            self._abort = True
+            self._cond.notify()
+            self._persist()
+            left = len(self.items)
+        self._thread.join(5)
+        self._thread = None
+        print(f"  [TG] {self.sent} gönderildi | {self.retried} yeniden deneme | {self.failed} düşürüldü"
+              + (f" | {left} sonraki run'a kaldı" if left else ""))
+
+
+OUTBOX = TelegramOutbox()
 
-def format_message(origin, dest, dep, ret, price, airline, target, has_stop):
+def send_telegram(msg):
+    """Alarm mesajını outbox'a ekler (bloklamaz)."""
+    OUTBOX.send(msg)
+
+def format_message(origin, dest, dep, ret, price, airline, target, has_stop, stats=None, z=None):
     pct  = round((1 - price / target) * 100)
     link = build_short_url(origin, dest, dep, ret)
     tip  = "🔄 Aktarmalı" if has_stop else "✈️ Direkt"
-    if has_stop:
+    if pct <= 0 and z is not None:
+        header = "📉 <b>ROTA GEÇMİŞİNE GÖRE DİP FİYAT</b>"
+        note   = f"📉 Hedefin üstünde ama geçmiş fiyatların çok altında (z={z:.1f}) — hedef güncel olmayabilir."
+    elif has_stop:
         header = "🚨 <b>AKTARMALI – EXTREME FARE ALARMI</b> ⚡"
         note   = f"⚡ Aktarmalı ama hedefin <b>%{pct} altında!</b> — İstisnai fiyat."
     else:
@@ -942,7 +2896,10 @@ def format_message(origin, dest, dep, ret, price, airline, target, has_stop):
         f"📅 <b>Dönüş:</b> {ret}\n"
         f"💰 <b>Fiyat:</b> {price:,.0f} TL\n"
         f"🎯 <b>Hedef:</b> {target:,.0f} TL\n"
+        + (f"📈 <b>30g medyan:</b> {stats['median']:,.0f} TL (min {stats['min']:,.0f}, n={stats['n']})\n"
+           if stats else "") +
         f"🏷️ <b>Havayolu:</b> {airline}\n"
+        + (f"📉 <b>Sapma:</b> z={z:.1f}\n" if z is not None and pct > 0 else "") +
         f"{note}\n"
         f"🌍 <b>Vize:</b> {get_visa_status(dest)}\n"
         f"━━━━━━━━━━━━━━━━━━━━━━━━\n"
@@ -950,100 +2907,715 @@ def format_message(origin, dest, dep, ret, price, airline, target, has_stop):
         f"⚡ HEMEN AL!"
     )
 
+# ============================================================
+# ALARM ÖZETİ
+# ============================================================
+DIGEST_MAX_ROUTES = 15     # Özet mesajda en fazla rota; kalanı "+N rota" olarak yazılır
+DIGEST_ALT_DATES  = 3      # Rota başına en iyi fiyatın altında listelenen diğer tarihler
+TELEGRAM_MAX_LEN  = 4000   # Telegram sınırı 4096; HTML etiket payı bırakılır
+DIGEST_FILE       = Path("digest.json")   # Gönderilmemiş özet adayları; run çökerse sonraki run / --compact gönderir
+DIGEST_MAX_AGE_H  = 12     # Bundan eski bekleyen aday bayat sayılır, gönderilmez
+
+
+class AlarmDigest:
+    """
+    Run boyunca alarm adaylarını toplar, run sonunda tek özet mesaj gönderir.
+
+      - aynı rota + tarih + aktarma tipi tekrarları (grid hücresi + doğrulama,
+        farklı havayolları) en ucuz fiyata indirgenir
+      - rotalar en iyi tasarruf oranına göre sıralanır; her rota tek satır,
+        altında en ucuz DIGEST_ALT_DATES diğer tarih
+      - hedefin IMMEDIATE_PCT altındaki fiyatlar (hata fiyatı) beklemeden
+        tekil mesajla gider, özete girmez
+      - tek aday kalırsa eski ayrıntılı mesaj biçimi kullanılır
+
+    Mesaj outbox'a bir kez eklenir; outbox her chat'e birer kopya gönderir.
+    Alarm geçmişine kayıt gönderim anında yapılır. Adaylar eklendikçe
+    digest.json'a yazılır: run özetten önce çökerse o çiftler resume / önbellek
+    yüzünden yeniden taranmaz, bekleyen adaylar sonraki run'ın start()'ında
+    yüklenip onun özetiyle (ya da --compact'ta hemen) gönderilir.
+    DIGEST_MAX_AGE_H saatten eski adaylar atılır.
+    """
+
+    def __init__(self, enabled=ALARM_DIGEST, immediate_pct=IMMEDIATE_PCT, path=DIGEST_FILE):
+        self.enabled = enabled
+        self.immediate_pct = immediate_pct
+        self.path = Path(path)
+        self.hits = {}        # (route, dep, ret, stop) → aday
+        self.immediate = 0
+
+    def add(self, origin, dest, dep, ret, price, airline, target, stop, stats=None, z=None):
+        """Adayı ekler; anında gönderilirse True döner."""
+        route = f"{origin}-{dest}"
+        pct = round((1 - price / target) * 100)
+        if not self.enabled or (self.immediate_pct and pct >= self.immediate_pct):
+            send_telegram(format_message(origin, dest, dep, ret, price, airline, target, stop, stats, z))
+            record_alarm(route, price)
+            self.immediate += 1
+            return True
+        key = (route, dep, ret, bool(stop))
+        old = self.hits.get(key)
+        if old is None or price < old["price"]:
+            self.hits[key] = {"route": route, "origin": origin, "dest": dest, "dep": dep, "ret": ret,
+                              "price": price, "airline": airline, "target": target, "stop": stop,
+                              "pct": pct, "stats": stats, "z": z, "found": datetime.now().isoformat()}
+            self._persist()
+        return False
+
+    def _persist(self):
+        if self.hits:
+            _atomic_write(self.path, json.dumps({"immediate": self.immediate, "hits": list(self.hits.values())},
+                                                ensure_ascii=False, indent=2))
+        else:
+            try: self.path.unlink()
+            except FileNotFoundError: pass
+
+    def start(self):
+        """Önceki run'dan kalan gönderilmemiş adayları yükler; bayatlar atılır."""
+        cutoff = (datetime.now() - timedelta(hours=DIGEST_MAX_AGE_H)).isoformat()
+        self.hits, self.immediate = {}, 0
+        n = self.load(self.path, since=cutoff)
+        self.immediate = 0      # Önceki run'da zaten gönderilmişlerdi
+        if n:
+            print(f"  [ÖZET] Önceki run'dan {n} gönderilmemiş fırsat")
+        self._persist()
+        return n
+
+    def ranked(self):
+        """[(rota, [adaylar fiyata göre])], en yüksek tasarruf oranlı rota önce."""
+        by_route = {}
+        for h in self.hits.values():
+            by_route.setdefault(h["route"], []).append(h)
+        groups = [(r, sorted(hs, key=lambda h: h["price"])) for r, hs in by_route.items()]
+        groups.sort(key=lambda g: (-g[1][0]["pct"], g[1][0]["price"]))
+        return groups
+
+    @staticmethod
+    def _line(i, hits):
+        best = hits[0]
+        tip = "🔄" if best["stop"] else "✈️"
+        link = build_short_url(best["origin"], best["dest"], best["dep"], best["ret"])
+        gain = f"-%{best['pct']}" if best["pct"] > 0 else f"z={best['z']:.1f}"
+        line = (f"{i}. {tip} <b>{best['origin']} ➔ {best['dest']}</b> {best['price']:,.0f} TL "
+                f"({gain}) · {best['dep'][5:]}→{best['ret'][5:]} · {best['airline']} "
+                f'<a href="{link}">Ara</a>')
+        alts = [f"{h['dep'][5:]}→{h['ret'][5:]} {h['price']:,.0f}" for h in hits[1:1 + DIGEST_ALT_DATES]]
+        extra = len(hits) - 1 - len(alts)
+        if alts:
+            line += "\n   ↳ " + " · ".join(alts) + (f" (+{extra})" if extra else "")
+        return line
+
+    def format(self, groups):
+        """Özet mesaj(lar)ı; TELEGRAM_MAX_LEN aşılırsa birden fazla parçaya bölünür."""
+        total = sum(len(hs) for _, hs in groups)
+        header = (f"🦅 <b>FİYAT ÖZETİ</b> — {len(groups)} rota, {total} fırsat\n"
+                  f"━━━━━━━━━━━━━━━━━━━━━━━━")
+        footer = "━━━━━━━━━━━━━━━━━━━━━━━━\n⚡ HEMEN AL!"
+        lines = [self._line(i, hs) for i, (_, hs) in enumerate(groups[:DIGEST_MAX_ROUTES], 1)]
+        if len(groups) > DIGEST_MAX_ROUTES:
+            lines.append(f"… +{len(groups) - DIGEST_MAX_ROUTES} rota daha (dashboard'da)")
+        messages, cur = [], [header]
+        for line in lines:
+            if sum(len(x) + 1 for x in cur) + len(line) + len(footer) > TELEGRAM_MAX_LEN:
+                messages.append("\n".join(cur))
+                cur = []
+            cur.append(line)
+        messages.append("\n".join(cur + [footer]))
+        return messages
+
+    def save(self):
+        """Adayları göndermeden dosyada bırakır (parça run); --merge load() ile tek özette toplar."""
+        _atomic_write(self.path, json.dumps({"immediate": self.immediate, "hits": list(self.hits.values())},
+                                            ensure_ascii=False, indent=2))
+        n = len(self.hits)
+        if n:
+            print(f"  [ÖZET] {n} fırsat birleştirme adımına bırakıldı → {self.path}")
+        self.hits = {}
+        self.immediate = 0
+        return n
+
+    def load(self, path, since=None):
+        """save() dosyasındaki adayları ekler; aynı anahtarda ucuz olan kalır. since: bundan eskiler atılır."""
+        try: raw = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError): return 0
+        hits = [h for h in raw.get("hits", []) if since is None or h.get("found", "") >= since]
+        for h in hits:
+            key = (h["route"], h["dep"], h["ret"], bool(h["stop"]))
+            old = self.hits.get(key)
+            if old is None or h["price"] < old["price"]:
+                self.hits[key] = h
+        self.immediate += raw.get("immediate", 0)
+        return len(hits)
+
+    def flush(self):
+        """Biriken adayları gönderir ve alarm geçmişine yazar. Gönderilen aday sayısını döner."""
+        if not self.hits:
+            return 0
+        groups = self.ranked()
+        if len(self.hits) == 1:
+            h = groups[0][1][0]
+            messages = [format_message(h["origin"], h["dest"], h["dep"], h["ret"], h["price"],
+                                       h["airline"], h["target"], h["stop"], h["stats"], h["z"])]
+        else:
+            messages = self.format(groups)
+        for msg in messages:
+            send_telegram(msg)
+        for h in self.hits.values():
+            record_alarm(h["route"], h["price"])
+        n = len(self.hits)
+        print(f"  [ÖZET] {n} fırsat, {len(groups)} rota → {len(messages)} mesaj"
+              + (f" | {self.immediate} anında gönderildi" if self.immediate else ""))
+        self.hits = {}
+        self.immediate = 0
+        self._persist()     # Mesajlar outbox'ta; bekleyen aday dosyası silinir
+        return n
+
+
+DIGEST = AlarmDigest()
+
+# ============================================================
+# ARAMA PLANLAYICI
+# ============================================================
+class SearchPlanner:
+    """
+    (rota, tarih) çiftlerini puanlayıp run bütçesini en verimli aramalara harcar.
+    Durum data/search_state.json'da, "IST-CDG|2026-05-08|2026-05-11" anahtarıyla:
+      last  → son tarama zamanı
+      fail  → başarısızlık oranı (üstel ortalama, 0-1)
+      mins  → son aramaların en ucuz fiyatları (en fazla 5)
+
+    Puan = (bayatlık + oynaklık + eşiğe yakınlık) × (1 - 0.7 × fail) × rota önceliği
+      bayatlık   : son taramadan beri geçen süre / MAX_DATA_AGE_HOURS (üst sınır 4; hiç taranmadıysa 4)
+      oynaklık   : çiftin son fiyatlarının değişim katsayısı, yoksa rota p90-p10 / medyan
+      yakınlık   : alarm eşiği / son en ucuz fiyat (eşiğe yaklaştıkça 1'e çıkar)
+      öncelik    : routes.json "priority" (varsayılan 1); bütçe sınırlıyken rotanın payını belirler
+    """
+
+    FAIL_ALPHA = 0.3
+    KEEP_MINS  = 5
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.path = Path(data_dir) / "search_state.json"
+        self._state = None
+
+    @staticmethod
+    def key(job):
+        origin, dest, dep, ret = job
+        return f"{origin}-{dest}|{dep}|{ret}"
+
+    def _load(self):
+        if self._state is None:
+            try: self._state = json.loads(self.path.read_text(encoding="utf-8")).get("pairs", {})
+            except (OSError, ValueError): self._state = {}
+        return self._state
+
+    def score(self, job, now=None):
+        now = now or datetime.now()
+        origin, dest, dep, ret = job
+        route = f"{origin}-{dest}"
+        st = self._load().get(self.key(job), {})
+
+        if st.get("last"):
+            age_h = (now - datetime.fromisoformat(st["last"])).total_seconds() / 3600
+            stale = min(4.0, age_h / MAX_DATA_AGE_HOURS)
+        else:
+            stale = 4.0
+
+        mins = st.get("mins", [])
+        if len(mins) >= 2:
+            mean = sum(mins) / len(mins)
+            vol = (sum((m - mean) ** 2 for m in mins) / len(mins)) ** 0.5 / mean
+        else:
+            rs = PRICE_STORE.stats(route)
+            vol = (rs["p90"] - rs["p10"]) / rs["median"] if rs and rs["median"] else 0.5
+        vol = min(1.0, vol * 4)
+
+        threshold = TARGET_PRICES[route] * DIRECT_THRESHOLD
+        close = min(1.0, threshold / mins[-1]) if mins else 0.5
+
+        fail = st.get("fail", 0.0)
+        rc = ROUTE_CONFIG.routes.get(route)
+        return (stale + vol + close) * (1 - 0.7 * fail) * (rc.priority if rc else 1.0)
+
+    def plan(self, jobs, budget=0):
+        """Puana göre sıralı işler; budget > 0 ise ilk `budget` tanesi."""
+        now = datetime.now()
+        scored = sorted(jobs, key=lambda j: self.score(j, now), reverse=True)
+        chosen = scored[:budget] if budget > 0 else scored
+        if budget > 0:
+            print(f"  [PLAN] {len(jobs)} çiftten {len(chosen)} seçildi (bütçe {budget})")
+        for job in chosen[:5]:
+            print(f"  [PLAN] {self.key(job):<32} puan {self.score(job, now):.2f}")
+        return chosen
+
+    def record(self, job, flights):
+        """flights None → arama yapılmadı (süre bitti), durum değişmez."""
+        if flights is None:
+            return
+        st = self._load().setdefault(self.key(job), {})
+        st["last"] = datetime.now().isoformat()
+        ok = bool(flights)
+        st["fail"] = round((1 - self.FAIL_ALPHA) * st.get("fail", 0.0) + self.FAIL_ALPHA * (0 if ok else 1), 4)
+        if ok:
+            mins = st.setdefault("mins", [])
+            mins.append(min(f["price"] for f in flights))
+            del mins[:-self.KEEP_MINS]
+
+    def flush(self):
+        if self._state is None:
+            return
+        today = datetime.now().strftime("%Y-%m-%d")
+        pairs = {k: v for k, v in sorted(self._state.items()) if k.split("|")[1] >= today}
+        _atomic_write(self.path, json.dumps({"updated": datetime.now().isoformat(), "pairs": pairs},
+                                            ensure_ascii=False, separators=(",", ":")))
+
+
+PLANNER = SearchPlanner()
+
+# ============================================================
+# ARAMA ÖNBELLEĞİ
+# ============================================================
+CACHE_KEEP_FLIGHTS = 10     # Başarılı kayıtta saklanan en ucuz satır sayısı
+CACHE_GRACE_H      = 48     # Süresi dolan kayıt bu kadar daha tutulur (başarısızlık serisi için)
+CACHE_NEG_TTL_H    = {      # Olumsuz sonuç: (ilk TTL, üst sınır) — seri uzadıkça ikiye katlanır
+    "empty":   (1.0, 12.0),    # Fiyat yok
+    "wrong":   (6.0, 24.0),    # Sorgu yanlış rotaya gidiyor (format bazında, deterministik)
+    "captcha": (0.33, 0.33),   # IP kaynaklı; kısa
+}
+_CACHE_FIELDS = ("price", "airline", "has_stopover", "stops", "duration_min",
+                 "depart_date", "return_date", "source")
+
+
+class ScrapeCache:
+    """
+    Kalıcı arama sonucu önbelleği — data/scrape_cache.json.
+    Anahtar "IST-CDG|2026-05-08|2026-05-11|<format>"; format: "iata" / "city" /
+    "form" / "fallback_url" (tek strateji denemesi) veya "*" (aramanın tamamı).
+
+      ok    → TTL = MAX_DATA_AGE_HOURS × (kalkışa kalan gün / 14), 1x–8x arası;
+              yakın tarih 3 sa, 8 hafta sonrası 12 sa, 16 hafta sonrası 24 sa
+      empty / wrong / captcha → kısa TTL, art arda gelirse ikiye katlanır
+
+    Run başında partition() taze "*" kayıtlarını ayırır: başarılı olanlar
+    saklanan satırlarla tarayıcısız işlenir, olumsuzlar o run atlanır.
+    scrape_with_playwright olumsuz önbellekteki sorgu formatlarını atlar;
+    deneme sırası STRATEGY_STATS'ındır.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, enabled=SCRAPE_CACHE_ENABLED):
+        self.path = Path(data_dir) / "scrape_cache.json"
+        self.enabled = enabled
+        self._entries = None
+        self._dirty = False
+        self.hits = self.skips = 0
+
+    @staticmethod
+    def key(job, fmt="*"):
+        return f"{SearchPlanner.key(job)}|{fmt}"
+
+    def _load(self):
+        if self._entries is None:
+            try: self._entries = json.loads(self.path.read_text(encoding="utf-8")).get("entries", {})
+            except (OSError, ValueError): self._entries = {}
+        return self._entries
+
+    @staticmethod
+    def ttl_h(job, status, streak=1):
+        if status == "ok":
+            try:
+                days = (datetime.strptime(job[2], "%Y-%m-%d") - datetime.now()).days
+            except ValueError:
+                days = 0
+            return MAX_DATA_AGE_HOURS * min(8.0, max(1.0, days / 14))
+        base, cap = CACHE_NEG_TTL_H.get(status, (1.0, 12.0))
+        return min(cap, base * 2 ** (streak - 1))
+
+    def get(self, job, fmt="*"):
+        """Taze kayıt veya None."""
+        if not self.enabled:
+            return None
+        e = self._load().get(self.key(job, fmt))
+        if e and datetime.now() < datetime.fromisoformat(e["until"]):
+            return e
+        return None
+
+    def put(self, job, fmt, status, flights=None):
+        if not self.enabled:
+            return
+        entries = self._load()
+        k = self.key(job, fmt)
+        old = entries.get(k, {})
+        streak = old.get("streak", 0) + 1 if status != "ok" and old.get("status") == status else 1
+        now = datetime.now()
+        e = {"status": status, "at": now.isoformat(), "streak": streak,
+             "until": (now + timedelta(hours=self.ttl_h(job, status, streak))).isoformat()}
+        if status == "ok" and flights:
+            e["flights"] = [
+                dict({f: r.get(f) for f in _CACHE_FIELDS if r.get(f) is not None},
+                     scraped_at=(r.get("scraped_at") or now).isoformat())
+                for r in sorted(flights, key=lambda r: r["price"])[:CACHE_KEEP_FLIGHTS]]
+        entries[k] = e
+        self._dirty = True
+
+    def order(self, job, formats):
+        """
+        [(format, sorgu)] → olumsuz önbellekteki formatlar atlanır; sıra
+        değişmez (STRATEGY_STATS.order'ın öğrendiği maliyet sırası korunur).
+        Hepsi olumsuzsa liste olduğu gibi döner.
+        """
+        if not self.enabled:
+            return formats
+        usable = []
+        for fmt, query in formats:
+            e = self.get(job, fmt)
+            if e and e["status"] != "ok":
+                print(f"    [CACHE] {fmt} formatı atlandı ({e['status']}, {e['until'][11:16]}'e kadar)")
+            else:
+                usable.append((fmt, query))
+        return usable or formats
+
+    def partition(self, jobs):
+        """
+        İşleri (taranacak, önbellekten [(job, flights)]) olarak ayırır; taze
+        olumsuz kayıtlı çiftler hiç taranmaz.
+        """
+        if not self.enabled:
+            return list(jobs), []
+        todo, cached = [], []
+        for job in jobs:
+            e = self.get(job)
+            if e is None:
+                todo.append(job)
+            elif e["status"] == "ok" and e.get("flights"):
+                flights = [dict(r, scraped_at=datetime.fromisoformat(r["scraped_at"]))
+                           for r in e["flights"]]
+                cached.append((job, flights))
+                self.hits += 1
+            elif e["status"] == "ok":
+                todo.append(job)
+            else:
+                self.skips += 1
+        if cached or self.skips:
+            print(f"  [CACHE] {len(cached)} çift önbellekten, {self.skips} çift olumsuz önbellek nedeniyle atlandı, "
+                  f"{len(todo)} taranacak")
+        return todo, cached
+
+    def flush(self):
+        """scrape_cache.json'u yazar; geçmiş tarihler ve süresi çoktan dolanlar atılır."""
+        if not self._dirty:
+            return
+        today = datetime.now().strftime("%Y-%m-%d")
+        cutoff = (datetime.now() - timedelta(hours=CACHE_GRACE_H)).isoformat()
+        entries = {k: v for k, v in sorted(self._entries.items())
+                   if k.split("|")[1] >= today and v["until"] > cutoff}
+        _atomic_write(self.path, json.dumps({"updated": datetime.now().isoformat(), "entries": entries},
+                                            ensure_ascii=False, separators=(",", ":")))
+        self._entries = entries
+        self._dirty = False
+
+
+SCRAPE_CACHE = ScrapeCache()
+
+# ============================================================
+# STRATEJİ İSTATİSTİKLERİ
+# ============================================================
+STRATEGY_ALPHA   = 0.2      # Süre EWMA ağırlığı
+STRATEGY_RETRY_H = 24       # Atlanan strateji bu kadar saatte bir yeniden denenir (keşif)
+STRATEGY_PRIOR_S = {        # Geçmiş yokken deneme süresi tahmini (sn)
+    "iata": 15.0, "city": 15.0, "form": 45.0, "fallback_url": 60.0,
+}
+
+
+class StrategyStats:
+    """
+    Rota başına sorgu stratejisi geçmişi — data/strategy_stats.json.
+    Her (rota, strateji) için: deneme / başarı sayısı, art arda başarısızlık,
+    başarılı denemenin ve tüm denemelerin süre EWMA'sı, son deneme zamanı.
+
+    order() stratejileri beklenen maliyete göre sıralar: deneme süresi /
+    başarı olasılığı (Laplace: (ok+1)/(n+2)). Art arda STRATEGY_MAX_FAILS kez
+    boş / yanlış dönen strateji atlanır; son denemesi STRATEGY_RETRY_H'den eskiyse
+    bir kez daha denenir. Hepsi atlanacaksa liste olduğu gibi döner.
+    CAPTCHA oturumun sorunudur, stratejiye yazılmaz.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, max_fails=STRATEGY_MAX_FAILS):
+        self.path = Path(data_dir) / "strategy_stats.json"
+        self.max_fails = max_fails
+        self._routes = None
+        self._dirty = False
+        self.skipped = self.tried = self.won = 0
+
+    def _load(self):
+        if self._routes is None:
+            try: self._routes = json.loads(self.path.read_text(encoding="utf-8")).get("routes", {})
+            except (OSError, ValueError): self._routes = {}
+        return self._routes
+
+    @staticmethod
+    def cost(name, s):
+        """Beklenen süre: deneme süresi / başarı olasılığı."""
+        secs = s["cost_s"] if s else STRATEGY_PRIOR_S.get(name, 30.0)
+        n, ok = (s["n"], s["ok"]) if s else (0, 0)
+        return secs / ((ok + 1) / (n + 2))
+
+    def order(self, route, strategies):
+        """[(ad, sorgu)] → beklenen maliyete göre sıralı, sürekli başarısız olanlar hariç."""
+        stats = self._load().get(route, {})
+        retry_before = (datetime.now() - timedelta(hours=STRATEGY_RETRY_H)).isoformat()
+        dead = {name for name, s in stats.items()
+                if self.max_fails and s["streak"] >= self.max_fails and s["at"] > retry_before}
+        usable = [(name, query) for name, query in strategies if name not in dead]
+        if not usable:
+            return strategies
+        for name, _ in strategies:
+            if name in dead:
+                print(f"    [STRATEJİ] {name} atlandı ({stats[name]['streak']} kez art arda sonuçsuz)")
+                self.skipped += 1
+        # sort kararlı: eşit maliyette varsayılan sıra korunur
+        return sorted(usable, key=lambda nq: self.cost(nq[0], stats.get(nq[0])))
+
+    def record(self, route, name, status, secs):
+        """Deneme sonucu: status "ok" / "empty" / "wrong"."""
+        s = self._load().setdefault(route, {}).setdefault(
+            name, {"n": 0, "ok": 0, "streak": 0, "ok_s": None,
+                   "cost_s": STRATEGY_PRIOR_S.get(name, 30.0)})
+        ok = status == "ok"
+        s["n"] += 1
+        s["ok"] += ok
+        s["streak"] = 0 if ok else s["streak"] + 1
+        s["cost_s"] = round(s["cost_s"] + STRATEGY_ALPHA * (secs - s["cost_s"]), 2)
+        if ok:
+            s["ok_s"] = round(secs if s["ok_s"] is None else s["ok_s"] + STRATEGY_ALPHA * (secs - s["ok_s"]), 2)
+        s["at"] = datetime.now().isoformat()
+        self.tried += 1
+        self.won += ok
+        self._dirty = True
+
+    def summary(self):
+        """Run sonu özeti: strateji başına tüm rotalardaki başarı oranı ve süre."""
+        totals = {}
+        for stats in self._load().values():
+            for name, s in stats.items():
+                t = totals.setdefault(name, [0, 0, 0])
+                t[0] += s["n"]; t[1] += s["ok"]; t[2] += s["streak"] >= self.max_fails > 0
+        parts = [f"{name} %{ok * 100 // n} ({n} deneme, {dead} rotada kapalı)"
+                 for name, (n, ok, dead) in totals.items() if n]
+        return (f"  [STRATEJİ] Bu run: {self.tried} deneme, {self.won} başarılı, {self.skipped} atlama"
+                + (f" | Toplam: {', '.join(parts)}" if parts else ""))
+
+    def flush(self):
+        if not self._dirty:
+            return
+        _atomic_write(self.path, json.dumps({"updated": datetime.now().isoformat(),
+                                             "routes": dict(sorted(self._routes.items()))},
+                                            ensure_ascii=False, separators=(",", ":")))
+        self._dirty = False
+
+
+STRATEGY_STATS = StrategyStats()
+
 # ============================================================
 # ANA MOTOR
 # ============================================================
-def run_scraper():
-    print(f"\n{'='*60}")
-    print(f"PROJECT TITAN v6.1 (Playwright Form) — {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Direkt eşik   : hedefin %{round(DIRECT_THRESHOLD*100)}'i altı")
-    print(f"Aktarmalı eşik: hedefin %{round(STOPOVER_THRESHOLD*100)}'i altı")
-    print(f"{'='*60}\n")
+def process_search(job, flights, all_flights, cached=False):
+    """
+    Tek aramanın sonuçlarını işler: flights.json satırlarını ekler,
+    eşik altı fiyatları alarm özetine ekler. Alarm sayısını döner.
+    cached=True → önbellekten gelen satırlar: yalnızca flights.json'a girer;
+    alarm, fiyat geçmişi ve anomali modeli bir önceki taramada işlenmişti.
+    """
+    origin, dest, dep, ret = job
+    route    = f"{origin}-{dest}"
+    target   = TARGET_PRICES[route]
+    dir_esik = target * DIRECT_THRESHOLD
+    glink    = build_short_url(origin, dest, dep, ret)
+    alarms_sent = 0
+
+    print(f"[ROTA] {route} ▶ {dep} → {ret} | Hedef: {target:,} TL" + (" | önbellekten" if cached else ""))
+    stats = PRICE_STORE.stats(route)   # Bu aramadan önceki geçmiş
+    if stats:
+        print(f"  [İST] medyan {stats['median']:,.0f} | p10 {stats['p10']:,.0f} | min {stats['min']:,.0f} TL (n={stats['n']})")
+
+    if not flights:
+        print(f"  [!] Veri alınamadı")
+        all_flights.append({
+            "route": route, "origin": origin, "dest": dest,
+            "depart_date": dep, "return_date": ret,
+            "price": None, "airline": "Veri yok", "target": target,
+            "alarm_threshold": round(dir_esik),
+            "savings_pct": None, "is_below_target": False,
+            "is_mistake_fare": False, "has_stopover": None,
+            "google_link": glink,
+            "scraped_at": datetime.now().isoformat(),
+            "data_source": "no_results",
+        })
+        return 0
+
+    first = len(all_flights)
+    for f in flights:
+        price      = f["price"]
+        airline    = f.get("airline", "Çeşitli")
+        scraped_at = f.get("scraped_at")
+        stop       = f.get("has_stopover", False)
+        f_dep      = f.get("depart_date", dep)     # Grid hücreleri kendi tarihini taşır
+        f_ret      = f.get("return_date", ret)
+        f_link     = glink if (f_dep, f_ret) == (dep, ret) else build_short_url(origin, dest, f_dep, f_ret)
+
+        if not sanity_check(price, route):
+            print(f"  [!] Sanity FAIL: {price:,.0f} TL")
+            continue
+        z, flag = ANOMALY.check(route, f_dep, price, f.get("source"))
+        if flag:
+            print(f"  [!] Anomali ({flag}): {price:,.0f} TL" + (f" z={z:.1f}" if z is not None else ""))
+            continue
 
-    all_flights  = []
-    search_dates = get_search_dates()
-    alarms_sent  = 0
-
-    for route in ROUTES:
-        origin, dest = route.split("-")
-        target   = TARGET_PRICES[route]
-        dir_esik = target * DIRECT_THRESHOLD
-        stp_esik = target * STOPOVER_THRESHOLD
-        print(f"\n[ROTA] {route} | Hedef: {target:,} TL | Direkt<{dir_esik:,.0f} | Aktarmalı<{stp_esik:,.0f}")
-
-        for dep, ret in random.sample(search_dates, min(2, len(search_dates))):
-            print(f"  ▶ {dep} → {ret}")
-            glink = build_short_url(origin, dest, dep, ret)
-
-            flights = scrape_with_playwright(origin, dest, dep, ret)
-
-            if not flights:
-                print(f"  [!] Veri alınamadı")
-                all_flights.append({
-                    "route": route, "origin": origin, "dest": dest,
-                    "depart_date": dep, "return_date": ret,
-                    "price": None, "airline": "Veri yok", "target": target,
-                    "alarm_threshold": round(dir_esik),
-                    "savings_pct": None, "is_below_target": False,
-                    "is_mistake_fare": False, "has_stopover": None,
-                    "google_link": glink,
-                    "scraped_at": datetime.now().isoformat(),
-                    "data_source": "no_results",
-                })
-                time.sleep(random.uniform(5, 10))
+        alarm_ok, alarm_type = should_alarm(price, target, stop)
+        if not alarm_ok and ANOMALY.is_anomaly(z, stop):
+            alarm_ok, alarm_type = True, f"z={z:.1f}"
+        pct       = round((1 - price / target) * 100)
+        stop_lbl  = "🔄aktarmalı" if stop else "❔aktarma?" if stop is None else "✈️direkt"
+        alarm_lbl = f"🚨{alarm_type}" if alarm_ok else ""
+        date_lbl  = f" | {f_dep}→{f_ret}" if (f_dep, f_ret) != (dep, ret) else ""
+        z_lbl     = f" | z={z:+.1f}" if z is not None else ""
+        print(f"  [✓] {price:,.0f} TL | {stop_lbl} | -%{pct}{z_lbl}{date_lbl} {alarm_lbl}")
+
+        all_flights.append({
+            "route": route, "origin": origin, "dest": dest,
+            "depart_date": f_dep, "return_date": f_ret,
+            "price": price, "airline": airline, "target": target,
+            "alarm_threshold": round(dir_esik),
+            "savings_pct": pct,
+            "is_below_target": alarm_ok,
+            "is_mistake_fare": stop,
+            "has_stopover": stop,
+            "google_link": f_link,
+            "scraped_at": scraped_at.isoformat() if scraped_at else datetime.now().isoformat(),
+            "data_source": f.get("source", "playwright"),
+            "stops": f.get("stops"),
+            "duration_min": f.get("duration_min"),
+            "z_score": round(z, 2) if z is not None else None,
+        })
+
+        if alarm_ok and not cached:
+            if not is_fresh(scraped_at):
+                print(f"  [⏸] Veri eski")
+                continue
+            if f.get("source") == "grid":
+                print(f"  [⏸] Tablo hücresi, aktarma bilgisi doğrulanmadı")
                 continue
+            ok, reason = can_send_alarm(route, price, target)
+            if ok:
+                if DIGEST.add(origin, dest, f_dep, f_ret, price, airline, target, stop, stats, z):
+                    print(f"  [🔔] ALARM! Telegram...")
+                else:
+                    print(f"  [🔔] ALARM → run sonu özetine eklendi")
+                alarms_sent += 1
+            else:
+                print(f"  [⏸] {reason}")
+    if not cached:
+        PRICE_STORE.add(route, all_flights[first:])
+        ANOMALY.update(route, all_flights[first:])
+    return alarms_sent
+
+
+def _date_first(per_route):
+    """{rota: [(gidiş, dönüş)]} → işler, tarih-öncelikli sırayla."""
+    jobs = []
+    for i in range(max(map(len, per_route.values()), default=0)):
+        for route, dates in per_route.items():
+            if i < len(dates):
+                origin, dest = route.split("-")
+                jobs.append((origin, dest, *dates[i]))
+    return jobs
+
+
+def build_jobs(routes, search_dates=None):
+    """
+    Tüm rota × tarih çiftleri. Tarih-öncelikli sıralanır ki aynı anda
+    çalışan worker'lar farklı rotaları arasın. search_dates verilmezse her
+    rota kendi tarih stratejisini (routes.json "dates") kullanır.
+    """
+    return _date_first({r: search_dates if search_dates is not None else get_search_dates(r)
+                        for r in routes})
 
-            for f in flights:
-                price      = f["price"]
-                airline    = f.get("airline", "Çeşitli")
-                scraped_at = f.get("scraped_at")
-                stop       = f.get("has_stopover", False)
 
-                if not sanity_check(price, route):
-                    print(f"  [!] Sanity FAIL: {price:,.0f} TL")
-                    continue
+def build_grid_jobs(routes, search_dates=None, anchors=GRID_ANCHORS):
+    """
+    Grid modu: rota başına `anchors` adet tablo araması. Çapa tarihleri
+    rotanın tarih listesinden eşit aralıkla seçilir; her tablo çapanın
+    çevresindeki gidiş/dönüş kombinasyonlarını getirir.
+    """
+    picks = {}
+    for route in routes:
+        dates = search_dates if search_dates is not None else get_search_dates(route)
+        if not dates:
+            continue
+        n = max(1, min(anchors, len(dates)))
+        step = len(dates) / n
+        picks[route] = [dates[int(i * step)] for i in range(n)]
+    return _date_first(picks)
 
-                alarm_ok, alarm_type = should_alarm(price, target, stop)
-                pct       = round((1 - price / target) * 100)
-                stop_lbl  = "🔄aktarmalı" if stop else "✈️direkt"
-                alarm_lbl = f"🚨{alarm_type}" if alarm_ok else ""
-                print(f"  [✓] {price:,.0f} TL | {stop_lbl} | -%{pct} {alarm_lbl}")
-
-                all_flights.append({
-                    "route": route, "origin": origin, "dest": dest,
-                    "depart_date": dep, "return_date": ret,
-                    "price": price, "airline": airline, "target": target,
-                    "alarm_threshold": round(dir_esik),
-                    "savings_pct": pct,
-                    "is_below_target": alarm_ok,
-                    "is_mistake_fare": stop,
-                    "has_stopover": stop,
-                    "google_link": glink,
-                    "scraped_at": scraped_at.isoformat() if scraped_at else datetime.now().isoformat(),
-                    "data_source": f.get("source", "playwright"),
-                })
-
-                if alarm_ok:
-                    if not is_fresh(scraped_at):
-                        print(f"  [⏸] Veri eski")
-                        continue
-                    ok, reason = can_send_alarm(route, price, target)
-                    if ok:
-                        print(f"  [🔔] ALARM! Telegram...")
-                        send_telegram(format_message(origin, dest, dep, ret, price, airline, target, stop))
-                        record_alarm(route, price)
-                        alarms_sent += 1
-                    else:
-                        print(f"  [⏸] {reason}")
 
-            sleep_s = random.uniform(10, 18)
-            print(f"  [⏳] {sleep_s:.1f}s bekleniyor...")
-            time.sleep(sleep_s)
+FLIGHTS_FILE = Path("flights.json")
+SHARD_DIR    = DATA_DIR / "flights"   # Dashboard: index.json + rota başına parça
+JOURNAL_FILE = Path("flights.partial.ndjson")   # Run sırasında arama başına bir satır
+STATE_FLUSH_EVERY = 20   # Bu kadar aramada bir fiyat istatistiği / planlayıcı durumu diske yazılır
 
-    # flights.json yaz
+
+class RunJournal:
+    """
+    Arama sonuçlarını bitişte değil, her arama tamamlandığında diske yazar.
+    Her satır: {"key", "job", "at", "rows", "alarms"} — yazımdan sonra fsync.
+    Run yarıda kalırsa (timeout, crash) satırlar kalır:
+      - sonraki run MAX_DATA_AGE_HOURS içindeki çiftleri tekrar taramaz (resume)
+      - compact() dosyayı flights.json şemasına çevirir; run tamamlanınca journal
+        silinir, --compact ise journal'ı bir sonraki run'ın resume'u için bırakır
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = Path(path)
+
+    def entries(self):
+        """Tazelik sınırı içindeki kayıtlar; aynı çift için en son yazılan geçerli."""
+        if not self.path.exists():
+            return {}
+        cutoff = (datetime.now() - timedelta(hours=MAX_DATA_AGE_HOURS)).isoformat()
+        latest = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try: e = json.loads(line)
+                except ValueError: continue   # Yarım yazılmış son satır
+                if e.get("at", "") >= cutoff:
+                    latest[e["key"]] = e
+        return latest
+
+    def append(self, job, rows, alarms):
+        entry = {"key": SearchPlanner.key(job), "job": list(job),
+                 "at": datetime.now().isoformat(), "rows": rows, "alarms": alarms}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self, out=FLIGHTS_FILE, keep=False, dashboard=True):
+        """Journal → flights.json (atomik). Yazılan çıktıyı, journal yoksa None döner."""
+        if not self.path.exists():
+            return None
+        entries = self.entries()
+        rows = [r for e in entries.values() for r in e["rows"]]
+        alarms = sum(e.get("alarms", 0) for e in entries.values())
+        output = write_flights(rows, alarms, out, dashboard)
+        if not keep:
+            self.path.unlink()
+        print(f"  [JOURNAL] {len(entries)} arama, {len(rows)} satır → {out}")
+        return output
+
+
+def write_flights(all_flights, alarms_sent, out=FLIGHTS_FILE, dashboard=True):
+    """flights.json şeması; atomik yazılır. dashboard=False → data/flights/ parçaları yazılmaz (parça run)."""
     valid   = [f for f in all_flights if f.get("price") is not None]
     no_data = [f for f in all_flights if f.get("price") is None]
-
     output = {
         "last_updated": datetime.now().isoformat(),
         "total_found": len(valid),
@@ -1054,14 +3626,416 @@ def run_scraper():
         "data_source": "playwright_chromium",
         "flights": sorted(valid, key=lambda x: x["price"]) + no_data,
     }
-    Path("flights.json").write_text(
-        json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    with TRACER.span("flights.write", rows=len(all_flights)):
+        _atomic_write(out, json.dumps(output, ensure_ascii=False, indent=2))
+        if dashboard:
+            write_flight_shards(output)
+    return output
+
+
+def write_flight_shards(output, shard_dir=SHARD_DIR):
+    """
+    Dashboard için flights.json'un parçalı kopyası:
+      index.json     → toplamlar + rota başına en iyi fiyat, sayaçlar, içerik hash'i
+      <ROTA>.json    → o rotanın satırları (sıkıştırılmış JSON)
+
+    Parça içeriği değişmediyse dosyaya dokunulmaz; dashboard index'teki hash
+    değişmeyen parçayı tekrar indirmez. Artık bulunmayan rotaların parçaları silinir.
+    """
+    import hashlib
+    shard_dir = Path(shard_dir)
+    by_route = {}
+    for f in output["flights"]:
+        by_route.setdefault(f["route"], []).append(f)
+
+    routes = {}
+    for route, rows in sorted(by_route.items()):
+        body = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+        digest = hashlib.sha1(body.encode("utf-8")).hexdigest()[:12]
+        path = shard_dir / f"{route}.json"
+        if not path.exists() or path.read_text(encoding="utf-8") != body:
+            _atomic_write(path, body)
+        priced = [f for f in rows if f.get("price") is not None]
+        best = min(priced, key=lambda f: f["price"]) if priced else None
+        routes[route] = {
+            "file": path.name,
+            "hash": digest,
+            "count": len(priced),
+            "no_data": len(rows) - len(priced),
+            "below_target": sum(1 for f in priced if f.get("is_below_target")),
+            "mistake": sum(1 for f in priced if f.get("is_mistake_fare")),
+            "best_price": best["price"] if best else None,
+            "best_savings_pct": best.get("savings_pct") if best else None,
+            "best_dates": [best.get("depart_date"), best.get("return_date")] if best else None,
+            "last_scraped": max((f.get("scraped_at") or "" for f in rows), default="") or None,
+        }
+
+    if shard_dir.exists():
+        for old in shard_dir.glob("*.json"):
+            if old.name != "index.json" and old.stem not in routes:
+                old.unlink()
+
+    index = {k: v for k, v in output.items() if k != "flights"}
+    index["routes"] = routes
+    _atomic_write(shard_dir / "index.json", json.dumps(index, ensure_ascii=False, separators=(",", ":")))
+    return index
+
+
+async def _run_searches(jobs, all_flights, journal=None, cached=(), session=None):
+    alarms_sent = 0
+    # Önbellekten gelen çiftler tarayıcı açılmadan işlenir
+    for job, flights in cached:
+        first = len(all_flights)
+        process_search(job, flights, all_flights, cached=True)
+        if journal is not None:
+            journal.append(job, all_flights[first:], 0)
+
+    deadline = time.monotonic() + RUN_BUDGET_S
+    done = 0
+    async for job, flights in scrape_many(jobs, concurrency=CONCURRENCY, deadline=deadline, session=session):
+        done += 1
+        print(f"\n[{done}/{len(jobs)}]", end=" ")
+        first = len(all_flights)
+        with TRACER.span("process", route=f"{job[0]}-{job[1]}", dep=job[2], ret=job[3]):
+            sent = process_search(job, flights, all_flights)
+        alarms_sent += sent
+        PLANNER.record(job, flights)
+        if journal is not None and flights is not None:
+            with TRACER.span("journal.append"):
+                journal.append(job, all_flights[first:], sent)
+        if done % STATE_FLUSH_EVERY == 0:
+            with TRACER.span("state.flush"):
+                PRICE_STORE.flush()
+                PLANNER.flush()
+                ANOMALY.flush()
+                SCRAPE_CACHE.flush()
+                STRATEGY_STATS.flush()
+            TRACER.flush()     # Run yarıda kesilse de trace elde kalır
+    return alarms_sent
+
+
+def compact_results():
+    """--compact: yarım kalan run'ın journal'ını flights.json'a çevirir (tarama yok)."""
+    if not RunJournal().compact(keep=True):
+        print("  [JOURNAL] Birleştirilecek kısmi sonuç yok")
+    if DIGEST.start():
+        DIGEST.flush()
+        OUTBOX.close()
+    HISTORY.flush()
+
+
+# ============================================================
+# PARÇALI RUN (--shard i/N, --merge)
+# ============================================================
+# Parça run'ın kendi kopyasını tuttuğu durum dosyaları → rota anahtarlı alan.
+# Anahtarlar "IST-CDG" veya "IST-CDG|..." biçiminde; birleştirmede parçanın
+# rotalarına ait anahtarlar parçadan, diğerleri ana data/'dan alınır.
+SHARD_STATE_FILES = {
+    "price_window.json":   "routes",
+    "price_stats.json":    "routes",
+    "anomaly_model.json":  "routes",
+    "search_state.json":   "pairs",
+    "scrape_cache.json":   "entries",
+    "strategy_stats.json": "routes",
+}
+
+
+def parse_shard(spec):
+    """"2/4" → (2, 4); 1 ≤ i ≤ N."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard i/N biçiminde olmalı: {spec!r}")
+    if not 1 <= i <= n:
+        raise ValueError(f"--shard {spec}: 1 ≤ i ≤ N olmalı")
+    return i, n
+
+
+def shard_routes(routes, i, n):
+    """
+    Rotaların i. parçası (1 tabanlı). Rotalar sırayla dağıtılır: parçalar en çok
+    bir rota farklıdır ve aynı rota listesiyle her süreç aynı bölmeyi bulur.
+    Rotanın tüm tarihleri aynı parçada kalır (planlayıcı, önbellek, modeller rota bazlı).
+    """
+    return routes[i - 1::n]
+
+
+def shard_run_dir(i, n, root=SHARD_ROOT):
+    return Path(root) / f"{i}of{n}"
+
+
+def configure_shard(i, n):
+    """
+    Bu süreci i/N parçası olarak ayarlar; paralel süreçler aynı dosyaya yazmaz.
+    shards/<i>of<N>/ altında:
+      shard.json      → parça no, rotalar
+      flights.json    → parçanın satırları (journal: flights.partial.ndjson)
+      history.log     → bu run'ın alarmları (ana history.json sadece okunur)
+      digest.json     → gönderilmemiş özet adayları (tek özet --merge'de gider)
+      outbox.json     → teslim edilemeyen anında alarmlar
+      data/           → durum dosyalarının kopyası + fiyat CSV'leri
+    Durum dosyaları ana data/'dan kopyalanır ki planlayıcı / önbellek / modeller
+    geçmişle başlasın; yarım kalmış parça kendi kopyasıyla devam eder.
+    """
+    global ROUTES, HISTORY, PRICE_STORE, ANOMALY, PLANNER, SCRAPE_CACHE, STRATEGY_STATS, OUTBOX, DIGEST
+    out = shard_run_dir(i, n)
+    data = out / "data"
+    data.mkdir(parents=True, exist_ok=True)
+    for name in SHARD_STATE_FILES:
+        src = DATA_DIR / name
+        if src.exists() and not (data / name).exists():
+            shutil.copy2(src, data / name)
+
+    ROUTES = shard_routes(list(ROUTE_CONFIG.routes), i, n)
+    HISTORY = AlarmHistory(HFILE, out / HLOG.name)
+    PRICE_STORE = PriceStore(data)
+    ANOMALY = AnomalyModel(data)
+    PLANNER = SearchPlanner(data)
+    SCRAPE_CACHE = ScrapeCache(data)
+    STRATEGY_STATS = StrategyStats(data)
+    OUTBOX = TelegramOutbox(out / OUTBOX_FILE.name)
+    DIGEST = AlarmDigest(path=out / DIGEST_FILE.name)
+    TRACER.out_dir = TRACE_DIR / out.name
+    _atomic_write(out / "shard.json", json.dumps({"shard": i, "of": n, "routes": ROUTES,
+                                                  "started": datetime.now().isoformat()}, indent=2))
+    return out
+
+
+def _merge_shard_state(src_dir, routes, dst_dir=DATA_DIR):
+    """Parçanın durum dosyalarındaki kendi rotalarına ait kayıtları ana data/'ya yazar."""
+    own = lambda key: key.split("|")[0] in routes
+    for name, field in SHARD_STATE_FILES.items():
+        src = Path(src_dir) / name
+        if not src.exists():
+            continue
+        part = json.loads(src.read_text(encoding="utf-8"))
+        try: base = json.loads((dst_dir / name).read_text(encoding="utf-8"))
+        except (OSError, ValueError): base = {}
+        merged = {k: v for k, v in base.get(field, {}).items() if not own(k)}
+        merged.update({k: v for k, v in part.get(field, {}).items() if own(k)})
+        out = dict(part, updated=datetime.now().isoformat(), **{field: dict(sorted(merged.items()))})
+        if "constants" in part:     # anomali modeli: kara liste birleşimi, en yeni gün kalır
+            consts = {k: d for k, d in base.get("constants", {}).items() if isinstance(d, str)}
+            for price, day in part["constants"].items():
+                if isinstance(day, str) and day > consts.get(price, ""):
+                    consts[price] = day
+            out["constants"] = prune_constants(consts)
+        _atomic_write(dst_dir / name, json.dumps(out, ensure_ascii=False, separators=(",", ":")))
+
+
+def _merge_price_csv(src_dir, dst_dir=DATA_DIR / "prices"):
+    """Parçanın gün CSV'lerini ana dosyaların sonuna ekler; eklenen parça dosyası silinir."""
+    for src in sorted(Path(src_dir).glob("*.csv")):
+        lines = src.read_text(encoding="utf-8").splitlines(keepends=True)
+        dst = Path(dst_dir) / src.name
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        new = not dst.exists() or dst.stat().st_size == 0
+        with open(dst, "a", encoding="utf-8", newline="") as f:
+            f.writelines(lines if new else lines[1:])
+        src.unlink()
+
+
+def merge_shards(root=SHARD_ROOT):
+    """
+    --merge: shards/*/ altındaki parça sonuçlarını birleştirir (tarama yok).
+      - satırlar → flights.json + dashboard; parçası gelmeyen rotalar önceki
+        flights.json satırlarını korur
+      - history.log'lar → history.json (aynı alarm bir kez)
+      - özet adayları → tek özet mesaj; kalan outbox mesajları gönderilir
+      - durum dosyaları ve fiyat CSV'leri → data/
+    Başarıyla birleşen parça klasörleri silinir. Yazılan çıktıyı, parça yoksa None döner.
+    """
+    manifests = sorted(Path(root).glob("*/shard.json"))
+    if not manifests:
+        print(f"  [SHARD] {root}/ altında birleştirilecek parça yok")
+        return None
+
+    OUTBOX.start()
+    DIGEST.start()
+    rows, alarms_sent, owned = {}, 0, set()
+    for path in manifests:
+        sd = path.parent
+        meta = json.loads(path.read_text(encoding="utf-8"))
+        routes = set(meta["routes"])
+        # Parça yarıda kaldıysa journal'ı önce parçanın flights.json'una çevrilir
+        part = RunJournal(sd / JOURNAL_FILE.name).compact(sd / FLIGHTS_FILE.name, dashboard=False)
+        if part is None:
+            try: part = json.loads((sd / FLIGHTS_FILE.name).read_text(encoding="utf-8"))
+            except (OSError, ValueError): part = {"flights": [], "alarms_sent_this_run": 0}
+        for f in part["flights"]:
+            key = (f.get("route"), f.get("depart_date"), f.get("return_date"),
+                   f.get("price"), f.get("airline"), f.get("has_stopover"))
+            rows.setdefault(key, f)
+        alarms_sent += part.get("alarms_sent_this_run", 0)
+        _merge_shard_state(sd / "data", routes)
+        _merge_price_csv(sd / "data" / "prices")
+        absorbed = HISTORY.absorb(sd / HLOG.name)
+        hits = DIGEST.load(sd / DIGEST_FILE.name)
+        pending = OUTBOX.absorb(sd / OUTBOX_FILE.name)
+        owned |= routes
+        print(f"  [SHARD] {sd.name}: {len(routes)} rota, {len(part['flights'])} satır, "
+              f"{absorbed} alarm kaydı, {hits} özet adayı, {pending} bekleyen mesaj")
+
+    try: previous = json.loads(FLIGHTS_FILE.read_text(encoding="utf-8")).get("flights", [])
+    except (OSError, ValueError): previous = []
+    kept = [f for f in previous if f.get("route") not in owned]
+    if kept:
+        print(f"  [SHARD] Parçası olmayan {len({f['route'] for f in kept})} rota önceki satırlarını koruyor")
+
+    DIGEST.flush()
+    output = write_flights(list(rows.values()) + kept, alarms_sent)
+    HISTORY.flush()
+    OUTBOX.close()
+    for path in manifests:
+        shutil.rmtree(path.parent)
+    print(f"[✓] {len(manifests)} parça birleşti | {output['total_found']} uçuş | "
+          f"{output['below_target']} alarm altı | {alarms_sent} alarm")
+    return output
+
+
+def run_scraper(shard=None):
+    out_dir = configure_shard(*shard) if shard else None
+    asyncio.run(_scan(shard, out_dir))
+
+
+def watch_scraper(shard=None, interval_s=WATCH_INTERVAL_S):
+    """
+    --watch: süreç ve Chromium açık kalır, her `interval_s` saniyede bir tarama
+    yapılır. Her taramadan önce routes.json'un değişip değişmediğine bakılır;
+    geçerli değişiklik tarayıcı yeniden başlatılmadan bir sonraki taramada
+    etkin olur. Ctrl+C ile çıkılır.
+    """
+    out_dir = configure_shard(*shard) if shard else None
+
+    async def loop():
+        async with BrowserSession() as session:
+            while True:
+                reload_routes_config(shard)
+                await _scan(shard, out_dir, session)
+                print(f"  [WATCH] Sonraki tarama {interval_s // 60} dk sonra "
+                      f"({(datetime.now() + timedelta(seconds=interval_s)):%H:%M})")
+                await asyncio.sleep(interval_s)
+
+    try:
+        asyncio.run(loop())
+    except KeyboardInterrupt:
+        print("  [WATCH] Durduruldu")
+
+
+def reset_run_stats():
+    """Run başına sayaçları sıfırlar; --watch aynı süreçte her taramada çağırır."""
+    global NET_STATS, BREAKER
+    READY_STATS.clear()
+    NET_STATS = NetStats()
+    BREAKER = CaptchaBreaker()          # Devre durumu ve yeniden kuyruk sayaçları da run'a ait
+    SCRAPE_CACHE.hits = SCRAPE_CACHE.skips = 0
+    STRATEGY_STATS.skipped = STRATEGY_STATS.tried = STRATEGY_STATS.won = 0
+    ANOMALY.start_run()
+
+
+async def _scan(shard=None, out_dir=None, session=None):
+    """Tek tarama: iş listesi → arama → flights.json / durum dosyaları / özet."""
+    print(f"\n{'='*60}")
+    print(f"PROJECT TITAN v6.1 (Playwright Form) — {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Direkt eşik   : hedefin %{round(DIRECT_THRESHOLD*100)}'i altı")
+    print(f"Aktarmalı eşik: hedefin %{round(STOPOVER_THRESHOLD*100)}'i altı")
+    print(f"Rotalar       : {len(ROUTES)} ({ROUTE_CONFIG.path.name if ROUTE_CONFIG.path else '-'})")
+    print(f"Paralellik    : {CONCURRENCY} worker")
+    print(f"Arama bütçesi : {SEARCH_BUDGET or 'tüm çiftler'}")
+    print(f"Tarama modu   : {SCAN_MODE}" + (f" ({GRID_ANCHORS} tablo/rota)" if SCAN_MODE == "grid" else ""))
+    if shard:
+        print(f"Parça         : {shard[0]}/{shard[1]} — {len(ROUTES)} rota → {out_dir}/")
+    print(f"{'='*60}\n")
+
+    reset_run_stats()
+    all_flights = []
+    if SCAN_MODE == "grid":
+        jobs = build_grid_jobs(ROUTES)
+    else:
+        jobs = build_jobs(ROUTES)
+
+    # Yarım kalan run'dan taze çiftler tekrar taranmaz
+    journal = RunJournal(out_dir / JOURNAL_FILE.name if out_dir else JOURNAL_FILE)
+    flights_out = out_dir / FLIGHTS_FILE.name if out_dir else FLIGHTS_FILE
+    resumed = journal.entries()
+    if resumed:
+        jobs = [j for j in jobs if SearchPlanner.key(j) not in resumed]
+        print(f"  [RESUME] {len(resumed)} çift son {MAX_DATA_AGE_HOURS} saatte taranmış, atlanıyor")
+    jobs, cached = SCRAPE_CACHE.partition(jobs)
+    jobs = PLANNER.plan(jobs, SEARCH_BUDGET)
+
+    if TRACE_ENABLED:
+        TRACER.start()
+    OUTBOX.start()    # Önceki run'dan kalan mesajlar tarama sırasında gönderilir
+    DIGEST.start()    # Çöken run'ın gönderilmemiş adayları bu run'ın özetine girer
+    alarms_sent = await _run_searches(jobs, all_flights, journal, cached, session)
+    if out_dir:
+        DIGEST.save()   # Parçaların adayları --merge'de tek özet olur
+    else:
+        DIGEST.flush()
+
+    # journal → flights.json (önceki yarım run'ın taze satırları dahil)
+    dashboard = out_dir is None
+    output = (journal.compact(flights_out, dashboard=dashboard)
+              or write_flights(all_flights, alarms_sent, flights_out, dashboard))
+    alarms_sent = output["alarms_sent_this_run"]
+    if not out_dir:
+        HISTORY.flush()     # Parçada history.json'a --merge yazar
+    with TRACER.span("state.flush"):
+        PRICE_STORE.flush()
+        PLANNER.flush()
+        ANOMALY.flush()
+        SCRAPE_CACHE.flush()
+        STRATEGY_STATS.flush()
+    OUTBOX.close()
+    trace_path = TRACER.flush()
 
     print(f"\n{'='*60}")
-    print(f"[✓] {len(valid)} uçuş | {output['below_target']} alarm altı | {alarms_sent} alarm gönderildi")
+    for line in ready_summary():
+        print(line)
+    for line in TRACER.summary():
+        print(line)
+    if trace_path:
+        print(f"  [İZ] Trace: {trace_path} (chrome://tracing / ui.perfetto.dev)")
+    if BLOCK_RESOURCES:
+        print(NET_STATS.summary())
+    print(BREAKER.summary())
+    print(STRATEGY_STATS.summary())
+    # Parçada özet adayları --merge'e kalır; orada gönderilir
+    verb = "alarm sıraya alındı (--merge gönderir)" if out_dir else "alarm gönderildi"
+    print(f"[✓] {output['total_found']} uçuş | {output['below_target']} alarm altı | {alarms_sent} {verb}")
     print(f"{'='*60}\n")
 
 
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="PROJECT TITAN uçuş tarayıcı")
+    ap.add_argument("--compact", action="store_true",
+                    help="tarama yapmadan flights.partial.ndjson → flights.json")
+    ap.add_argument("--shard", metavar="i/N",
+                    help="rotaların i. parçasını tara (1 ≤ i ≤ N); sonuç shards/<i>of<N>/ altına yazılır")
+    ap.add_argument("--merge", action="store_true",
+                    help="tarama yapmadan shards/ altındaki parça sonuçlarını flights.json'a birleştir")
+    ap.add_argument("--watch", action="store_true",
+                    help="sürekli çalış: TITAN_WATCH_INTERVAL_S'de bir tara, routes.json değişince yeniden yükle")
+    ap.add_argument("--check-routes", action="store_true",
+                    help="routes.json'u doğrula ve çık")
+    args = ap.parse_args(argv)
+    shard = None
+    if args.shard:
+        try: shard = parse_shard(args.shard)
+        except ValueError as e: ap.error(str(e))
+    if args.check_routes:
+        print(f"[✓] {ROUTE_CONFIG.path}: {len(ROUTE_CONFIG.routes)} rota, {len(ROUTE_CONFIG.airports)} havalimanı")
+    elif args.compact:
+        compact_results()
+    elif args.merge:
+        merge_shards()
+    elif args.watch:
+        watch_scraper(shard)
+    else:
+        run_scraper(shard)
+
+
 if __name__ == "__main__":
-    run_scraper()
+    main()
@@ -0,0 +1,70 @@
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scraper
+from scraper import AnomalyModel
+
+ROUTES = [f"IST-{c}" for c in ("CDG", "FCO", "BCN", "AMS", "BER", "VIE", "PRG", "ATH")]
+
+
+def _row(price, dep="2026-12-01", source="dom"):
+    return {"price": price, "depart_date": dep, "data_source": source}
+
+
+def _page(model, route, prices):
+    """process_search gibi: önce her fiyat check(), geçenler update()."""
+    kept = [p for p in prices if model.check(route, "2026-12-01", p, "dom")[1] != "sabit"]
+    model.update(route, [_row(p) for p in kept])
+    return kept
+
+
+def test_ordinary_price_repeated_across_days_is_kept(tmp_path):
+    # Aynı sıradan fiyat her gün farklı rotalarda çıkar; tek run'da sayfaların azında görülür
+    for day in range(7):
+        model = AnomalyModel(tmp_path)
+        model.start_run()
+        for i, route in enumerate(ROUTES):
+            prices = [2500 + 37 * i + day, 3100 + 11 * i]
+            if i in (day % 8, (day + 1) % 8, (day + 2) % 8):
+                prices.append(4200)
+            assert _page(model, route, prices) == prices
+        model.flush()
+    saved = json.loads((tmp_path / "anomaly_model.json").read_text(encoding="utf-8"))
+    assert saved["constants"] == {}
+
+
+def test_page_constant_within_run_is_dropped(tmp_path):
+    model = AnomalyModel(tmp_path)
+    model.start_run()
+    kept = [_page(model, route, [1000, 2500 + 41 * i]) for i, route in enumerate(ROUTES)]
+    assert all(1000 in k for k in kept[:6])
+    assert all(k == [2500 + 41 * i] for i, k in enumerate(kept) if i >= 6)
+    model.flush()
+
+    # Kara liste sonraki run'da ilk sayfadan itibaren uygulanır
+    model = AnomalyModel(tmp_path)
+    model.start_run()
+    assert model.check("IST-CDG", "2026-12-01", 1000, "dom")[1] == "sabit"
+    assert model.check("IST-CDG", "2026-12-01", 1000, "rpc")[1] is None
+
+
+def test_blacklist_is_capped_and_expires(tmp_path, monkeypatch):
+    today = datetime.now()
+    consts = {str(1000 + i): (today - timedelta(days=i % 10)).strftime("%Y-%m-%d") for i in range(100)}
+    monkeypatch.setattr(scraper, "CONST_MAX_KEYS", 5)
+    pruned = scraper.prune_constants(consts)
+    assert len(pruned) == 5
+    assert all(d == today.strftime("%Y-%m-%d") for d in pruned.values())
+
+
+def test_legacy_constants_format_is_ignored(tmp_path):
+    (tmp_path / "anomaly_model.json").write_text(
+        json.dumps({"routes": {}, "constants": {"2500": {"IST-CDG": "2026-10-17", "IST-FCO": "2026-10-17",
+                                                        "IST-BCN": "2026-10-17"}}}), encoding="utf-8")
+    model = AnomalyModel(tmp_path)
+    model.start_run()
+    assert model.check("IST-AMS", "2026-12-01", 2500, "dom")[1] is None
@@ -0,0 +1,49 @@
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scraper
+from scraper import TelegramOutbox
+
+
+def _item(text, hours_ago):
+    created = (datetime.now() - timedelta(hours=hours_ago)).isoformat()
+    return {"chat_id": "1", "text": text, "created": created, "attempts": 3, "next_try": 0.0}
+
+
+def _write(path, items):
+    path.write_text(json.dumps({"pending": items}), encoding="utf-8")
+
+
+def test_expired_items_are_dropped_on_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "OUTBOX_MAX_AGE_H", 24)
+    path = tmp_path / "outbox.json"
+    _write(path, [_item("eski", 30), _item("taze", 2)])
+    pending = TelegramOutbox._read_pending(path)
+    assert [it["text"] for it in pending] == ["taze"]
+    assert pending[0]["attempts"] == 0
+
+
+def test_expired_items_are_dropped_on_flush(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "OUTBOX_MAX_AGE_H", 24)
+    path = tmp_path / "outbox.json"
+    box = TelegramOutbox(path, chats=["1"])
+    box.items = [_item("eski", 25), _item("taze", 1)]
+    box._persist()
+    saved = json.loads(path.read_text(encoding="utf-8"))["pending"]
+    assert [it["text"] for it in saved] == ["taze"]
+    assert box.failed == 1
+
+    box.items = [_item("eski", 48)]
+    box._persist()
+    assert not path.exists()
+
+
+def test_zero_max_age_keeps_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "OUTBOX_MAX_AGE_H", 0)
+    path = tmp_path / "outbox.json"
+    _write(path, [_item("çok eski", 24 * 30)])
+    assert len(TelegramOutbox._read_pending(path)) == 1
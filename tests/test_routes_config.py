@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scraper
+from scraper import RouteConfigError, load_routes_config, parse_routes_config
+
+AIRPORTS = {"IST": {"name": "İstanbul"}, "CDG": {"name": "Paris", "aliases": ["Paris"]},
+            "FCO": {"name": "Roma Fiumicino", "aliases": ["Roma"]}}
+
+
+def _cfg(**routes):
+    return {"defaults": {"bounds": [150, 15000]},
+            "routes": routes or {"IST-CDG": {"target": 3000}},
+            "airports": dict(AIRPORTS)}
+
+
+def _errors(raw):
+    with pytest.raises(RouteConfigError) as e:
+        parse_routes_config(raw, "routes.json")
+    return str(e.value)
+
+
+@pytest.fixture
+def restore_config():
+    old = scraper.ROUTE_CONFIG
+    yield
+    scraper.apply_routes_config(old)
+
+
+def test_shipped_routes_json_is_valid():
+    cfg = load_routes_config(Path(scraper.__file__).with_name("routes.json"))
+    assert cfg.routes and all(r.bounds[0] <= r.target <= r.bounds[1] for r in cfg.routes.values())
+
+
+@pytest.mark.parametrize("bounds", [[10, 5], [0, 100], [100], "100-200", [100, "x"]])
+def test_bad_bounds(bounds):
+    msg = _errors(_cfg(**{"IST-CDG": {"target": 3000, "bounds": bounds}}))
+    assert "routes.IST-CDG.bounds" in msg
+
+
+def test_bad_default_bounds():
+    raw = _cfg()
+    raw["defaults"]["bounds"] = [5000, 100]
+    assert "defaults.bounds" in _errors(raw)
+
+
+def test_target_outside_bounds():
+    msg = _errors(_cfg(**{"IST-CDG": {"target": 99999}}))
+    assert "routes.IST-CDG.target: 99999 sınırların (150-15000) dışında" in msg
+
+
+def test_unknown_airport():
+    msg = _errors(_cfg(**{"IST-JFK": {"target": 3000}}))
+    assert "routes.IST-JFK: JFK airports içinde tanımlı değil" in msg
+
+
+def test_all_errors_reported_together():
+    msg = _errors(_cfg(**{"IST-JFK": {"target": 3000}, "IST-CDG": {"target": 99999, "priorty": 2}}))
+    assert "3 hata" in msg and "JFK" in msg and "'priorty'" in msg and "99999" in msg
+
+
+def test_duplicate_route_key(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text('{"routes": {"IST-CDG": {"target": 1}, "IST-CDG": {"target": 2}}, "airports": {}}',
+                    encoding="utf-8")
+    with pytest.raises(RouteConfigError, match="iki kez"):
+        load_routes_config(path)
+
+
+def test_invalid_reload_keeps_old_config(tmp_path, restore_config):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps(_cfg(**{"IST-CDG": {"target": 3000}, "IST-FCO": {"target": 2500}})),
+                    encoding="utf-8")
+    scraper.apply_routes_config(load_routes_config(path))
+    assert scraper.ROUTES == ["IST-CDG", "IST-FCO"]
+
+    path.write_text(json.dumps(_cfg(**{"IST-CDG": {"target": 99999}})), encoding="utf-8")
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+    assert scraper.reload_routes_config() is False
+    assert scraper.ROUTES == ["IST-CDG", "IST-FCO"]
+    assert scraper.TARGET_PRICES == {"IST-CDG": 3000, "IST-FCO": 2500}
+
+    path.write_text("{ bozuk", encoding="utf-8")
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 20))
+    assert scraper.reload_routes_config() is False
+    assert scraper.TARGET_PRICES["IST-CDG"] == 3000
+
+    path.write_text(json.dumps(_cfg(**{"IST-FCO": {"target": 2000}})), encoding="utf-8")
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 30))
+    assert scraper.reload_routes_config() is True
+    assert scraper.ROUTES == ["IST-FCO"] and scraper.TARGET_PRICES == {"IST-FCO": 2000}
+
+
+def test_unchanged_file_is_not_reloaded(tmp_path, restore_config):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps(_cfg()), encoding="utf-8")
+    scraper.apply_routes_config(load_routes_config(path))
+    assert scraper.reload_routes_config() is False
@@ -0,0 +1,113 @@
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scraper
+from scraper import parse_routes_config, shard_routes
+
+ROUTES = ["IST-CDG", "IST-FCO", "IST-BCN", "IST-AMS", "IST-ATH"]
+AIRPORTS = {c: {"name": c} for c in ("IST", "CDG", "FCO", "BCN", "AMS", "ATH", "JFK")}
+RETIRED = "IST-JFK"    # routes.json'dan çıkmış; hiçbir parçada yok, geçmişi korunmalı
+GLOBALS = ("ROUTE_CONFIG", "TARGET_PRICES", "BOUNDS", "ROUTES", "AIRPORT_NAMES", "AIRPORT_ALIASES",
+           "HISTORY", "PRICE_STORE", "ANOMALY", "PLANNER", "SCRAPE_CACHE", "STRATEGY_STATS",
+           "OUTBOX", "DIGEST")
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 7])
+def test_shard_routes_partition(n):
+    parts = [shard_routes(ROUTES, i, n) for i in range(1, n + 1)]
+    assert sorted(r for p in parts for r in p) == sorted(ROUTES)
+    assert max(map(len, parts)) - min(map(len, parts)) <= 1
+
+
+def test_parse_shard():
+    assert scraper.parse_shard("2/4") == (2, 4)
+    for bad in ("0/2", "3/2", "x", "1-2"):
+        with pytest.raises(ValueError):
+            scraper.parse_shard(bad)
+
+
+def _row(route, dep, price):
+    return {"route": route, "origin": route[:3], "dest": route[4:], "depart_date": dep,
+            "return_date": dep, "price": price, "airline": "THY", "has_stopover": False,
+            "data_source": "rpc", "scraped_at": datetime.now().isoformat()}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in GLOBALS:
+        monkeypatch.setattr(scraper, name, getattr(scraper, name))
+    monkeypatch.setattr(scraper.TRACER, "out_dir", scraper.TRACER.out_dir)
+    cfg = parse_routes_config({"defaults": {"bounds": [100, 20000]}, "airports": AIRPORTS,
+                               "routes": {r: {"target": 3000} for r in ROUTES}})
+    scraper.apply_routes_config(cfg)
+    return tmp_path
+
+
+def _main_stores():
+    scraper.PRICE_STORE = scraper.PriceStore()
+    scraper.ANOMALY = scraper.AnomalyModel()
+    scraper.HISTORY = scraper.AlarmHistory()
+    scraper.OUTBOX = scraper.TelegramOutbox(chats=[])
+    scraper.DIGEST = scraper.AlarmDigest()
+
+
+def test_shard_merge_round_trip(workdir):
+    # Ana data/: her rotanın ve emekli rotanın geçmişi
+    _main_stores()
+    for i, route in enumerate(ROUTES + [RETIRED]):
+        rows = [_row(route, "2026-12-01", 2000 + 100 * i)]
+        scraper.PRICE_STORE.add(route, rows)
+        scraper.ANOMALY.update(route, rows)
+    scraper.PRICE_STORE.flush()
+    scraper.ANOMALY.flush()
+    scraper.write_flights([_row(r, "2026-11-20", 5000) for r in ROUTES + [RETIRED]], 0)
+    before = json.loads(Path("data/price_window.json").read_text(encoding="utf-8"))["routes"]
+
+    # İki parça: her biri yalnız kendi rotalarını tarar
+    seen = []
+    for i in (1, 2):
+        out = scraper.configure_shard(i, 2)
+        seen += scraper.ROUTES
+        rows = [_row(r, "2026-12-08", 1500 + j) for j, r in enumerate(scraper.ROUTES)]
+        for r in rows:
+            scraper.PRICE_STORE.add(r["route"], [r])
+            scraper.ANOMALY.update(r["route"], [r])
+        scraper.PRICE_STORE.flush()
+        scraper.ANOMALY.flush()
+        scraper.write_flights(rows, 0, out / scraper.FLIGHTS_FILE.name, dashboard=False)
+    assert sorted(seen) == sorted(ROUTES)
+
+    _main_stores()
+    output = scraper.merge_shards()
+
+    # Her rota flights.json'da tam bir kez (parça satırı), emekli rota önceki satırıyla
+    by_route = {}
+    for f in output["flights"]:
+        by_route.setdefault(f["route"], []).append(f["depart_date"])
+    assert by_route == {**{r: ["2026-12-08"] for r in ROUTES}, RETIRED: ["2026-11-20"]}
+
+    # Parçaların rotaları güncellendi, parça dışı rotanın durumu aynen korundu
+    window = json.loads(Path("data/price_window.json").read_text(encoding="utf-8"))["routes"]
+    assert set(window) == set(ROUTES) | {RETIRED}
+    assert window[RETIRED] == before[RETIRED]
+    for r in ROUTES:
+        assert window[r]["n_total"] == before[r]["n_total"] + 1
+    stats = json.loads(Path("data/price_stats.json").read_text(encoding="utf-8"))["routes"]
+    assert set(stats) == set(ROUTES) | {RETIRED}
+    model = json.loads(Path("data/anomaly_model.json").read_text(encoding="utf-8"))["routes"]
+    assert set(model) == set(ROUTES) | {RETIRED}
+    assert all(model[r]["*"][0] == 2 for r in ROUTES) and model[RETIRED]["*"][0] == 1
+
+    # Fiyat CSV'si: ana + parça satırları, tek başlık
+    csv = next(Path("data/prices").glob("*.csv")).read_text(encoding="utf-8").splitlines()
+    assert csv[0].startswith("scraped_at,") and sum(l.startswith("scraped_at,") for l in csv) == 1
+    assert len(csv) == 1 + len(ROUTES) + 1 + len(ROUTES)
+
+    assert not any(Path("shards").iterdir())